@@ -1,3 +1,80 @@
-from django.contrib import admin
+# bookings/admin.py
+from django.contrib import admin, messages
 
-# Register your models here.
+from rental_service.admin import ScalableModelAdmin, prefix_filter
+from . import exports
+from .lifecycle import bulk_transition
+from .models import BookedDay, Booking, ProductDayStat, ReminderLog
+
+
+@admin.register(Booking)
+class BookingAdmin(ScalableModelAdmin):
+    list_display = ('id', 'product', 'renter', 'start_date', 'end_date', 'status', 'total_cost', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('product', 'renter')
+    autocomplete_fields = ('product', 'renter')
+    date_hierarchy = 'start_date'
+    search_fields = ('=id',)
+    actions = ('complete_bookings', 'cancel_bookings', 'export_csv', 'export_xlsx')
+
+    def get_search_results(self, request, queryset, search_term):
+        """Число — id брони, иначе — брони арендатора по префиксу логина"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        return queryset.filter(prefix_filter('renter__username', term)), False
+
+    def _transition(self, request, queryset, target):
+        # Один UPDATE по условию выборки (и при «выбрать все» — без загрузки броней)
+        updated = bulk_transition(queryset, target)
+        self.message_user(
+            request, f'Переведено в «{dict(Booking.STATUS_CHOICES)[target]}»: {updated}', messages.SUCCESS,
+        )
+
+    @admin.action(description='Завершить активные брони')
+    def complete_bookings(self, request, queryset):
+        self._transition(request, queryset, 'completed')
+
+    @admin.action(description='Отменить (запросы и подтверждённые)')
+    def cancel_bookings(self, request, queryset):
+        self._transition(request, queryset, 'cancelled')
+
+    # Выгрузка отдаётся потоком — и для «выбрать все» по миллионам броней
+    @admin.action(description='Выгрузить в CSV')
+    def export_csv(self, request, queryset):
+        return exports.streaming_response(request, queryset, 'csv', exports.export_filename())
+
+    @admin.action(description='Выгрузить в XLSX')
+    def export_xlsx(self, request, queryset):
+        return exports.streaming_response(request, queryset, 'xlsx', exports.export_filename())
+
+
+@admin.register(BookedDay)
+class BookedDayAdmin(ScalableModelAdmin):
+    # booking_id, а не booking: __str__ брони читает арендатора и товар
+    list_display = ('day', 'product', 'booking_id')
+    list_select_related = ('product',)
+    raw_id_fields = ('product', 'booking')
+
+
+@admin.register(ReminderLog)
+class ReminderLogAdmin(ScalableModelAdmin):
+    list_display = ('booking_id', 'kind', 'sent_at')
+    list_filter = ('kind',)
+    raw_id_fields = ('booking',)
+
+
+@admin.register(ProductDayStat)
+class ProductDayStatAdmin(ScalableModelAdmin):
+    # Сводку меняют только брони (rollups.py) и rebuild_booking_stats
+    list_display = ('day', 'product', 'bookings', 'revenue', 'rental_days', 'occupied_days')
+    list_select_related = ('product',)
+    raw_id_fields = ('product', 'owner')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,200 @@
+# bookings/availability.py
+"""
+Кэш занятости товаров: битовая карта дней на HORIZON_DAYS вперёд
+плюс список занятых диапазонов. Строится одним запросом к Booking и
+дальше отвечает на «свободны ли даты?» и «какие даты заняты?» без БД.
+
+Инвалидация — через версию в кэше: при изменении брони и после коммита
+версия товара увеличивается, и все старые карты перестают читаться. Версия
+читается до запроса к БД, поэтому карта, построенная по старым данным
+параллельно с подтверждением брони, запишется под старой версией и не
+будет использована.
+"""
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from catalog import cache as catalog_cache
+from rental_service import versioned_cache
+from .models import BookedDay, Booking
+
+HORIZON_DAYS = getattr(settings, 'BOOKING_AVAILABILITY_DAYS', 366)
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(product_id):
+    return f'availability:{product_id}:version'
+
+
+def _version(product_id):
+    return versioned_cache.get_version(_version_key(product_id))
+
+
+def _changed_key(product_id):
+    return f'availability:{product_id}:changed'
+
+
+def _bump(product_id):
+    versioned_cache.bump(_version_key(product_id))
+    cache.set(_changed_key(product_id), time.time(), None)
+
+
+def version(product_id):
+    """Текущая версия занятости товара — меняется при каждом изменении броней"""
+    return _version(product_id)
+
+
+def last_changed(product_id):
+    """
+    Время последнего изменения броней товара (timestamp). Если отметка
+    вытеснена из кэша, считаем, что изменение было только что.
+    """
+    cache.add(_changed_key(product_id), time.time(), None)
+    return cache.get(_changed_key(product_id))
+
+
+def invalidate(*product_ids):
+    """
+    Сбрасывает карты занятости товаров: сразу (чтобы текущая транзакция
+    видела свои изменения) и ещё раз после коммита — карту, построенную
+    другим процессом до коммита, читать уже нельзя. Заодно сбрасываются
+    списки каталога с фильтром по датам (catalog_cache.DATED_LIST).
+    """
+    for product_id in product_ids:
+        _bump(product_id)
+    transaction.on_commit(lambda: [_bump(product_id) for product_id in product_ids])
+    catalog_cache.invalidate(catalog_cache.DATED_LIST)
+
+
+def free_between(queryset, start, end):
+    """
+    Товары из queryset, свободные все дни с start по end включительно.
+    Anti-join по BookedDay (занятые дни подтверждённых и активных броней):
+    на товар — одна проверка по уникальному индексу (product, day), без
+    сравнения интервалов всех его броней.
+    """
+    busy = BookedDay.objects.filter(product=OuterRef('pk'), day__gte=start, day__lte=end)
+    return queryset.filter(~Exists(busy))
+
+
+def merge_ranges(ranges):
+    """Склеивает пересекающиеся и соседние диапазоны [start, end] (включительно)"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class AvailabilityMap:
+    """Занятость одного товара начиная с origin на HORIZON_DAYS дней"""
+
+    def __init__(self, origin, bits, ranges):
+        self.origin = origin
+        self.bits = bits
+        self.ranges = ranges
+
+    @classmethod
+    def build(cls, product_id, origin):
+        rows = Booking.objects.filter(
+            product_id=product_id,
+            status__in=Booking.BUSY_STATUSES,
+            end_date__gte=origin,
+        ).values_list('start_date', 'end_date')
+        ranges = merge_ranges(rows)
+        bits = 0
+        for start, end in ranges:
+            first = max((start - origin).days, 0)
+            last = min((end - origin).days, HORIZON_DAYS - 1)
+            if first <= last:
+                bits |= ((1 << (last - first + 1)) - 1) << first
+        return cls(origin, bits, ranges)
+
+    def covers(self, start, end):
+        return self.origin <= start and (end - self.origin).days < HORIZON_DAYS
+
+    def is_free(self, start, end):
+        """Свободны ли все дни [start, end]. Даты должны входить в горизонт карты"""
+        offset = (start - self.origin).days
+        length = (end - start).days + 1
+        mask = ((1 << length) - 1) << offset
+        return not self.bits & mask
+
+    def busy_ranges(self, start=None, end=None):
+        """Занятые диапазоны, пересекающиеся с [start, end]"""
+        return [
+            (s, e) for s, e in self.ranges
+            if (start is None or e >= start) and (end is None or s <= end)
+        ]
+
+    def dump(self):
+        return self.origin, self.bits, self.ranges
+
+
+def _origin():
+    # Начало текущего месяца — чтобы календарь показывал весь текущий месяц
+    return date.today().replace(day=1)
+
+
+def get_availability(product_id):
+    """Карта занятости товара из кэша (строится одним запросом при промахе)"""
+    origin = _origin()
+    version = _version(product_id)
+    key = f'availability:{product_id}:{version}:{origin.isoformat()}'
+    data = cache.get(key)
+    if data is not None:
+        return AvailabilityMap(*data)
+    availability = AvailabilityMap.build(product_id, origin)
+    cache.set(key, availability.dump(), CACHE_TIMEOUT)
+    return availability
+
+
+def is_range_free(product_id, start, end):
+    """Свободен ли товар на [start, end] (включительно)"""
+    availability = get_availability(product_id)
+    if availability.covers(start, end):
+        return availability.is_free(start, end)
+    # Даты за пределами горизонта карты — проверяем по базе
+    return not Booking.objects.filter(
+        product_id=product_id,
+        status__in=Booking.BUSY_STATUSES,
+        start_date__lte=end,
+        end_date__gte=start,
+    ).exists()
+
+
+def busy_ranges(product_id, start, end):
+    """Занятые диапазоны (склеенные), пересекающиеся с [start, end]"""
+    availability = get_availability(product_id)
+    if availability.covers(start, end):
+        return availability.busy_ranges(start, end)
+    # Запрошенный период выходит за горизонт карты — берём из базы
+    rows = Booking.objects.filter(
+        product_id=product_id,
+        status__in=Booking.BUSY_STATUSES,
+        start_date__lte=end,
+        end_date__gte=start,
+    ).values_list('start_date', 'end_date')
+    return merge_ranges(rows)
+
+
+def calendar_events(product_id, start, end):
+    """События для FullCalendar на [start, end]: занятые диапазоны (end — исключительно)"""
+    return [
+        {
+            'title': 'Забронировано',
+            'start': range_start.isoformat(),
+            'end': (range_end + timedelta(days=1)).isoformat(),
+            'color': '#dc3545',
+            'allDay': True,
+            'classNames': ['fc-booked-event'],
+        }
+        for range_start, range_end in busy_ranges(product_id, start, end)
+    ]
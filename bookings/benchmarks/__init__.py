@@ -0,0 +1 @@
+# Бенчмарки бронирования. Запуск: python -m bookings.benchmarks.writes --help
@@ -0,0 +1,110 @@
+# bookings/benchmarks/export.py
+"""
+Бенчмарк выгрузки броней (bookings/exports.py).
+
+    python -m bookings.benchmarks.export [--products 20000] [--bookings-per-product 10] [--formats csv xlsx]
+
+Сидирует сайт (rental_service/seeding.py) и выгружает все брони:
+потоково (как отдаёт StreamingHttpResponse) в CSV и XLSX и, для
+сравнения, «в лоб» — моделями с select_related в один CSV в памяти.
+Для каждого способа: время до первого куска ответа, общее время, размер
+и пик памяти Python (tracemalloc, отдельным прогоном — он замедляет код).
+"""
+import argparse
+import csv
+import io
+import sys
+import time
+import tracemalloc
+
+from rental_service.benchmarks import dump_json, print_table, setup_django, temporary_database
+
+
+def naive_csv():
+    """Как сделали бы без потоков: все брони моделями, весь файл в памяти"""
+    from bookings.exports import COLUMNS
+    from bookings.models import Booking
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([title for title, _field, _kind in COLUMNS])
+    bookings = Booking.objects.select_related('product__owner', 'renter', 'review').order_by('pk')
+    for booking in list(bookings):
+        review = getattr(booking, 'review', None)
+        writer.writerow([
+            booking.pk, booking.created_at, booking.get_status_display(), booking.start_date, booking.end_date,
+            booking.total_cost, booking.product_id, booking.product.name, booking.product.owner.username,
+            booking.renter.username, booking.renter.email,
+            review.rating if review else '', review.comment if review else '',
+        ])
+    yield buffer.getvalue().encode()
+
+
+def consume(chunks):
+    """(время до первого куска, общее время, байт)"""
+    started = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    return first, time.perf_counter() - started, size
+
+
+def peak_memory(make_chunks):
+    tracemalloc.start()
+    try:
+        for _chunk in make_chunks():
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(products, bookings_per_product, formats, json_path=None, stdout=sys.stdout):
+    from bookings import exports
+    from bookings.models import Booking
+    from rental_service.seeding import seed_site
+
+    with temporary_database():
+        counts = seed_site(
+            users=max(products // 20, 10), products=products, bookings_per_product=bookings_per_product,
+            messages_per_booking=0, stdout=stdout,
+        )
+        methods = [(f'поток, {fmt}', lambda fmt=fmt: exports.chunks(Booking.objects.all(), fmt)) for fmt in formats]
+        methods.append(('в памяти, csv', naive_csv))
+
+        rows = []
+        for title, make_chunks in methods:
+            first, total, size = consume(make_chunks())
+            rows.append({
+                'способ': title,
+                'первый байт, мс': round(first * 1000, 1),
+                'всего, с': round(total, 2),
+                'строк/с': round(counts['bookings'] / total),
+                'размер, МБ': round(size / 2 ** 20, 1),
+                'пик памяти, МБ': round(peak_memory(make_chunks) / 2 ** 20, 1),
+            })
+
+    print_table(rows, ['способ', 'первый байт, мс', 'всего, с', 'строк/с', 'размер, МБ', 'пик памяти, МБ'],
+                stream=stdout)
+    if json_path:
+        dump_json({'seeded': counts, 'results': rows}, json_path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20_000, help='Сколько товаров сидировать')
+    parser.add_argument('--bookings-per-product', type=int, default=10, help='Броней на товар')
+    parser.add_argument('--formats', nargs='+', default=['csv', 'xlsx'], choices=['csv', 'xlsx'])
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    run(args.products, args.bookings_per_product, args.formats, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
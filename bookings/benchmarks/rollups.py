@@ -0,0 +1,107 @@
+# bookings/benchmarks/rollups.py
+"""
+Бенчмарк сводки владельца (bookings/rollups.py).
+
+    python -m bookings.benchmarks.rollups [--products 20000] [--bookings-per-product 10 50] [--repeat 20]
+
+Для каждой истории (--bookings-per-product броней на товар) сидирует сайт,
+меряет полный пересчёт сводки (rebuild_booking_stats) и кабинет самого
+крупного владельца двумя способами: из сводки (owner_dashboard) и «в лоб» —
+перебором всех его броней, как пришлось бы делать без сводки.
+"""
+import argparse
+import sys
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from rental_service.benchmarks import dump_json, measure, print_table, setup_django, temporary_database
+
+
+def naive_dashboard(owner, period_days=90, months=12, today=None):
+    """Те же цифры по броням владельца: каждая бронь читается и разворачивается по дням"""
+    from django.utils import timezone
+
+    from bookings.models import Booking
+    from bookings.rollups import COUNTED_STATUSES
+    from catalog.pricing import rental_days
+
+    today = today or timezone.localdate()
+    by_month = defaultdict(lambda: [0, 0, 0, 0])
+    period_start = today - timedelta(days=period_days - 1)
+    per_product = defaultdict(lambda: [0, 0, 0, 0])
+    rows = Booking.objects.filter(product__owner=owner, status__in=COUNTED_STATUSES).values_list(
+        'product_id', 'start_date', 'end_date', 'total_cost',
+    )
+    for product_id, start, end, cost in rows:
+        day = start
+        while day <= end:
+            if day <= today:
+                by_month[day.replace(day=1)][3] += 1
+                if day >= period_start:
+                    per_product[product_id][3] += 1
+            day += timedelta(days=1)
+        if start <= today:
+            for bucket in (by_month[start.replace(day=1)],) + ((per_product[product_id],) if start >= period_start else ()):
+                bucket[0] += 1
+                bucket[1] += cost
+                bucket[2] += rental_days(start, end)
+    return by_month, per_product
+
+
+def run(products, histories, repeat, json_path=None, stdout=sys.stdout):
+    from django.db.models import Count
+
+    from bookings import rollups
+    from bookings.models import Booking, ProductDayStat
+    from rental_service.seeding import seed_site
+    from users.models import User
+
+    rows = []
+    for bookings_per_product in histories:
+        with temporary_database():
+            seed_site(
+                users=max(products // 20, 10), products=products, bookings_per_product=bookings_per_product,
+                messages_per_booking=0, stdout=stdout,
+            )
+            started = time.perf_counter()
+            stat_rows = rollups.rebuild()
+            rebuild_s = time.perf_counter() - started
+
+            owner = User.objects.annotate(products=Count('product')).order_by('-products').first()
+            rollup_stats, dashboard = measure(lambda: rollups.owner_dashboard(owner), repeat=repeat)
+            naive_stats, (by_month, _per_product) = measure(lambda: naive_dashboard(owner), repeat=repeat)
+            assert sum(month['revenue'] for month in dashboard['months']) == sum(
+                values[1] for month, values in by_month.items() if month >= dashboard['months'][0]['month']
+            )
+            rows.append({
+                'броней': Booking.objects.count(),
+                'строк сводки': stat_rows,
+                'rebuild, с': round(rebuild_s, 2),
+                'товаров у владельца': owner.products,
+                'кабинет из сводки, мс': rollup_stats['median_ms'],
+                'кабинет по броням, мс': naive_stats['median_ms'],
+            })
+            assert ProductDayStat.objects.count() == stat_rows
+
+    print_table(rows, ['броней', 'строк сводки', 'rebuild, с', 'товаров у владельца',
+                       'кабинет из сводки, мс', 'кабинет по броням, мс'], stream=stdout)
+    if json_path:
+        dump_json({'products': products, 'repeat': repeat, 'results': rows}, json_path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20_000, help='Сколько товаров сидировать')
+    parser.add_argument('--bookings-per-product', type=int, nargs='+', default=[10, 50], help='Истории броней на товар')
+    parser.add_argument('--repeat', type=int, default=20, help='Сколько замеров')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    run(args.products, args.bookings_per_product, args.repeat, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# bookings/benchmarks/writes.py
+"""
+Пропускная способность записи: создание броней (POST на create_booking)
+из нескольких потоков одновременно, в разных режимах базы.
+
+    python -m bookings.benchmarks.writes [--threads 1 4 8] [--bookings 100] [--json out.json]
+
+Режимы зависят от DB_ENGINE:
+
+* sqlite — «как было» (journal_mode=DELETE, отложенные транзакции, без
+  PRAGMA) против настроек из settings (WAL, IMMEDIATE, busy_timeout…);
+* postgres — новое соединение на каждый запрос (CONN_MAX_AGE=0) против
+  постоянных соединений из settings.
+
+Каждый поток ведёт себя как воркер сервера: перед и после «запроса»
+вызывает close_old_connections(), поэтому CONN_MAX_AGE и стоимость
+открытия соединения (для SQLite — с выполнением PRAGMA) учитываются.
+SQLite тестируется на временном файле, а не в памяти.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from rental_service.benchmarks import dump_json, percentile, print_table, setup_django, temporary_database
+
+
+def modes(settings_dict):
+    """Имя режима -> изменения settings.DATABASES['default']"""
+    if settings_dict['ENGINE'].endswith('sqlite3'):
+        return {
+            'sqlite: по умолчанию': {'CONN_MAX_AGE': 0, 'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'}},
+            'sqlite: настроенный': {
+                'CONN_MAX_AGE': settings_dict['CONN_MAX_AGE'],
+                'OPTIONS': dict(settings_dict['OPTIONS']),
+            },
+        }
+    return {
+        'postgres: CONN_MAX_AGE=0': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+        f'postgres: CONN_MAX_AGE={settings_dict["CONN_MAX_AGE"]}': {
+            'CONN_MAX_AGE': settings_dict['CONN_MAX_AGE'],
+            'CONN_HEALTH_CHECKS': settings_dict['CONN_HEALTH_CHECKS'],
+        },
+    }
+
+
+def apply_mode(overrides):
+    from django.db import connections
+
+    settings_dict = connections['default'].settings_dict
+    settings_dict.update(overrides)
+    # Новые параметры подхватываются только новыми соединениями
+    connections.close_all()
+
+
+def worker(renter, product_ids, count, offset):
+    """Создаёт count броней от имени renter. Возвращает (задержки в мс, ошибки)"""
+    from django.db import OperationalError, close_old_connections, connections
+    from django.test import Client
+    from django.urls import reverse
+
+    client = Client()
+    client.force_login(renter)
+    timings, errors = [], 0
+    try:
+        for i in range(count):
+            product_id = product_ids[(offset + i) % len(product_ids)]
+            # Далёкие непересекающиеся даты: заявка создаётся всегда
+            start = date.today() + timedelta(days=400 + (offset + i) * 3)
+            close_old_connections()
+            started = time.perf_counter()
+            try:
+                response = client.post(
+                    reverse('bookings:create_booking', args=[product_id]),
+                    {'start_date': start.isoformat(), 'end_date': (start + timedelta(days=1)).isoformat()},
+                )
+                if response.status_code != 302:
+                    errors += 1
+            except OperationalError:
+                # «database is locked» и подобное
+                errors += 1
+            timings.append((time.perf_counter() - started) * 1000)
+            close_old_connections()
+    finally:
+        connections.close_all()
+    return timings, errors
+
+
+def run_mode(threads, bookings, renters, product_ids):
+    from bookings.models import Booking
+
+    before = Booking.objects.count()
+    per_thread = max(bookings // threads, 1)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(
+            lambda n: worker(renters[n % len(renters)], product_ids, per_thread, offset=n * per_thread + before),
+            range(threads),
+        ))
+    elapsed = time.perf_counter() - started
+    created = Booking.objects.count() - before
+    timings = [t for thread_timings, _ in results for t in thread_timings]
+    return {
+        'броней': created,
+        'ошибок': sum(errors for _, errors in results),
+        'броней/с': round(created / elapsed, 1),
+        'p50, мс': round(percentile(timings, 0.5), 2),
+        'p95, мс': round(percentile(timings, 0.95), 2),
+    }
+
+
+def run(thread_counts, bookings, json_path=None, stdout=sys.stdout):
+    import logging
+
+    from django.conf import settings
+    from django.db import connections
+
+    from catalog.benchmarks.seed import seed_catalog
+    from catalog.models import Product
+
+    # Медленные под нагрузкой запросы иначе засыпают вывод строками лога
+    logging.getLogger('rental_service.requests').setLevel(logging.ERROR)
+
+    settings_dict = connections['default'].settings_dict
+    mode_overrides = modes(settings_dict)
+    if settings_dict['ENGINE'].endswith('sqlite3'):
+        # Файл, а не :memory: — иначе нет ни блокировок, ни журнала
+        directory = tempfile.mkdtemp()
+        settings_dict['TEST']['NAME'] = os.path.join(directory, 'writes.sqlite3')
+
+    rows = []
+    with temporary_database():
+        _categories, owners = seed_catalog(products=200, users=50, stdout=stdout)
+        product_ids = list(Product.objects.filter(owner__in=owners[:10]).values_list('pk', flat=True))
+        renters = owners[10:]
+        for mode, overrides in mode_overrides.items():
+            apply_mode(overrides)
+            for threads in thread_counts:
+                rows.append({'режим': mode, 'потоков': threads, **run_mode(threads, bookings, renters, product_ids)})
+        apply_mode(mode_overrides[list(mode_overrides)[-1]])
+
+    columns = ['режим', 'потоков', 'броней', 'ошибок', 'броней/с', 'p50, мс', 'p95, мс']
+    print_table(rows, columns, stream=stdout)
+    if json_path:
+        dump_json({'engine': settings.DB_ENGINE, 'bookings': bookings, 'results': rows}, json_path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8], help='Сколько потоков пишут одновременно')
+    parser.add_argument('--bookings', type=int, default=200, help='Сколько броней создать в каждом прогоне')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    run(args.threads, args.bookings, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
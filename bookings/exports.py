@@ -0,0 +1,205 @@
+# bookings/exports.py
+"""
+Выгрузка броней в CSV и XLSX: владельцу — брони его товаров (доход), в
+админке — любая выборка, из консоли — manage.py export_bookings.
+
+Строки читаются через values_list(...).iterator(chunk_size=...): без
+моделей и без загрузки всей выборки в память, товар, владелец, арендатор
+и отзыв — JOIN'ы в том же запросе.
+
+CSV отдаётся кусками по мере чтения: заголовок уходит клиенту ещё до
+запроса к базе. XLSX — zip-архив, который xlsxwriter собирает только в
+close(), поэтому строки пишутся в режиме constant_memory (сразу на диск),
+а готовый файл отдаётся с диска кусками: память ограничена, но первые
+байты — после записи последней строки.
+
+Под ASGI (uvicorn) StreamingHttpResponse с обычным итератором сначала
+собирает его в список целиком, поэтому там ответу отдаётся асинхронный
+итератор: каждый кусок читается в потоке через sync_to_async.
+"""
+import csv
+import tempfile
+
+import xlsxwriter
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Booking
+
+FORMATS = ('csv', 'xlsx')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Строк в одной выборке из курсора
+CHUNK_SIZE = 2000
+# Байт в одном куске ответа
+BUFFER_SIZE = 64 * 1024
+# Предел строк на лист Excel (без заголовка); дальше — следующий лист
+SHEET_ROWS = 1_048_575
+
+# (заголовок, поле, тип значения)
+COLUMNS = (
+    ('ID', 'pk', 'number'),
+    ('Создана', 'created_at', 'datetime'),
+    ('Статус', 'status', 'status'),
+    ('Начало', 'start_date', 'date'),
+    ('Окончание', 'end_date', 'date'),
+    ('Стоимость, ₽', 'total_cost', 'money'),
+    ('ID товара', 'product_id', 'number'),
+    ('Товар', 'product__name', 'text'),
+    ('Владелец', 'product__owner__username', 'text'),
+    ('Арендатор', 'renter__username', 'text'),
+    ('Email арендатора', 'renter__email', 'text'),
+    ('Оценка', 'review__rating', 'number'),
+    ('Отзыв', 'review__comment', 'text'),
+)
+KINDS = tuple(kind for _title, _field, kind in COLUMNS)
+COLUMN_WIDTHS = {'datetime': 17, 'date': 11, 'money': 12, 'status': 22, 'text': 24, 'number': 9}
+STATUS_LABELS = dict(Booking.STATUS_CHOICES)
+# С этих символов Excel начинает формулу — в CSV такие тексты экранируются
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Строки выгрузки по броням queryset — потоком, в порядке id. Статус —
+    подписью, время создания — местное без пояса (как его покажет Excel).
+    """
+    fields = [field for _title, field, _kind in COLUMNS]
+    # Пояс — один раз на выгрузку: localtime() на каждой строке заметно дороже
+    zone = timezone.get_current_timezone()
+    for row in queryset.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size):
+        row = list(row)
+        for index, kind in enumerate(KINDS):
+            value = row[index]
+            if value is None:
+                continue
+            if kind == 'status':
+                row[index] = STATUS_LABELS.get(value, value)
+            elif kind == 'datetime':
+                if value.tzinfo is not None:
+                    value = value.astimezone(zone)
+                row[index] = value.replace(tzinfo=None, microsecond=0)
+        yield row
+
+
+def _csv_text(value):
+    return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+
+
+class _Echo:
+    """Файл для csv.writer, который просто возвращает записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, buffer_size=BUFFER_SIZE):
+    """Байты CSV (UTF-8 с BOM — иначе Excel читает его как cp1251) кусками"""
+    writer = csv.writer(_Echo())
+    yield ('\ufeff' + writer.writerow([title for title, _field, _kind in COLUMNS])).encode()
+    text_columns = [index for index, kind in enumerate(KINDS) if kind == 'text']
+    buffer, size = [], 0
+    for row in rows:
+        for index in text_columns:
+            if row[index]:
+                row[index] = _csv_text(row[index])
+        line = writer.writerow(row)
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def write_xlsx(rows, output):
+    """Пишет строки в книгу XLSX в файл (или файловый объект) output"""
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    header = workbook.add_format({'bold': True})
+    formats = {
+        'datetime': workbook.add_format({'num_format': 'dd.mm.yyyy hh:mm'}),
+        'date': workbook.add_format({'num_format': 'dd.mm.yyyy'}),
+        'money': workbook.add_format({'num_format': '#,##0.00'}),
+    }
+
+    def add_sheet():
+        number = len(workbook.worksheets()) + 1
+        sheet = workbook.add_worksheet('Брони' if number == 1 else f'Брони {number}')
+        for index, kind in enumerate(KINDS):
+            sheet.set_column(index, index, COLUMN_WIDTHS[kind])
+        sheet.freeze_panes(1, 0)
+        # constant_memory: строки пишутся строго по порядку, ячейка за ячейкой
+        for index, (title, _field, _kind) in enumerate(COLUMNS):
+            sheet.write_string(0, index, title, header)
+        return sheet
+
+    sheet, line = add_sheet(), 0
+    for row in rows:
+        if line == SHEET_ROWS:
+            sheet, line = add_sheet(), 0
+        line += 1
+        for index, value in enumerate(row):
+            if value is None:
+                continue
+            kind = KINDS[index]
+            if kind in ('text', 'status'):
+                # write_string, а не write: текст с «=» не должен стать формулой
+                sheet.write_string(line, index, value)
+            elif kind in ('date', 'datetime'):
+                sheet.write_datetime(line, index, value, formats[kind])
+            elif kind == 'money':
+                sheet.write_number(line, index, float(value), formats[kind])
+            else:
+                sheet.write_number(line, index, value)
+    workbook.close()
+
+
+def xlsx_chunks(rows, buffer_size=BUFFER_SIZE):
+    """Байты XLSX кусками: книга собирается во временном файле и читается с диска"""
+    with tempfile.TemporaryFile() as output:
+        write_xlsx(rows, output)
+        output.seek(0)
+        while chunk := output.read(buffer_size):
+            yield chunk
+
+
+def chunks(queryset, fmt, chunk_size=CHUNK_SIZE):
+    """Выгрузка queryset в формате fmt ('csv' или 'xlsx') — итератор байт"""
+    rows = export_rows(queryset, chunk_size)
+    return xlsx_chunks(rows) if fmt == 'xlsx' else csv_chunks(rows)
+
+
+async def async_chunks(iterator):
+    """
+    Асинхронный итератор над синхронным: следующий кусок (и запросы к базе
+    за ним) — в потоке sync_to_async, цикл событий не блокируется.
+    """
+    fetch = sync_to_async(next)
+    try:
+        while (chunk := await fetch(iterator, None)) is not None:
+            yield chunk
+    finally:
+        # Клиент мог оборвать загрузку — закрываем курсор и временный файл в том же потоке
+        await sync_to_async(iterator.close)()
+
+
+def streaming_response(request, queryset, fmt, filename):
+    """
+    StreamingHttpResponse с выгрузкой. Запрос к базе выполняется уже при
+    отдаче ответа, после выхода из view.
+    """
+    content = chunks(queryset, fmt)
+    if isinstance(request, ASGIRequest):
+        content = async_chunks(content)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def export_filename(prefix='bookings'):
+    return f'{prefix}-{timezone.localdate():%Y%m%d}'
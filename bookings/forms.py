@@ -1,5 +1,6 @@
 from django import forms
 from .models import Booking
+from .availability import is_range_free
 from datetime import date
 
 class BookingCreateForm(forms.ModelForm):
@@ -29,16 +30,32 @@ class BookingCreateForm(forms.ModelForm):
         if start < date.today():
             raise forms.ValidationError("Нельзя бронировать прошедшие даты")
 
-        # Проверка пересечения
-        if self.product:
-            overlapping = Booking.objects.filter(
-                product=self.product,
-                status__in=['confirmed', 'active'],
-                start_date__lt=end,
-                end_date__gt=start
-            ).exists()
+        # Проверка пересечения по кэшу занятости (даты включительно, как в календаре)
+        if self.product and not is_range_free(self.product.pk, start, end):
+            raise forms.ValidationError("Эти даты уже заняты")
 
-            if overlapping:
-                raise forms.ValidationError("Эти даты уже заняты")
+        return cleaned_data
 
-        return cleaned_data
\ No newline at end of file
+class BookingExportForm(forms.Form):
+    """Фильтры выгрузки броней (GET-параметры и аргументы export_bookings)"""
+    status = forms.ChoiceField(choices=[('', 'Все')] + Booking.STATUS_CHOICES, required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if start and end and end < start:
+            raise forms.ValidationError("Конец периода раньше начала")
+        return cleaned_data
+
+    def filter(self, queryset):
+        """Брони queryset, подходящие под фильтры (по дате начала)"""
+        data = self.cleaned_data
+        if data['status']:
+            queryset = queryset.filter(status=data['status'])
+        if data['date_from']:
+            queryset = queryset.filter(start_date__gte=data['date_from'])
+        if data['date_to']:
+            queryset = queryset.filter(start_date__lte=data['date_to'])
+        return queryset
@@ -0,0 +1,140 @@
+# bookings/lifecycle.py
+"""
+Жизненный цикл брони — явная машина состояний:
+
+    pending ──► confirmed ──► active ──► completed
+       │            │
+       └────────────┴──► cancelled
+
+Ручные переходы (подтверждение, отклонение) делает bookings/services.py
+и проверяет их через check_transition. Переходы по дате делает
+advance(): раз в сутки (manage.py advance_bookings) брони, у которых
+наступил срок, переводятся пачками set-based UPDATE'ами — без загрузки
+объектов и без сигналов, поэтому занятые дни и кэш занятости
+обновляются здесь же. Повторный запуск ничего не меняет.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import availability, rollups
+from .models import BookedDay, Booking
+
+logger = logging.getLogger(__name__)
+
+TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'confirmed': {'active', 'cancelled'},
+    'active': {'completed'},
+    'completed': set(),
+    'cancelled': set(),
+}
+
+
+class BookingStateError(Exception):
+    """Бронь нельзя перевести в запрошенный статус"""
+
+
+def can_transition(current, new):
+    return new in TRANSITIONS[current]
+
+
+def check_transition(booking, new):
+    if not can_transition(booking.status, new):
+        raise BookingStateError(booking.get_status_display())
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Переход по дате: брони в статусе source, для которых due(today) истинно"""
+    name: str
+    source: str
+    target: str
+    due: object
+
+    def queryset(self, today):
+        return Booking.objects.filter(self.due(today), status=self.source)
+
+
+# Порядок важен: подтверждённая бронь, которая уже и закончилась, за один
+# запуск становится active, а затем completed
+RULES = (
+    Rule('activate', 'confirmed', 'active', lambda today: Q(start_date__lte=today)),
+    Rule('complete', 'active', 'completed', lambda today: Q(end_date__lt=today)),
+)
+
+for _rule in RULES:
+    assert can_transition(_rule.source, _rule.target), _rule
+    # apply_rule не обновляет сводку владельца: переходы по дате не меняют вклад брони
+    assert rollups.counted(_rule.source) == rollups.counted(_rule.target), _rule
+
+
+def apply_rule(rule, today, batch_size=1000):
+    """
+    Переводит все брони, подпадающие под правило, пачками по batch_size.
+    Каждая пачка — своя короткая транзакция: UPDATE по id, освобождение
+    дней и сброс кэша занятости затронутых товаров. Возвращает число броней.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            # Без ORDER BY: переведённые брони выпадают из условия, и следующая
+            # пачка — снова начало диапазона индекса, без сортировки всех должников
+            rows = list(rule.queryset(today).order_by().values_list('pk', 'product_id')[:batch_size])
+            if not rows:
+                break
+            ids = [pk for pk, _product_id in rows]
+            # status=source в условии — на случай, если бронь успели изменить вручную
+            updated = Booking.objects.filter(pk__in=ids, status=rule.source).update(status=rule.target)
+            if rule.target not in Booking.BUSY_STATUSES:
+                BookedDay.objects.filter(booking_id__in=ids).delete()
+            availability.invalidate(*{product_id for _pk, product_id in rows})
+        total += updated
+        if len(rows) < batch_size:
+            break
+    return total
+
+
+def bulk_transition(queryset, target):
+    """
+    Переводит брони из queryset в target одним UPDATE — только те, для кого
+    переход разрешён, остальные не трогаются (админка, массовые операции).
+    Подтверждение так не делается: ему нужна проверка и занятие дней —
+    это services.bulk_confirm. Возвращает число переведённых броней.
+    """
+    sources = [status for status, targets in TRANSITIONS.items() if target in targets]
+    if target in Booking.BUSY_STATUSES and any(status not in Booking.BUSY_STATUSES for status in sources):
+        raise BookingStateError(target)
+    queryset = queryset.filter(status__in=sources).order_by()
+    with transaction.atomic():
+        product_ids = list(queryset.values_list('product_id', flat=True).distinct())
+        # До UPDATE: после него брони уже не подпадают под условие queryset
+        if target not in Booking.BUSY_STATUSES:
+            BookedDay.objects.filter(booking__in=queryset.values('pk')).delete()
+        leaving = []
+        if not rollups.counted(target):
+            leaving = rollups.rows_of(queryset.filter(status__in=rollups.COUNTED_STATUSES))
+        updated = queryset.update(status=target)
+        if updated:
+            availability.invalidate(*product_ids)
+            rollups.subtract(leaving)
+    return updated
+
+
+def advance(today=None, batch_size=1000):
+    """Применяет все правила по очереди. Возвращает {имя правила: сколько броней}"""
+    today = today or date.today()
+    counts = {}
+    for rule in RULES:
+        counts[rule.name] = apply_rule(rule, today, batch_size)
+        logger.info('Переход %s (%s → %s): %d', rule.name, rule.source, rule.target, counts[rule.name])
+    return counts
+
+
+def due_counts(today=None):
+    """Сколько броней ждут каждого перехода — без изменений"""
+    today = today or date.today()
+    return {rule.name: rule.queryset(today).count() for rule in RULES}
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings import lifecycle
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит брони по датам: confirmed → active в день начала, active → completed '
+        'после окончания. Запускать раз в сутки (cron) '
+        'или с --every для встроенного расписания'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Броней в одном UPDATE')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, сколько броней ждут перехода')
+        parser.add_argument('--every', type=int, metavar='SECONDS',
+                            help='Не завершаться, а повторять каждые SECONDS секунд')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for name, count in lifecycle.due_counts().items():
+                self.stdout.write(f'[dry-run] {name}: {count}')
+            return
+
+        while True:
+            started = time.monotonic()
+            counts = lifecycle.advance(batch_size=max(options['batch_size'], 1))
+            elapsed = time.monotonic() - started
+            summary = ', '.join(f'{name}: {count}' for name, count in counts.items())
+            self.stdout.write(self.style.SUCCESS(f'Переходы за {elapsed:.2f} с — {summary}'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -1,50 +1,152 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
-from bookings.models import Booking
+from django.db import connections
+from bookings.models import Booking, ReminderLog
+from communications.outbox import send_each
+
+
+# Строк в одном INSERT журнала: по 3 параметра на строку, чтобы не выйти
+# за лимит SQLite на число параметров запроса (999 в старых сборках)
+CLAIM_CHUNK = 300
 
 
 class Command(BaseCommand):
     help = 'Отправляет напоминания арендаторам о возврате товара за 1 день до окончания аренды'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, кому уйдут напоминания')
+        parser.add_argument('--batch-size', type=int, default=100, help='Напоминаний в одной пачке (одна вставка в журнал)')
+        parser.add_argument('--concurrency', type=int, default=1, help='Сколько пачек отправлять параллельно (по SMTP-соединению на поток)')
+
     def handle(self, *args, **options):
         tomorrow = timezone.now().date() + timedelta(days=1)
 
-        # Находим активные бронирования, которые заканчиваются завтра
-        bookings_to_remind = Booking.objects.filter(
-            status='active',
-            end_date=tomorrow
-        ).select_related('renter', 'product')
-
-        reminded_count = 0
-
-        for booking in bookings_to_remind:
-            # Текст письма
-            subject = f'Напоминание: возврат {booking.product.name} завтра'
-            message = (
-                f'Здравствуйте, {booking.renter.username}!\n\n'
-                f'Напоминаем, что аренда товара "{booking.product.name}" заканчивается завтра — {booking.end_date}.\n'
-                f'Пожалуйста, верните товар вовремя, чтобы избежать штрафов.\n\n'
-                f'Если у вас возникли вопросы — свяжитесь с владельцем: {booking.product.owner.email}\n\n'
-                f'С уважением,\n'
-                f'Команда Student Rental Service'
-            )
-
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[booking.renter.email],
-                fail_silently=False,
-            )
-
-            reminded_count += 1
-            self.stdout.write(self.style.SUCCESS(
-                f'Напоминание отправлено арендатору {booking.renter.username} для товара "{booking.product.name}"'
-            ))
+        # Находим активные бронирования, которые заканчиваются завтра и по которым ещё не напоминали
+        bookings_to_remind = list(
+            Booking.objects.filter(status='active', end_date=tomorrow)
+            .exclude(reminders__kind='return')
+            .select_related('renter', 'product__owner')
+            .order_by('pk')
+        )
+
+        if options['dry_run']:
+            for booking in bookings_to_remind:
+                self.stdout.write(f'[dry-run] {booking.renter.email}: "{booking.product.name}"')
+            self.stdout.write(self.style.SUCCESS(f'Будет отправлено напоминаний: {len(bookings_to_remind)}'))
+            return
+
+        batch_size = max(options['batch_size'], 1)
+        batches = [
+            bookings_to_remind[i:i + batch_size]
+            for i in range(0, len(bookings_to_remind), batch_size)
+        ]
 
+        # Каждый поток получает свою долю пачек и одно SMTP-соединение на все
+        workers = max(options['concurrency'], 1)
+        started = time.monotonic()
+        if workers == 1:
+            results = [self.send_batches(batches)]
+        else:
+            shares = [batches[i::workers] for i in range(workers)]
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self.send_batches_in_thread, shares))
+        elapsed = time.monotonic() - started
+
+        reminded_count = sum(sent for sent, _failed in results)
+        failed_count = sum(failed for _sent, failed in results)
+        rate = reminded_count / elapsed if elapsed > 0 else 0
         self.stdout.write(self.style.SUCCESS(
-            f'Всего отправлено напоминаний: {reminded_count}'
-        ))
\ No newline at end of file
+            f'Всего отправлено напоминаний: {reminded_count}, ошибок: {failed_count} '
+            f'за {elapsed:.2f} с ({rate:.1f} писем/с)'
+        ))
+
+    def send_batches(self, batches):
+        """
+        Отправляет пачки через одно SMTP-соединение. Пачка сначала
+        забирается одной вставкой в журнал (claim): параллельный запуск
+        пропустит эти брони. Письма уходят по одному; строка журнала
+        письма с ошибкой удаляется, и оно уйдёт при следующем запуске.
+        Если процесс упадёт между вставкой и отправкой, напоминание
+        пропадёт — лучше, чем прислать его дважды. Возвращает (sent, failed).
+        """
+        sent = failed = 0
+        if not batches:
+            return sent, failed
+        with get_connection(fail_silently=False) as connection:
+            for bookings in batches:
+                claimed = self.claim(bookings)
+                released = []
+                messages = (
+                    (booking, self.build_message(booking))
+                    for booking in bookings if booking.pk in claimed
+                )
+                for booking, error in send_each(connection, messages):
+                    if error is not None:
+                        self.stderr.write(f'Не удалось отправить напоминание по брони {booking.pk}: {error}')
+                        released.append(booking.pk)
+                        continue
+                    sent += 1
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Напоминание отправлено арендатору {booking.renter.username} для товара "{booking.product.name}"'
+                    ))
+                if released:
+                    ReminderLog.objects.filter(booking_id__in=released, kind='return').delete()
+                    failed += len(released)
+        return sent, failed
+
+    def claim(self, bookings):
+        """
+        Пишет в журнал строки для броней одним INSERT ... ON CONFLICT DO
+        NOTHING RETURNING и возвращает id броней, которые забрал этот запуск
+        (SQLite 3.35+ и PostgreSQL). Уже записанные другим запуском не возвращаются.
+        Большая пачка вставляется кусками по CLAIM_CHUNK строк.
+        """
+        if not bookings:
+            return set()
+        db = connections[ReminderLog.objects.db]
+        table = db.ops.quote_name(ReminderLog._meta.db_table)
+        sent_at = db.ops.adapt_datetimefield_value(timezone.now())
+        claimed = set()
+        with db.cursor() as cursor:
+            for i in range(0, len(bookings), CLAIM_CHUNK):
+                chunk = bookings[i:i + CLAIM_CHUNK]
+                values = ', '.join(['(%s, %s, %s)'] * len(chunk))
+                params = [value for booking in chunk for value in (booking.pk, 'return', sent_at)]
+                cursor.execute(
+                    f'INSERT INTO {table} (booking_id, kind, sent_at) VALUES {values} '
+                    f'ON CONFLICT (booking_id, kind) DO NOTHING RETURNING booking_id',
+                    params,
+                )
+                claimed.update(row[0] for row in cursor.fetchall())
+        return claimed
+
+    def send_batches_in_thread(self, batches):
+        try:
+            return self.send_batches(batches)
+        finally:
+            # У каждого потока своё соединение с БД — закрываем его
+            connections.close_all()
+
+    def build_message(self, booking):
+        # Текст письма
+        subject = f'Напоминание: возврат {booking.product.name} завтра'
+        message = (
+            f'Здравствуйте, {booking.renter.username}!\n\n'
+            f'Напоминаем, что аренда товара "{booking.product.name}" заканчивается завтра — {booking.end_date}.\n'
+            f'Пожалуйста, верните товар вовремя, чтобы избежать штрафов.\n\n'
+            f'Если у вас возникли вопросы — свяжитесь с владельцем: {booking.product.owner.email}\n\n'
+            f'С уважением,\n'
+            f'Команда Student Rental Service'
+        )
+        return EmailMessage(
+            subject=subject,
+            body=message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[booking.renter.email],
+        )
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_remove_booking_deposit_held_booking_created_at_and_more'),
+        ('catalog', '0005_product_product_available_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['product', 'status', 'end_date', 'start_date'], name='booking_overlap_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['renter', '-start_date'], name='booking_renter_start_idx'),
+        ),
+    ]
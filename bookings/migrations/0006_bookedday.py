@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:54
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_booked_days(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    BookedDay = apps.get_model('bookings', 'BookedDay')
+    days = []
+    bookings = Booking.objects.filter(status__in=['confirmed', 'active']).order_by('created_at')
+    for booking in bookings.iterator():
+        day = booking.start_date
+        while day <= booking.end_date:
+            days.append(BookedDay(product_id=booking.product_id, booking_id=booking.pk, day=day))
+            day += timedelta(days=1)
+    # Уже существующие пересечения не чиним: день достаётся более ранней брони
+    BookedDay.objects.bulk_create(days, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_booking_overlap_idx_and_more'),
+        ('catalog', '0005_product_product_available_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookedDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_days', to='bookings.booking')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_days', to='catalog.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='booked_day_product_day_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_booked_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_reminderlog'),
+        ('catalog', '0005_product_product_available_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_renter_start_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['renter', '-start_date', '-id'], name='booking_renter_start_idx'),
+        ),
+    ]
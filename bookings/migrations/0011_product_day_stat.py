@@ -0,0 +1,110 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:32
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Брони, которые входят в сводку (bookings/rollups.py, COUNTED_STATUSES на момент миграции)
+COUNTED_STATUSES = ('confirmed', 'active', 'completed')
+
+VENDOR_SQL = {
+    'sqlite': {
+        'next_day': "date(day, '+1 day')",
+        'paid_days': 'MAX(CAST(julianday(end_date) - julianday(start_date) AS INTEGER), 1)',
+    },
+    'postgresql': {
+        'next_day': 'day + 1',
+        'paid_days': 'GREATEST(end_date - start_date, 1)',
+    },
+}
+
+
+def fill_product_day_stats(apps, schema_editor):
+    """
+    Сводка по уже существующим броням. Тот же INSERT ... SELECT, что и
+    rollups.rebuild() сейчас, но зафиксированный здесь: миграция не должна
+    зависеть от того, как модуль изменится потом. На других СУБД — циклом по броням.
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    Product = apps.get_model('catalog', 'Product')
+    ProductDayStat = apps.get_model('bookings', 'ProductDayStat')
+    connection = schema_editor.connection
+    if connection.vendor not in VENDOR_SQL:
+        fill_product_day_stats_orm(Booking, ProductDayStat)
+        return
+
+    sql = VENDOR_SQL[connection.vendor]
+    quote = connection.ops.quote_name
+    stat, booking, product = (quote(model._meta.db_table) for model in (ProductDayStat, Booking, Product))
+    marks = ', '.join(['%s'] * len(COUNTED_STATUSES))
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            INSERT INTO {stat} (product_id, owner_id, day, bookings, revenue, rental_days, occupied_days)
+            WITH RECURSIVE span(product_id, day, end_date) AS (
+                SELECT product_id, start_date, end_date FROM {booking} WHERE status IN ({marks})
+                UNION ALL
+                SELECT product_id, {sql['next_day']}, end_date FROM span WHERE day < end_date
+            )
+            SELECT parts.product_id, product.owner_id, parts.day, SUM(parts.bookings), SUM(parts.revenue),
+                   SUM(parts.rental_days), SUM(parts.occupied_days)
+            FROM (
+                SELECT product_id, day, 0 AS bookings, 0 AS revenue, 0 AS rental_days, COUNT(*) AS occupied_days
+                FROM span GROUP BY product_id, day
+                UNION ALL
+                SELECT product_id, start_date, COUNT(*), SUM(total_cost), SUM({sql['paid_days']}), 0
+                FROM {booking} WHERE status IN ({marks}) GROUP BY product_id, start_date
+            ) AS parts
+            JOIN {product} AS product ON product.id = parts.product_id
+            GROUP BY parts.product_id, product.owner_id, parts.day
+        ''', [*COUNTED_STATUSES, *COUNTED_STATUSES])
+
+
+def fill_product_day_stats_orm(Booking, ProductDayStat):
+    stats = {}
+    bookings = Booking.objects.filter(status__in=COUNTED_STATUSES).values_list(
+        'product_id', 'product__owner_id', 'start_date', 'end_date', 'total_cost',
+    )
+    for product_id, owner_id, start, end, cost in bookings.iterator():
+        first = stats.setdefault((product_id, start), ProductDayStat(product_id=product_id, owner_id=owner_id, day=start))
+        first.bookings += 1
+        first.revenue += cost
+        first.rental_days += max((end - start).days, 1)
+        day = start
+        while day <= end:
+            stats.setdefault((product_id, day), ProductDayStat(product_id=product_id, owner_id=owner_id, day=day))
+            stats[product_id, day].occupied_days += 1
+            day += timedelta(days=1)
+    ProductDayStat.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_booking_start_idx'),
+        ('catalog', '0008_product_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductDayStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('bookings', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('rental_days', models.IntegerField(default=0)),
+                ('occupied_days', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_stats', to='catalog.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'day'], name='product_day_stat_owner_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='product_day_stat_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_product_day_stats, migrations.RunPython.noop),
+    ]
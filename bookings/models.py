@@ -10,6 +10,8 @@ class Booking(models.Model):
         ('completed', 'Завершено'),
         ('cancelled', 'Отменено'),
     ]
+    # Статусы, при которых даты считаются занятыми
+    BUSY_STATUSES = ('confirmed', 'active')
 
     renter = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -23,5 +25,88 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Проверка пересечения дат: product + status IN (...) + диапазон дат.
+            # end_date первым из дат: прошедшие брони отсекаются диапазоном по индексу
+            models.Index(fields=['product', 'status', 'end_date', 'start_date'], name='booking_overlap_idx'),
+            # my_bookings и профиль: брони арендатора по дате начала (id — для стабильного порядка страниц)
+            models.Index(fields=['renter', '-start_date', '-id'], name='booking_renter_start_idx'),
+            # Переходы по дате (lifecycle.py): брони в статусе, у которых наступило начало/конец
+            models.Index(fields=['status', 'start_date'], name='booking_status_start_idx'),
+            models.Index(fields=['status', 'end_date'], name='booking_status_end_idx'),
+            # date_hierarchy в админке: пробы по диапазонам дат начала
+            models.Index(fields=['start_date'], name='booking_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.renter.username} → {self.product.name} ({self.status})"
+
+
+class BookedDay(models.Model):
+    """
+    Занятый день товара — по строке на каждый день подтверждённой/активной
+    брони. Уникальность (product, day) в базе не даёт подтвердить две
+    пересекающиеся брони даже при одновременных запросах.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='booked_days')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='booked_days')
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='booked_day_product_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.day}"
+
+
+class ReminderLog(models.Model):
+    """Журнал отправленных напоминаний: повторный запуск команды их пропускает"""
+    KIND_CHOICES = [
+        ('return', 'Напоминание о возврате'),
+    ]
+
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='return')
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['booking', 'kind'], name='reminder_log_booking_kind_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.booking_id}: {self.kind}"
+
+
+
+class ProductDayStat(models.Model):
+    """
+    Сводка по товару за день для кабинета владельца (bookings/rollups.py).
+    Учитываются брони, которые состоялись или состоятся: confirmed, active,
+    completed. Бронь относится к дню начала (bookings, revenue, rental_days)
+    и занимает каждый свой день (occupied_days). owner — копия владельца
+    товара, чтобы кабинет читал сводку по индексу без JOIN.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='day_stats')
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    bookings = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Оплачиваемых дней (как в catalog/pricing.rental_days) у броней, начавшихся в этот день
+    rental_days = models.IntegerField(default=0)
+    # Сколько броней занимают товар в этот день (0 или 1)
+    occupied_days = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='product_day_stat_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'day'], name='product_day_stat_owner_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.renter.username} → {self.product.name} ({self.status})"
\ No newline at end of file
+        return f"{self.product_id}: {self.day}"
@@ -0,0 +1,261 @@
+# bookings/rollups.py
+"""
+Сводка для кабинета владельца: доход, число и средняя длина аренд,
+загрузка товаров — по дням в ProductDayStat, а не по всем броням.
+
+Вклад брони в сводку есть, пока она в одном из COUNTED_STATUSES: +1 бронь,
+её стоимость и оплачиваемые дни — в день начала, +1 занятый день — в
+каждый её день. Сводка обновляется при смене статуса: сохранение брони
+(signals.py) и set-based переходы (services.py, lifecycle.py) вызывают
+add()/subtract() в той же транзакции. Переходы по дате (confirmed → active
+→ completed) вклад не меняют.
+
+rebuild() пересчитывает всё одним INSERT ... SELECT (manage.py
+rebuild_booking_stats) — после загрузки данных в обход ORM или если
+сводка разошлась с бронями.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from catalog.models import Product
+from catalog.pricing import rental_days
+from .models import Booking, ProductDayStat
+
+# Брони, которые состоялись или состоятся
+COUNTED_STATUSES = ('confirmed', 'active', 'completed')
+# Поля брони, от которых зависит её вклад
+STATE_FIELDS = ('status', 'product_id', 'start_date', 'end_date', 'total_cost')
+COUNTERS = ('bookings', 'revenue', 'rental_days', 'occupied_days')
+
+
+def counted(status):
+    return status in COUNTED_STATUSES
+
+
+def row(booking):
+    """Вклад брони: (product_id, start_date, end_date, total_cost)"""
+    return booking.product_id, booking.start_date, booking.end_date, booking.total_cost
+
+
+def rows_of(queryset):
+    return list(queryset.order_by().values_list('product_id', 'start_date', 'end_date', 'total_cost'))
+
+
+def _deltas(rows):
+    """{(product_id, day): [bookings, revenue, rental_days, occupied_days]} по вкладам rows"""
+    deltas = defaultdict(lambda: [0, Decimal(0), 0, 0])
+    for product_id, start, end, cost in rows:
+        first = deltas[product_id, start]
+        first[0] += 1
+        first[1] += cost
+        first[2] += rental_days(start, end)
+        day = start
+        while day <= end:
+            deltas[product_id, day][3] += 1
+            day += timedelta(days=1)
+    return deltas
+
+
+def add(rows):
+    """Добавляет вклад броней rows: строки дней создаются или увеличиваются (upsert)"""
+    deltas = _deltas(rows)
+    if not deltas:
+        return
+    owners = dict(Product.objects.filter(pk__in={product_id for product_id, _day in deltas}).values_list('pk', 'owner_id'))
+    table = connection.ops.quote_name(ProductDayStat._meta.db_table)
+    increments = ', '.join(f'{name} = {table}.{name} + excluded.{name}' for name in COUNTERS)
+    with connection.cursor() as cursor:
+        # ON CONFLICT ... DO UPDATE одинаково понимают SQLite (3.24+) и PostgreSQL
+        cursor.executemany(
+            f'INSERT INTO {table} (product_id, owner_id, day, {", ".join(COUNTERS)}) '
+            f'VALUES (%s, %s, %s, %s, %s, %s, %s) '
+            f'ON CONFLICT (product_id, day) DO UPDATE SET {increments}',
+            [(product_id, owners[product_id], day, *values) for (product_id, day), values in deltas.items()],
+        )
+
+
+def subtract(rows):
+    """
+    Убирает вклад броней rows. Только UPDATE существующих строк: при
+    каскадном удалении товара его строки сводки уже могут быть удалены.
+    Опустевшие дни удаляются.
+    """
+    deltas = _deltas(rows)
+    if not deltas:
+        return
+    table = connection.ops.quote_name(ProductDayStat._meta.db_table)
+    decrements = ', '.join(f'{name} = {name} - %s' for name in COUNTERS)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {table} SET {decrements} WHERE product_id = %s AND day = %s',
+            [(*values, product_id, day) for (product_id, day), values in deltas.items()],
+        )
+    days = [day for _product_id, day in deltas]
+    ProductDayStat.objects.filter(
+        product_id__in={product_id for product_id, _day in deltas}, day__gte=min(days), day__lte=max(days),
+        bookings=0, occupied_days=0,
+    ).delete()
+
+
+def _tracked(update_fields):
+    return update_fields is None or bool(set(update_fields) & {'status', 'product', 'start_date', 'end_date', 'total_cost'})
+
+
+def remember(booking, update_fields=None):
+    """pre_save: запоминает вклад брони до сохранения (один запрос по pk)"""
+    booking._rollup_before = None
+    if booking._state.adding or not _tracked(update_fields):
+        return
+    before = Booking.objects.filter(pk=booking.pk).values_list(*STATE_FIELDS).first()
+    if before is not None and counted(before[0]):
+        booking._rollup_before = before[1:]
+
+
+def booking_saved(booking, update_fields=None):
+    """post_save: заменяет прежний вклад брони новым, если он изменился"""
+    if not _tracked(update_fields):
+        return
+    before = getattr(booking, '_rollup_before', None)
+    after = row(booking) if counted(booking.status) else None
+    if before == after:
+        return
+    if before is not None:
+        subtract([before])
+    if after is not None:
+        add([after])
+    booking._rollup_before = after
+
+
+_VENDOR_SQL = {
+    'sqlite': {
+        'next_day': "date(day, '+1 day')",
+        'paid_days': 'MAX(CAST(julianday(end_date) - julianday(start_date) AS INTEGER), 1)',
+    },
+    'postgresql': {
+        'next_day': 'day + 1',
+        'paid_days': 'GREATEST(end_date - start_date, 1)',
+    },
+}
+
+
+def rebuild():
+    """
+    Пересчитывает сводку по всем броням: DELETE и один INSERT ... SELECT.
+    Дни броней разворачивает рекурсивный CTE — в базе, без загрузки
+    броней в Python. Возвращает число строк сводки.
+    """
+    sql = _VENDOR_SQL[connection.vendor]
+    quote = connection.ops.quote_name
+    stat, booking, product = (quote(model._meta.db_table) for model in (ProductDayStat, Booking, Product))
+    marks = ', '.join(['%s'] * len(COUNTED_STATUSES))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {stat}')
+        cursor.execute(f'''
+            INSERT INTO {stat} (product_id, owner_id, day, {", ".join(COUNTERS)})
+            WITH RECURSIVE span(product_id, day, end_date) AS (
+                SELECT product_id, start_date, end_date FROM {booking} WHERE status IN ({marks})
+                UNION ALL
+                SELECT product_id, {sql['next_day']}, end_date FROM span WHERE day < end_date
+            )
+            SELECT parts.product_id, product.owner_id, parts.day, SUM(parts.bookings), SUM(parts.revenue),
+                   SUM(parts.rental_days), SUM(parts.occupied_days)
+            FROM (
+                SELECT product_id, day, 0 AS bookings, 0 AS revenue, 0 AS rental_days, COUNT(*) AS occupied_days
+                FROM span GROUP BY product_id, day
+                UNION ALL
+                SELECT product_id, start_date, COUNT(*), SUM(total_cost), SUM({sql['paid_days']}), 0
+                FROM {booking} WHERE status IN ({marks}) GROUP BY product_id, start_date
+            ) AS parts
+            JOIN {product} AS product ON product.id = parts.product_id
+            GROUP BY parts.product_id, product.owner_id, parts.day
+        ''', [*COUNTED_STATUSES, *COUNTED_STATUSES])
+        return cursor.rowcount
+
+
+def _months_back(today, months):
+    """Первые числа последних months месяцев, от старого к текущему"""
+    first = today.replace(day=1)
+    result = []
+    for _ in range(months):
+        result.append(first)
+        first = (first - timedelta(days=1)).replace(day=1)
+    return result[::-1]
+
+
+def _ratio(part, whole):
+    return round(100 * part / whole, 1) if whole else 0.0
+
+
+def _average(total, count):
+    return round(total / count, 1) if count else 0.0
+
+
+def owner_dashboard(owner, period_days=90, months=12, today=None):
+    """
+    Данные кабинета владельца — только из сводки и списка его товаров:
+    число строк не зависит от истории броней, только от окна и числа товаров.
+
+    * months — по месяцам за последние months месяцев: брони, доход,
+      средняя длина аренды, загрузка;
+    * products — по товарам за последние period_days дней;
+    * totals — итоги за period_days; upcoming — брони с началом позже сегодня.
+    """
+    today = today or timezone.localdate()
+    products = [
+        {'pk': pk, 'name': name}
+        for pk, name in Product.objects.filter(owner=owner).order_by('name', 'pk').values_list('pk', 'name')
+    ]
+    stats = ProductDayStat.objects.filter(owner=owner).order_by()
+    sums = {name: Sum(name) for name in COUNTERS}
+
+    month_starts = _months_back(today, months)
+    per_day = stats.filter(day__gte=month_starts[0], day__lte=today).values('day').annotate(**sums)
+    by_month = {start: dict.fromkeys(COUNTERS, 0) for start in month_starts}
+    for values in per_day:
+        bucket = by_month[values['day'].replace(day=1)]
+        for name in COUNTERS:
+            bucket[name] += values[name] or 0
+    month_rows = []
+    for start in month_starts:
+        end = min((start + timedelta(days=31)).replace(day=1) - timedelta(days=1), today)
+        bucket = by_month[start]
+        month_rows.append({
+            'month': start, **bucket,
+            'average_days': _average(bucket['rental_days'], bucket['bookings']),
+            'utilization': _ratio(bucket['occupied_days'], len(products) * ((end - start).days + 1)),
+        })
+
+    period_start = today - timedelta(days=period_days - 1)
+    per_product = {
+        values['product_id']: values
+        for values in stats.filter(day__gte=period_start, day__lte=today).values('product_id').annotate(**sums)
+    }
+    product_rows = []
+    totals = dict.fromkeys(COUNTERS, 0)
+    for product in products:
+        values = per_product.get(product['pk'], {})
+        for name in COUNTERS:
+            totals[name] += values.get(name) or 0
+        product_rows.append({
+            **product, **{name: values.get(name) or 0 for name in COUNTERS},
+            'average_days': _average(values.get('rental_days') or 0, values.get('bookings') or 0),
+            'utilization': _ratio(values.get('occupied_days') or 0, period_days),
+        })
+    product_rows.sort(key=lambda item: (-item['utilization'], item['name']))
+    totals['average_days'] = _average(totals['rental_days'], totals['bookings'])
+    totals['utilization'] = _ratio(totals['occupied_days'], len(products) * period_days)
+
+    upcoming = stats.filter(day__gt=today).aggregate(bookings=Sum('bookings'), revenue=Sum('revenue'))
+    return {
+        'months': month_rows,
+        'products': product_rows,
+        'totals': totals,
+        'upcoming': {name: value or 0 for name, value in upcoming.items()},
+        'period_days': period_days,
+        'period_start': period_start,
+    }
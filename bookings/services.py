@@ -0,0 +1,138 @@
+# bookings/services.py
+"""
+Смена статусов брони владельцем. Подтверждение проверяет и занимает даты
+в одной транзакции: строки BookedDay с уникальным (product, day)
+гарантируют, что из пересекающихся запросов подтвердится только один.
+
+bulk_confirm/bulk_decline обрабатывают одну или много броней сразу: число
+запросов к БД не зависит от числа броней.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+
+from catalog.models import Product
+from . import availability, rollups
+from .lifecycle import can_transition
+from .models import BookedDay, Booking
+
+
+class BookingConflict(Exception):
+    """Даты уже заняты другой бронью"""
+
+
+def booking_days(booking):
+    day = booking.start_date
+    while day <= booking.end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def sync_booked_days(booking):
+    """
+    Приводит BookedDay в соответствие со статусом брони: занимает дни для
+    confirmed/active и освобождает для остальных. При пересечении с другой
+    бронью падает с IntegrityError.
+    """
+    if booking.status not in Booking.BUSY_STATUSES:
+        BookedDay.objects.filter(booking=booking).delete()
+        return
+    days = set(booking_days(booking))
+    taken = set(BookedDay.objects.filter(booking=booking).values_list('day', flat=True))
+    if taken - days:
+        # Даты брони изменились — лишние дни освобождаем
+        BookedDay.objects.filter(booking=booking, day__in=taken - days).delete()
+    BookedDay.objects.bulk_create([
+        BookedDay(product_id=booking.product_id, booking=booking, day=day)
+        for day in sorted(days - taken)
+    ])
+
+
+@dataclass
+class BulkResult:
+    """Итог массового действия: что применено, что нет и почему"""
+    applied: list = field(default_factory=list)
+    conflicts: list = field(default_factory=list)
+    skipped: list = field(default_factory=list)
+
+
+def _locked_bookings(booking_ids, owner):
+    bookings = list(
+        Booking.objects.select_for_update()
+        .select_related('product', 'renter')
+        .filter(pk__in=booking_ids, product__owner=owner)
+        .order_by('start_date', 'pk')
+    )
+    # Блокируем товары: на PostgreSQL подтверждения одного товара идут по очереди
+    list(Product.objects.select_for_update().filter(pk__in={b.product_id for b in bookings}).values_list('pk'))
+    return bookings
+
+
+def bulk_confirm(booking_ids, owner):
+    """
+    Подтверждает запросы владельца пачкой. Занятые дни всех товаров читаются
+    одним запросом; из пересекающихся между собой запросов подтверждается
+    более ранний. Статусы — одним UPDATE, дни — одним bulk_create.
+    """
+    result = BulkResult()
+    with transaction.atomic():
+        bookings = _locked_bookings(booking_ids, owner)
+        pending = []
+        for booking in bookings:
+            (pending if can_transition(booking.status, 'confirmed') else result.skipped).append(booking)
+        if not pending:
+            return result
+
+        taken = set(
+            BookedDay.objects.filter(
+                product_id__in={b.product_id for b in pending},
+                day__gte=min(b.start_date for b in pending),
+                day__lte=max(b.end_date for b in pending),
+            ).values_list('product_id', 'day')
+        )
+        days = []
+        for booking in pending:
+            wanted = {(booking.product_id, day) for day in booking_days(booking)}
+            if wanted & taken:
+                result.conflicts.append(booking)
+                continue
+            taken |= wanted
+            days.extend(BookedDay(product_id=booking.product_id, booking=booking, day=day) for _, day in wanted)
+            booking.status = 'confirmed'
+            result.applied.append(booking)
+
+        if result.applied:
+            try:
+                with transaction.atomic():
+                    BookedDay.objects.bulk_create(days)
+            except IntegrityError:
+                # Дни заняли в обход блокировок (не должно случаться) — не подтверждаем ничего
+                raise BookingConflict(result.applied)
+            Booking.objects.filter(pk__in=[b.pk for b in result.applied]).update(status='confirmed')
+            # update() не шлёт сигналов — кэш занятости и сводку обновляем сами
+            availability.invalidate(*{b.product_id for b in result.applied})
+            rollups.add([rollups.row(b) for b in result.applied])
+    return result
+
+
+def bulk_decline(booking_ids, owner):
+    """Отклоняет запросы (и отменяет подтверждённые) пачкой, освобождая даты"""
+    result = BulkResult()
+    leaving = []
+    with transaction.atomic():
+        for booking in _locked_bookings(booking_ids, owner):
+            if can_transition(booking.status, 'cancelled'):
+                if rollups.counted(booking.status):
+                    leaving.append(rollups.row(booking))
+                booking.status = 'cancelled'
+                result.applied.append(booking)
+            else:
+                result.skipped.append(booking)
+        if result.applied:
+            ids = [b.pk for b in result.applied]
+            BookedDay.objects.filter(booking_id__in=ids).delete()
+            Booking.objects.filter(pk__in=ids).update(status='cancelled')
+            availability.invalidate(*{b.product_id for b in result.applied})
+            rollups.subtract(leaving)
+    return result
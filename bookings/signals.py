@@ -0,0 +1,41 @@
+# bookings/signals.py
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import availability, rollups
+from .models import Booking
+from .services import sync_booked_days
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created=False, raw=False, **kwargs):
+    """Занимает или освобождает дни брони в BookedDay в той же транзакции"""
+    if raw or (created and instance.status not in Booking.BUSY_STATUSES):
+        return
+    sync_booked_days(instance)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_availability(sender, instance, **kwargs):
+    """Любое изменение брони сбрасывает кэш занятости товара"""
+    availability.invalidate(instance.product_id)
+
+
+@receiver(pre_save, sender=Booking)
+def remember_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        rollups.remember(instance, update_fields)
+
+
+@receiver(post_save, sender=Booking)
+def update_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Сводка владельца (rollups.py) — в той же транзакции, что и бронь"""
+    if not raw:
+        rollups.booking_saved(instance, update_fields)
+
+
+@receiver(post_delete, sender=Booking)
+def remove_from_rollup(sender, instance, **kwargs):
+    if rollups.counted(instance.status):
+        rollups.subtract([rollups.row(instance)])
@@ -1,3 +1,797 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import os
+import random
+import tempfile
+import zipfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.apps import apps
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.models import Product
+from communications.models import OutboundEmail
+from rental_service.testing import QueryBudgetMixin, QueryPlanAssertionsMixin, queryset_plan
+from users.models import User
+from .forms import BookingCreateForm
+from .management.commands.send_return_reminders import Command as SendReturnRemindersCommand
+from reviews.models import Review
+from . import availability, lifecycle, rollups
+from .availability import is_range_free
+from .models import BookedDay, Booking, ProductDayStat, ReminderLog
+from .lifecycle import BookingStateError
+from .services import BookingConflict, bulk_confirm, bulk_decline
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN проверяется только на SQLite')
+class BookingQueryPlanTests(QueryPlanAssertionsMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.product = Product.objects.create(
+            owner=cls.owner, name='Калькулятор', description='-', daily_price=50, deposit=500,
+        )
+        today = date.today()
+        Booking.objects.bulk_create([
+            Booking(renter=cls.renter, product=cls.product, start_date=today + timedelta(days=i * 3),
+                    end_date=today + timedelta(days=i * 3 + 2), total_cost=100, status=status)
+            for i, status in enumerate(['pending', 'confirmed', 'active', 'completed', 'cancelled'] * 4)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_form_overlap_check_uses_overlap_index(self):
+        start = date.today() + timedelta(days=1)
+        data = {'start_date': start, 'end_date': start + timedelta(days=3)}
+        # Первая проверка строит карту занятости одним запросом по индексу
+        plans = self.captured_plans(BookingCreateForm(data, product=self.product).is_valid, 'bookings_booking')
+        self.assertEqual(len(plans), 1)
+        self.assertUsesIndex(plans[0], 'bookings_booking', 'booking_overlap_idx')
+        # Повторная — уже из кэша, без запросов к броням
+        plans = self.captured_plans(BookingCreateForm(data, product=self.product).is_valid, 'bookings_booking')
+        self.assertEqual(plans, [])
+
+    def test_create_booking_overlap_check_uses_overlap_index(self):
+        start = date.today() + timedelta(days=1)
+        queryset = self.product.booking_set.filter(
+            status__in=['confirmed', 'active'], start_date__lte=start + timedelta(days=3), end_date__gte=start,
+        )
+        self.assertUsesIndex(queryset_plan(queryset), 'bookings_booking', 'booking_overlap_idx')
+
+    def test_my_bookings_uses_renter_index(self):
+        self.client.force_login(self.renter)
+        plans = self.captured_plans(lambda: self.client.get(reverse('bookings:my_bookings')), 'bookings_booking')
+        self.assertTrue(plans)
+        # Последний запрос — сама страница (первый — COUNT(*) пагинатора)
+        self.assertUsesIndex(plans[-1], 'bookings_booking', 'booking_renter_start_idx')
+        self.assertFalse(any('TEMP B-TREE' in line for line in plans[-1]), '\n'.join(plans[-1]))
+
+    def test_owner_requests_has_no_full_scan(self):
+        self.client.force_login(self.owner)
+        plans = self.captured_plans(lambda: self.client.get(reverse('bookings:owner_requests')), 'bookings_booking')
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertNoFullScan(plan, 'bookings_booking')
+            self.assertNoFullScan(plan, 'catalog_product')
+
+
+class BookingPagesQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Число запросов на страницах броней не зависит от числа строк"""
+
+    # сессия + пользователь + COUNT(*) + страница
+    BUDGET = 5
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        self.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+
+    def add_bookings(self, count):
+        today = date.today()
+        products = Product.objects.bulk_create([
+            Product(owner=self.owner, name=f'Товар {i}', description='-', daily_price=10, deposit=100)
+            for i in range(count)
+        ])
+        bookings = Booking.objects.bulk_create([
+            Booking(renter=self.renter, product=product, start_date=today - timedelta(days=i + 2),
+                    end_date=today - timedelta(days=i + 1), total_cost=10, status='completed')
+            for i, product in enumerate(products)
+        ])
+        Review.objects.bulk_create([
+            Review(booking=booking, reviewer=self.renter, landlord=self.owner, rating=5)
+            for booking in bookings[::2]
+        ])
+
+    def assertFlatQueryCount(self, user, url):
+        self.client.force_login(user)
+        self.add_bookings(2)
+        _, few = self.assertResponseWithinBudget(self.client, url, self.BUDGET)
+        self.add_bookings(40)
+        _, many = self.assertResponseWithinBudget(self.client, url, self.BUDGET)
+        self.assertEqual(few, many)
+
+    def test_my_bookings(self):
+        self.assertFlatQueryCount(self.renter, reverse('bookings:my_bookings'))
+
+    def test_owner_requests(self):
+        self.assertFlatQueryCount(self.owner, reverse('bookings:owner_requests'))
+
+    def test_pages_are_paginated(self):
+        self.client.force_login(self.renter)
+        self.add_bookings(45)
+        response = self.client.get(reverse('bookings:my_bookings'), {'page': 3})
+        self.assertEqual(len(response.context['bookings']), 5)
+
+
+class BookingConfirmationConcurrencyTests(TransactionTestCase):
+    """Параллельные подтверждения пересекающихся броней не должны давать двойной аренды"""
+
+    workers = 8
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        self.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        self.product = Product.objects.create(
+            owner=self.owner, name='Фотоаппарат', description='-', daily_price=300, deposit=3000,
+        )
+        start = date.today() + timedelta(days=5)
+        # 40 запросов: каждый пересекается хотя бы с несколькими другими
+        self.bookings = [
+            Booking.objects.create(
+                renter=self.renter, product=self.product, total_cost=900,
+                start_date=start + timedelta(days=i % 10), end_date=start + timedelta(days=i % 10 + 3),
+            )
+            for i in range(40)
+        ]
+
+    def _confirm(self, booking_id):
+        try:
+            for _attempt in range(200):
+                try:
+                    result = bulk_confirm([booking_id], self.owner)
+                except BookingConflict:
+                    return 'conflict'
+                except OperationalError:
+                    # SQLite: база занята другой транзакцией — повторяем
+                    time.sleep(random.uniform(0.001, 0.02))
+                    continue
+                return 'confirmed' if result.applied else 'conflict'
+            return 'locked'
+        finally:
+            connections.close_all()
+
+    def test_parallel_confirmations_never_overlap(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self._confirm, [b.pk for b in self.bookings]))
+
+        self.assertIn('confirmed', results)
+        confirmed = list(
+            Booking.objects.filter(product=self.product, status='confirmed').order_by('start_date')
+        )
+        self.assertEqual(len(confirmed), results.count('confirmed'))
+        for previous, current in zip(confirmed, confirmed[1:]):
+            self.assertLess(previous.end_date, current.start_date)
+        self.assertEqual(
+            BookedDay.objects.filter(product=self.product).count(),
+            sum((b.end_date - b.start_date).days + 1 for b in confirmed),
+        )
+
+
+class AvailabilityCacheTests(TestCase):
+    """Карта занятости (availability.py) против броней в базе"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.product = Product.objects.create(
+            owner=cls.owner, name='Проектор', description='-', daily_price=100, deposit=500,
+        )
+        cls.today = date.today()
+
+    def setUp(self):
+        cache.clear()
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def book(self, start, end, status='confirmed'):
+        return Booking.objects.create(
+            renter=self.renter, product=self.product, total_cost=300, status=status,
+            start_date=self.day(start), end_date=self.day(end),
+        )
+
+    def test_map_answers_like_the_bookings(self):
+        # Касающиеся брони, бронь на один день, запрос без подтверждения и отменённая
+        self.book(10, 12)
+        self.book(13, 15, status='active')
+        self.book(20, 20)
+        self.book(16, 18, status='pending')
+        self.book(22, 25, status='cancelled')
+        origin = self.today.replace(day=1)
+        before = (origin - self.today).days
+        self.book(before - 10, before - 5)  # закончилась до начала карты
+        self.book(before - 2, before)  # заходит на первый день карты
+
+        availability_map = availability.AvailabilityMap.build(self.product.pk, origin)
+        cases = {
+            (9, 9): True, (9, 10): False, (12, 13): False, (15, 15): False, (16, 19): True,
+            (20, 20): False, (19, 21): False, (21, 21): True, (22, 25): True,
+        }
+        for (start, end), free in cases.items():
+            with self.subTest(start=start, end=end):
+                self.assertEqual(availability_map.is_free(self.day(start), self.day(end)), free)
+                self.assertEqual(availability.is_range_free(self.product.pk, self.day(start), self.day(end)), free)
+        self.assertFalse(availability_map.is_free(origin, origin))
+        self.assertTrue(availability_map.is_free(origin + timedelta(days=1), origin + timedelta(days=1)))
+        # Соседние диапазоны склеены, закончившиеся до начала карты не попали
+        self.assertEqual(availability_map.busy_ranges(self.day(1)), [(self.day(10), self.day(15)), (self.day(20), self.day(20))])
+        self.assertEqual(availability_map.busy_ranges()[0], (self.day(before - 2), origin))
+        self.assertEqual(availability_map.busy_ranges(self.day(15), self.day(16)), [(self.day(10), self.day(15))])
+        self.assertEqual(availability_map.busy_ranges(self.day(16), self.day(19)), [])
+
+    def test_merge_ranges(self):
+        d = self.day
+        self.assertEqual(
+            availability.merge_ranges([(d(3), d(8)), (d(1), d(5)), (d(9), d(9)), (d(11), d(12)), (d(11), d(11))]),
+            [(d(1), d(9)), (d(11), d(12))],
+        )
+
+    def test_cached_map_and_fallback_beyond_horizon(self):
+        far = availability.HORIZON_DAYS + 40
+        self.book(far, far + 2)
+        self.book(5, 6)
+        self.assertFalse(availability.is_range_free(self.product.pk, self.day(5), self.day(5)))
+        # Карта в кэше — в пределах горизонта без запросов к базе
+        with self.assertNumQueries(0):
+            self.assertTrue(availability.is_range_free(self.product.pk, self.day(7), self.day(9)))
+            self.assertEqual(availability.busy_ranges(self.product.pk, self.day(0), self.day(30)), [(self.day(5), self.day(6))])
+        # За горизонтом карты — один запрос к броням
+        with self.assertNumQueries(1):
+            self.assertFalse(availability.is_range_free(self.product.pk, self.day(far + 1), self.day(far + 5)))
+        with self.assertNumQueries(1):
+            self.assertTrue(availability.is_range_free(self.product.pk, self.day(far + 3), self.day(far + 5)))
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                availability.busy_ranges(self.product.pk, self.day(0), self.day(far + 10)),
+                [(self.day(5), self.day(6)), (self.day(far), self.day(far + 2))],
+            )
+
+    def renter_can_book(self, start, end):
+        form = BookingCreateForm({'start_date': self.day(start), 'end_date': self.day(end)}, product=self.product)
+        return form.is_valid()
+
+    def test_status_changes_invalidate_cached_map(self):
+        first = self.book(10, 12, status='pending')
+        second = self.book(11, 13, status='pending')
+        self.assertTrue(self.renter_can_book(10, 12))  # карта построена и закэширована
+
+        self.assertEqual(bulk_confirm([first.pk], self.owner).applied, [first])
+        self.assertFalse(self.renter_can_book(12, 14))
+        self.assertFalse(availability.is_range_free(self.product.pk, self.day(10), self.day(10)))
+
+        # Отмена освобождает даты — и можно подтвердить пересекающийся запрос
+        bulk_decline([first.pk], self.owner)
+        self.assertTrue(self.renter_can_book(10, 12))
+        self.assertEqual(bulk_confirm([second.pk], self.owner).applied, [second])
+        self.assertEqual(set(BookedDay.objects.values_list('booking_id', flat=True)), {second.pk})
+        self.assertFalse(self.renter_can_book(13, 14))
+        self.assertTrue(self.renter_can_book(9, 10))
+
+        # Возврат товара (active → completed) освобождает дни
+        lifecycle.advance(today=self.day(14))
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'completed')
+        self.assertTrue(self.renter_can_book(11, 13))
+        self.assertFalse(BookedDay.objects.exists())
+
+
+class OwnerBulkActionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.products = [
+            Product.objects.create(owner=cls.owner, name=f'Товар {i}', description='-', daily_price=100, deposit=500)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def make_bookings(self, count, overlapping=False):
+        start = date.today() + timedelta(days=10)
+        return [
+            Booking.objects.create(
+                renter=self.renter, product=self.products[0 if overlapping else i % len(self.products)],
+                total_cost=300, start_date=start + timedelta(days=0 if overlapping else 4 * i),
+                end_date=start + timedelta(days=2 if overlapping else 4 * i + 2),
+            )
+            for i in range(count)
+        ]
+
+    def post(self, action, bookings):
+        return self.client.post(
+            reverse('bookings:owner_requests'),
+            {'action': action, 'booking_ids': [b.pk for b in bookings]},
+        )
+
+    def test_bulk_confirm_occupies_days_and_queues_emails(self):
+        bookings = self.make_bookings(6)
+        self.post('confirm', bookings)
+
+        self.assertEqual(Booking.objects.filter(status='confirmed').count(), 6)
+        self.assertEqual(BookedDay.objects.count(), 6 * 3)
+        self.assertEqual(OutboundEmail.objects.filter(subject__startswith='Ваше бронирование подтверждено').count(), 6)
+        # Кэш занятости сброшен — даты видны как занятые
+        self.assertFalse(is_range_free(bookings[0].product_id, bookings[0].start_date, bookings[0].end_date))
+
+    def test_overlapping_requests_confirm_only_the_first(self):
+        first, *others = self.make_bookings(3, overlapping=True)
+        response = self.post('confirm', [first, *others])
+
+        self.assertEqual(
+            list(Booking.objects.order_by('pk').values_list('status', flat=True)),
+            ['confirmed', 'pending', 'pending'],
+        )
+        self.assertEqual(set(BookedDay.objects.values_list('booking_id', flat=True)), {first.pk})
+        self.assertContains(self.client.get(response.url), 'уже заняты', count=2)
+
+    def test_concurrent_conflict_is_reported_not_500(self):
+        bookings = self.make_bookings(2)
+
+        def taken_meanwhile(booking_ids, owner):
+            # Как при IntegrityError в bulk_confirm: дни заняли в обход блокировок
+            raise BookingConflict(list(Booking.objects.select_related('product').filter(pk__in=booking_ids)))
+
+        with mock.patch('bookings.views.bulk_confirm', side_effect=taken_meanwhile):
+            response = self.post('confirm', bookings)
+        self.assertRedirects(response, reverse('bookings:owner_requests'), fetch_redirect_response=False)
+        self.assertContains(self.client.get(response.url), 'уже заняты', count=2)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_bulk_decline_frees_days(self):
+        bookings = self.make_bookings(4)
+        self.post('confirm', bookings[:2])
+        self.post('cancel', bookings)
+
+        self.assertEqual(Booking.objects.filter(status='cancelled').count(), 4)
+        self.assertFalse(BookedDay.objects.exists())
+        self.assertEqual(OutboundEmail.objects.filter(subject__startswith='Ваше бронирование отклонено').count(), 4)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        few, many = self.make_bookings(2), self.make_bookings(40)[2:]
+        with CaptureQueriesContext(connection) as small:
+            self.post('confirm', few)
+        with CaptureQueriesContext(connection) as large:
+            self.post('confirm', many)
+        self.assertEqual(len(small), len(large))
+
+    def test_foreign_bookings_are_not_found(self):
+        stranger = User.objects.create_user('stranger', 'stranger@example.com', 'pass')
+        bookings = self.make_bookings(2)
+        self.client.force_login(stranger)
+        self.assertEqual(self.post('confirm', bookings).status_code, 404)
+        self.assertFalse(Booking.objects.exclude(status='pending').exists())
+
+
+class BookingExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.other = User.objects.create_user('other', 'other@example.com', 'pass')
+        cls.product = Product.objects.create(
+            owner=cls.owner, name='=HYPERLINK("x")', description='-', daily_price=100, deposit=500,
+        )
+        foreign = Product.objects.create(owner=cls.other, name='Чужой', description='-', daily_price=100, deposit=500)
+        start = date.today() - timedelta(days=30)
+        cls.bookings = [
+            Booking.objects.create(
+                renter=cls.renter, product=cls.product, total_cost=300 + i, status=status,
+                start_date=start + timedelta(days=4 * i), end_date=start + timedelta(days=4 * i + 2),
+            )
+            for i, status in enumerate(['completed', 'completed', 'pending', 'cancelled'])
+        ]
+        Booking.objects.create(renter=cls.renter, product=foreign, total_cost=100, status='completed',
+                               start_date=start, end_date=start + timedelta(days=1))
+        Review.objects.create(booking=cls.bookings[0], reviewer=cls.renter, landlord=cls.owner, rating=5, comment='Ок')
+
+    def setUp(self):
+        self.client.force_login(self.owner)
+
+    def export(self, fmt, **params):
+        response = self.client.get(reverse('bookings:export_bookings', args=[fmt]), params)
+        self.assertTrue(response.streaming)
+        with CaptureQueriesContext(connection) as ctx:
+            content = b''.join(response.streaming_content)
+        return response, content, ctx
+
+    def test_csv_contains_only_owner_bookings_with_review(self):
+        response, content, ctx = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][0], 'ID')
+        self.assertEqual([int(row[0]) for row in rows[1:]], [booking.pk for booking in self.bookings])
+        first = dict(zip(rows[0], rows[1]))
+        self.assertEqual((first['Статус'], first['Оценка'], first['Отзыв']), ('Завершено', '5', 'Ок'))
+        # Название с «=» не превращается в формулу
+        self.assertEqual(first['Товар'], "\'=HYPERLINK(\"x\")")
+        # Товар, арендатор и отзыв — в том же запросе, строки читаются одним курсором
+        self.assertEqual(len(ctx), 1)
+
+    def test_filters_and_scope(self):
+        _response, content, _ctx = self.export('csv', status='completed')
+        self.assertEqual(content.decode('utf-8-sig').count('\r\n'), 3)
+
+        # scope=all — только для персонала
+        _response, content, _ctx = self.export('csv', scope='all')
+        self.assertNotIn('Чужой', content.decode('utf-8-sig'))
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        _response, content, _ctx = self.export('csv', scope='all')
+        self.assertIn('Чужой', content.decode('utf-8-sig'))
+
+        url = reverse('bookings:export_bookings', args=['csv'])
+        self.assertEqual(self.client.get(url, {'date_from': '2024-02-01', 'date_to': '2024-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('bookings:export_bookings', args=['pdf'])).status_code, 404)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.owner)
+        response = await self.async_client.get(reverse('bookings:export_bookings', args=['csv']))
+        # Синхронный итератор под ASGI был бы собран в список до первого байта
+        self.assertTrue(response.is_async)
+        pieces = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(pieces), 1)
+        self.assertTrue(pieces[0].startswith('\ufeffID,'.encode()))
+        rows = list(csv.reader(io.StringIO(b''.join(pieces).decode('utf-8-sig'))))
+        self.assertEqual([int(row[0]) for row in rows[1:]], [booking.pk for booking in self.bookings])
+
+    def test_xlsx_is_a_workbook(self):
+        _response, content, ctx = self.export('xlsx')
+        self.assertEqual(len(ctx), 1)
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('=HYPERLINK', sheet)
+        self.assertNotIn('<f>', sheet)
+        self.assertEqual(sheet.count('<row '), len(self.bookings) + 1)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out.xlsx')
+            call_command('export_bookings', '--owner', 'owner', '--status', 'completed', '-o', path, stdout=io.StringIO())
+            with zipfile.ZipFile(path) as workbook:
+                sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row '), 3)
+
+    def test_admin_export_action(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        response = self.client.post(reverse('admin:bookings_booking_changelist') + '?status__exact=completed', {
+            'action': 'export_csv', 'select_across': '1', 'index': '0', '_selected_action': [self.bookings[0].pk],
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content).decode('utf-8-sig').count('\r\n'), 4)
+
+
+class BookingLifecycleTests(QueryPlanAssertionsMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.product = Product.objects.create(
+            owner=cls.owner, name='Проектор', description='-', daily_price=400, deposit=4000,
+        )
+        cls.other = Product.objects.create(
+            owner=cls.owner, name='Экран', description='-', daily_price=100, deposit=1000,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def make(self, status, start, end, product=None):
+        today = date.today()
+        return Booking.objects.create(
+            renter=self.renter, product=product or self.product, total_cost=400, status=status,
+            start_date=today + timedelta(days=start), end_date=today + timedelta(days=end),
+        )
+
+    def test_due_bookings_advance_once(self):
+        # Неотвеченный запрос не отменяется молча — решает владелец
+        overdue = self.make('pending', -2, 1, product=self.other)
+        waiting = self.make('pending', 30, 31)
+        starting = self.make('confirmed', 0, 2)
+        missed = self.make('confirmed', -10, -8)
+        returned = self.make('active', -5, -1)
+        ongoing = self.make('active', -1, 5, product=self.other)
+
+        out = io.StringIO()
+        call_command('advance_bookings', '--batch-size', '1', stdout=out)
+        self.assertIn('activate: 2, complete: 2', out.getvalue())
+
+        statuses = {b.pk: b.status for b in Booking.objects.all()}
+        self.assertEqual(statuses, {
+            overdue.pk: 'pending', waiting.pk: 'pending', starting.pk: 'active',
+            missed.pk: 'completed', returned.pk: 'completed', ongoing.pk: 'active',
+        })
+        # Дни завершённых броней освобождены, у активных — заняты
+        self.assertEqual(set(BookedDay.objects.values_list('booking_id', flat=True)), {starting.pk, ongoing.pk})
+        self.assertEqual(lifecycle.advance(), {'activate': 0, 'complete': 0})
+
+    def test_manual_transitions_follow_state_machine(self):
+        completed = self.make('completed', -5, -3)
+        with self.assertRaises(BookingStateError):
+            lifecycle.check_transition(completed, 'confirmed')
+        self.assertEqual(bulk_confirm([completed.pk], self.owner).skipped, [completed])
+        self.assertTrue(lifecycle.can_transition('confirmed', 'cancelled'))
+        self.assertFalse(lifecycle.can_transition('active', 'cancelled'))
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN проверяется только на SQLite')
+    def test_due_query_uses_status_index(self):
+        for rule, index in zip(lifecycle.RULES, ('booking_status_start_idx', 'booking_status_end_idx')):
+            plan = queryset_plan(rule.queryset(date.today()).order_by().values_list('pk', 'product_id')[:1000])
+            self.assertUsesIndex(plan, 'bookings_booking', index)
+
+    def test_admin_bulk_actions_are_single_updates(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin)
+        active = [self.make('active', -3, -1), self.make('active', -2, 2, product=self.other)]
+        pending = self.make('pending', 5, 6)
+        confirmed = self.make('confirmed', 10, 12)
+        url = reverse('admin:bookings_booking_changelist')
+
+        # «Выбрать все» по фильтру: брони не загружаются, переход — один UPDATE
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(url + '?status__exact=active', {
+                'action': 'complete_bookings', 'select_across': '1', 'index': '0',
+                '_selected_action': [active[0].pk],
+            })
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "bookings_booking"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(set(Booking.objects.filter(pk__in=[b.pk for b in active]).values_list('status', flat=True)),
+                         {'completed'})
+
+        self.client.post(url, {
+            'action': 'cancel_bookings', '_selected_action': [pending.pk, confirmed.pk, active[0].pk],
+        })
+        statuses = dict(Booking.objects.values_list('pk', 'status'))
+        self.assertEqual((statuses[pending.pk], statuses[confirmed.pk], statuses[active[0].pk]),
+                         ('cancelled', 'cancelled', 'completed'))
+        self.assertFalse(BookedDay.objects.exists())
+        self.assertTrue(is_range_free(self.product.pk, confirmed.start_date, confirmed.end_date))
+
+    def test_bulk_transition_cannot_confirm(self):
+        with self.assertRaises(BookingStateError):
+            lifecycle.bulk_transition(Booking.objects.all(), 'confirmed')
+
+
+class OwnerRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.products = [
+            Product.objects.create(owner=cls.owner, name=f'Товар {i}', description='-', daily_price=100, deposit=500)
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.owner)
+
+    def make(self, start, end, product=0, status='pending', cost=300):
+        today = date.today()
+        return Booking.objects.create(
+            renter=self.renter, product=self.products[product], total_cost=cost, status=status,
+            start_date=today + timedelta(days=start), end_date=today + timedelta(days=end),
+        )
+
+    def snapshot(self):
+        return list(ProductDayStat.objects.order_by('product_id', 'day').values_list(
+            'product_id', 'owner_id', 'day', 'bookings', 'revenue', 'rental_days', 'occupied_days',
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_status_changes_keep_rollup_in_sync(self):
+        single = self.make(-20, -18)
+        bulk = [self.make(-10, -7), self.make(-5, -4, product=1), self.make(3, 5)]
+        declined = self.make(20, 22)
+        edited = self.make(30, 31, product=1, status='confirmed')
+
+        bulk_confirm([single.pk], self.owner)
+        self.client.post(reverse('bookings:owner_requests'),
+                         {'action': 'confirm', 'booking_ids': [b.pk for b in bulk + [declined]]})
+        self.assertMatchesRebuild()
+
+        stat = ProductDayStat.objects.get(product=self.products[0], day=single.start_date)
+        self.assertEqual((stat.bookings, stat.revenue, stat.rental_days, stat.occupied_days), (1, 300, 2, 1))
+
+        # Переходы по дате вклад не меняют, отмена подтверждённой — убирает
+        lifecycle.advance()
+        bulk_decline([declined.pk], self.owner)
+        lifecycle.bulk_transition(Booking.objects.filter(pk=bulk[2].pk), 'cancelled')
+        self.assertFalse(ProductDayStat.objects.filter(day__gte=bulk[2].start_date, day__lte=declined.end_date).exists())
+
+        edited.start_date -= timedelta(days=3)
+        edited.total_cost = 900
+        edited.save()
+        Booking.objects.get(pk=bulk[1].pk).delete()
+        self.assertMatchesRebuild()
+
+    def test_dashboard_reads_only_rollups(self):
+        for i in range(6):
+            self.make(-40 + 5 * i, -38 + 5 * i, product=i % 2, status='completed', cost=100 * (i + 1))
+        self.make(10, 12, status='confirmed', cost=700)
+        self.make(-3, -1, status='cancelled')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('bookings:owner_stats'), {'days': 90})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if '"bookings_booking"' in q['sql']])
+
+        totals = response.context['totals']
+        self.assertEqual((totals['bookings'], totals['revenue'], totals['average_days']), (6, 2100, 2.0))
+        # 18 занятых дней из 2 товаров × 90 дней
+        self.assertEqual(totals['utilization'], 10.0)
+        self.assertEqual(response.context['upcoming'], {'bookings': 1, 'revenue': 700})
+        self.assertEqual(sum(month['revenue'] for month in response.context['months']), 2100)
+
+        # Число запросов не зависит от истории броней
+        for i in range(20):
+            self.make(-300 + 3 * i, -299 + 3 * i, status='completed')
+        with CaptureQueriesContext(connection) as more:
+            self.client.get(reverse('bookings:owner_stats'), {'days': 90})
+        self.assertEqual(len(ctx), len(more))
+
+    def test_migration_backfill_matches_incremental_rollup(self):
+        migration = importlib.import_module('bookings.migrations.0011_product_day_stat')
+        self.make(-20, -18, status='completed')
+        self.make(-3, 2, status='active', cost=450)
+        self.make(-3, -3, product=1, status='confirmed', cost=70)
+        self.make(5, 6, product=1)
+        self.make(8, 9, status='cancelled')
+        incremental = self.snapshot()
+        self.assertTrue(incremental)
+
+        ProductDayStat.objects.all().delete()
+        migration.fill_product_day_stats(apps, mock.Mock(connection=connection))
+        self.assertEqual(self.snapshot(), incremental)
+
+        # СУБД без своего SQL в миграции — тот же результат циклом по броням
+        ProductDayStat.objects.all().delete()
+        with mock.patch.dict(migration.VENDOR_SQL, clear=True):
+            migration.fill_product_day_stats(apps, mock.Mock(connection=connection))
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_rebuild_command(self):
+        self.make(-5, -3, status='completed')
+        ProductDayStat.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_booking_stats', stdout=out)
+        self.assertIn('Сводка пересчитана', out.getvalue())
+        self.assertEqual(ProductDayStat.objects.filter(occupied_days=1).count(), 3)
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """locmem, который не может доставить письма на FAILING_ADDRESSES"""
+    FAILING_ADDRESSES = {'broken@example.com'}
+
+    def send_messages(self, messages):
+        for message in messages:
+            if set(message.to) & self.FAILING_ADDRESSES:
+                raise ConnectionError('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class ReturnReminderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        products = [
+            Product.objects.create(owner=owner, name='Палатка', description='-', daily_price=100, deposit=500)
+            for _ in range(7)
+        ]
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        cls.renters = [User.objects.create_user(f'renter{i}', f'renter{i}@example.com', 'pass') for i in range(5)]
+        cls.bookings = [
+            Booking.objects.create(
+                renter=renter, product=product, start_date=tomorrow - timedelta(days=3), end_date=tomorrow,
+                total_cost=400, status='active',
+            )
+            for renter, product in zip(cls.renters, products)
+        ]
+        # Не завтра и не активная — напоминаний нет
+        Booking.objects.create(
+            renter=cls.renters[0], product=products[5], start_date=tomorrow, end_date=tomorrow + timedelta(days=1),
+            total_cost=200, status='active',
+        )
+        Booking.objects.create(
+            renter=cls.renters[0], product=products[6], start_date=tomorrow - timedelta(days=1), end_date=tomorrow,
+            total_cost=200, status='cancelled',
+        )
+
+    def remind(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('send_return_reminders', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_ledger_prevents_second_reminder(self):
+        out, _err = self.remind()
+        self.assertIn('Всего отправлено напоминаний: 5, ошибок: 0', out)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [r.email for r in self.renters])
+        self.assertEqual(
+            set(ReminderLog.objects.values_list('booking_id', flat=True)), {b.pk for b in self.bookings},
+        )
+        out, _err = self.remind()
+        self.assertIn('Всего отправлено напоминаний: 0', out)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_dry_run_sends_and_logs_nothing(self):
+        out, _err = self.remind('--dry-run')
+        self.assertIn('[dry-run] renter0@example.com: "Палатка"', out)
+        self.assertIn('Будет отправлено напоминаний: 5', out)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(ReminderLog.objects.exists())
+
+    def test_batch_is_claimed_with_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            out, _err = self.remind('--batch-size', '2')
+        claims = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "bookings_reminderlog"')]
+        self.assertEqual(len(claims), 3)
+        self.assertIn('Всего отправлено напоминаний: 5', out)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_large_batch_is_claimed_in_chunks(self):
+        with mock.patch('bookings.management.commands.send_return_reminders.CLAIM_CHUNK', 2):
+            with CaptureQueriesContext(connection) as queries:
+                out, _err = self.remind('--batch-size', '1000')
+        claims = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "bookings_reminderlog"')]
+        self.assertEqual(len(claims), 3)
+        self.assertIn('Всего отправлено напоминаний: 5, ошибок: 0', out)
+        self.assertEqual(ReminderLog.objects.count(), 5)
+
+    def test_claimed_elsewhere_is_skipped(self):
+        ReminderLog.objects.create(booking=self.bookings[1], kind='return')
+        command = SendReturnRemindersCommand(stdout=io.StringIO())
+        # Бронь забрал параллельный запуск уже после выборки — второй раз её не отправляем
+        self.assertEqual(command.send_batches([self.bookings[:3]]), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertNotIn(self.renters[1].email, [message.to[0] for message in mail.outbox])
+
+    @override_settings(EMAIL_BACKEND='bookings.tests.FlakyEmailBackend')
+    def test_failed_message_is_retried_next_run(self):
+        broken = self.renters[2]
+        User.objects.filter(pk=broken.pk).update(email='broken@example.com')
+        out, err = self.remind('--batch-size', '5')
+        self.assertIn('Всего отправлено напоминаний: 4, ошибок: 1', out)
+        self.assertIn(f'по брони {self.bookings[2].pk}', err)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertFalse(ReminderLog.objects.filter(booking=self.bookings[2]).exists())
+
+        User.objects.filter(pk=broken.pk).update(email=broken.email)
+        out, _err = self.remind()
+        self.assertIn('Всего отправлено напоминаний: 1, ошибок: 0', out)
+        self.assertEqual(mail.outbox[-1].to, [broken.email])
@@ -7,5 +7,7 @@ urlpatterns = [
     path('<int:product_id>/create/', views.create_booking, name='create_booking'),
     path('my/', views.my_bookings, name='my_bookings'),
     path('owner-requests/', views.owner_requests, name='owner_requests'),
+    path('export/<str:fmt>/', views.export_bookings, name='export_bookings'),
+    path('stats/', views.owner_stats, name='owner_stats'),
     path('<int:booking_id>/review/', views.leave_review, name='leave_review'),
 ]
\ No newline at end of file
@@ -1,13 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.conf import settings
-from datetime import timedelta
+from django.db import transaction
+from django.http import Http404, HttpResponseBadRequest
+from django.urls import reverse
 
 from catalog.models import Product
+from catalog.pricing import quote_product
+from communications.chat import unread_counts
+from communications.outbox import enqueue_email, enqueue_many
+from rental_service.pagination import paginate
+from reviews.models import Review
 from .models import Booking
-from .forms import BookingCreateForm
+from . import exports, rollups
+from .forms import BookingCreateForm, BookingExportForm
+from .availability import is_range_free
+from .services import BookingConflict, BulkResult, bulk_confirm, bulk_decline
+
+BOOKINGS_PAGE_SIZE = 20
+# Окна кабинета владельца (дней) для загрузки по товарам
+STATS_PERIODS = (30, 90, 365)
+
+
+def attach_unread(bookings, user):
+    """booking.unread — непрочитанные в чате брони, одним запросом на страницу"""
+    unread = unread_counts(user.pk, [booking.pk for booking in bookings])
+    for booking in bookings:
+        booking.unread = unread.get(booking.pk, 0)
 
 
 @login_required
@@ -24,20 +43,13 @@ def create_booking(request, product_id):
             new_start = form.cleaned_data['start_date']
             new_end = form.cleaned_data['end_date']
 
-            # Проверяем пересечение с подтверждёнными/активными бронями
-            overlapping = product.booking_set.filter(
-                status__in=['confirmed', 'active'],
-                start_date__lte=new_end,           # начало старой брони ≤ конец новой
-                end_date__gte=new_start            # конец старой ≥ начало новой
-            ).exists()
-
-            if overlapping:
+            # Проверяем пересечение с подтверждёнными/активными бронями (по кэшу занятости)
+            if not is_range_free(product.pk, new_start, new_end):
                 messages.error(request, 'Выбранные даты уже заняты. Выберите другие.')
                 # Возвращаем форму с ошибкой, но сохраняем введённые даты
                 context = {
                     'product': product,
                     'form': form,
-                    'events': get_calendar_events(product),  # функция ниже
                 }
                 return render(request, 'bookings/create.html', context)
 
@@ -46,21 +58,21 @@ def create_booking(request, product_id):
             booking.renter = request.user
             booking.product = product
 
-            days = (booking.end_date - booking.start_date).days
-            booking.total_cost = product.daily_price * days
-            booking.save()
-
-            # Уведомление арендодателю
-            send_mail(
-                subject=f'Новый запрос на аренду: {product.name}',
-                message=f'Пользователь {request.user.username} хочет арендовать "{product.name}"\n'
-                        f'Даты: {booking.start_date} — {booking.end_date}\n'
-                        f'Стоимость: {booking.total_cost} ₽\n\n'
-                        f'Проверить: {request.build_absolute_uri(reverse("bookings:owner_requests"))}',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[product.owner.email],
-                fail_silently=False,
-            )
+            # Самое дешёвое сочетание дней и недель (catalog/pricing.py)
+            booking.total_cost = quote_product(product, booking.start_date, booking.end_date)
+
+            with transaction.atomic():
+                booking.save()
+
+                # Уведомление арендодателю — в очередь, в той же транзакции, что и бронь
+                enqueue_email(
+                    subject=f'Новый запрос на аренду: {product.name}',
+                    message=f'Пользователь {request.user.username} хочет арендовать "{product.name}"\n'
+                            f'Даты: {booking.start_date} — {booking.end_date}\n'
+                            f'Стоимость: {booking.total_cost} ₽\n\n'
+                            f'Проверить: {request.build_absolute_uri(reverse("bookings:owner_requests"))}',
+                    recipient_list=[product.owner.email],
+                )
 
             messages.success(request, "Запрос отправлен. Ожидайте подтверждения.")
             return redirect('bookings:my_bookings')
@@ -70,79 +82,149 @@ def create_booking(request, product_id):
     else:
         form = BookingCreateForm(product=product)
 
-    # Для GET-запроса или ошибки — показываем календарь
+    # Для GET-запроса или ошибки — показываем календарь (даты он загрузит сам)
     context = {
         'product': product,
         'form': form,
-        'events': get_calendar_events(product),  # ← функция ниже
     }
     return render(request, 'bookings/create.html', context)
 
 
 @login_required
 def my_bookings(request):
-    bookings = Booking.objects.filter(renter=request.user).order_by('-start_date')
-    return render(request, 'bookings/my_bookings.html', {'bookings': bookings})
+    # product и review читаются в шаблоне для каждой строки
+    bookings = (
+        Booking.objects.filter(renter=request.user)
+        .select_related('product', 'review')
+        .order_by('-start_date', '-id')
+    )
+    page = paginate(request, bookings, BOOKINGS_PAGE_SIZE)
+    attach_unread(page, request.user)
+    return render(request, 'bookings/my_bookings.html', {'bookings': page, 'page': page})
+
+
+# Сколько броней можно обработать одним массовым действием
+BULK_ACTION_LIMIT = 500
+
+
+def confirmation_email(request, booking):
+    return (
+        f'Ваше бронирование подтверждено: {booking.product.name}',
+        f'Владелец подтвердил аренду "{booking.product.name}"\n'
+        f'Даты: {booking.start_date} — {booking.end_date}\n'
+        f'Стоимость: {booking.total_cost} ₽\n\n'
+        f'Подробности: {request.build_absolute_uri(reverse("bookings:my_bookings"))}',
+        [booking.renter.email],
+    )
+
+
+def decline_email(booking):
+    return (
+        f'Ваше бронирование отклонено: {booking.product.name}',
+        f'К сожалению, владелец отклонил запрос на аренду "{booking.product.name}".',
+        [booking.renter.email],
+    )
+
+
+def apply_owner_action(request, action, booking_ids):
+    """
+    Подтверждает или отклоняет брони владельца пачкой: статусы, занятые дни
+    и письма арендаторам — в одной транзакции и за постоянное число запросов.
+    """
+    try:
+        with transaction.atomic():
+            if action == 'confirm':
+                result = bulk_confirm(booking_ids, request.user)
+                enqueue_many(confirmation_email(request, booking) for booking in result.applied)
+            else:
+                result = bulk_decline(booking_ids, request.user)
+                enqueue_many(decline_email(booking) for booking in result.applied)
+    except BookingConflict as exc:
+        # Даты заняли параллельно: ничего не подтверждено, показываем брони как конфликтные
+        result = BulkResult(conflicts=exc.args[0])
+
+    if result.applied:
+        names = ', '.join(booking.product.name for booking in result.applied[:5])
+        more = f' и ещё {len(result.applied) - 5}' if len(result.applied) > 5 else ''
+        if action == 'confirm':
+            messages.success(request, f"Бронирование подтверждено: {names}{more}")
+        else:
+            messages.error(request, f"Бронирование отклонено: {names}{more}")
+    for booking in result.conflicts:
+        messages.error(
+            request,
+            f"Эти даты уже заняты другой подтверждённой бронью: {booking.product.name}, "
+            f"{booking.start_date:%d.%m.%Y} — {booking.end_date:%d.%m.%Y}",
+        )
+    for booking in result.skipped:
+        messages.error(request, f"Бронирование уже обработано: {booking.get_status_display()}")
+    return result
 
 
 @login_required
 def owner_requests(request):
     if request.method == 'POST':
-        booking_id = request.POST.get('booking_id')
+        # Одна бронь (кнопки в строке) или несколько отмеченных (booking_ids)
+        raw_ids = request.POST.getlist('booking_ids') or [request.POST.get('booking_id')]
+        try:
+            booking_ids = {int(booking_id) for booking_id in raw_ids}
+        except (TypeError, ValueError):
+            raise Http404
         action = request.POST.get('action')
 
-        booking = get_object_or_404(Booking, id=booking_id, product__owner=request.user)
-
-        if action == 'confirm':
-            booking.status = 'confirmed'
-            booking.save()
-            messages.success(request, f"Бронирование подтверждено: {booking.product.name}")
-
-            # Уведомление арендатору
-            send_mail(
-                subject=f'Ваше бронирование подтверждено: {booking.product.name}',
-                message=f'Владелец подтвердил аренду "{booking.product.name}"\n'
-                        f'Даты: {booking.start_date} — {booking.end_date}\n'
-                        f'Стоимость: {booking.total_cost} ₽\n\n'
-                        f'Подробности: {request.build_absolute_uri(reverse("bookings:my_bookings"))}',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[booking.renter.email],
-                fail_silently=False,
-            )
-
-        elif action == 'cancel':
-            booking.status = 'cancelled'
-            booking.save()
-            messages.error(request, f"Бронирование отклонено: {booking.product.name}")
-
-            # Уведомление арендатору
-            send_mail(
-                subject=f'Ваше бронирование отклонено: {booking.product.name}',
-                message=f'К сожалению, владелец отклонил запрос на аренду "{booking.product.name}".',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[booking.renter.email],
-                fail_silently=False,
-            )
+        if len(booking_ids) > BULK_ACTION_LIMIT:
+            messages.error(request, f"За раз можно обработать не больше {BULK_ACTION_LIMIT} запросов")
+        elif action in ('confirm', 'cancel'):
+            result = apply_owner_action(request, action, booking_ids)
+            if not (result.applied or result.conflicts or result.skipped):
+                # Ни одной брони этого владельца среди переданных
+                raise Http404
 
         return redirect('bookings:owner_requests')
 
     # GET-запрос — показываем список
-    bookings = Booking.objects.filter(product__owner=request.user).order_by('-created_at')
-    return render(request, 'bookings/owner_requests.html', {'bookings': bookings})
-
-def get_calendar_events(product):
-    """Возвращает список событий для FullCalendar (занятые даты)"""
-    bookings = product.booking_set.filter(status__in=['confirmed', 'active'])
-    events = []
-    for b in bookings:
-        events.append({
-            "title": "Забронировано",
-            "start": b.start_date.isoformat(),
-            "end": (b.end_date + timedelta(days=1)).isoformat(),  # +1 день, чтобы end_date был занят
-            "color": "#dc3545",
-            "allDay": True
-        })
-    return events
+    bookings = (
+        Booking.objects.filter(product__owner=request.user)
+        .select_related('product', 'renter')
+        .order_by('-created_at', '-id')
+    )
+    page = paginate(request, bookings, BOOKINGS_PAGE_SIZE)
+    attach_unread(page, request.user)
+    return render(request, 'bookings/owner_requests.html', {'bookings': page, 'page': page})
+
+
+@login_required
+def export_bookings(request, fmt):
+    """
+    Брони товаров владельца (для персонала с ?scope=all — все брони) в CSV
+    или XLSX. Ответ потоковый: строки читаются из базы по мере отдачи.
+    """
+    if fmt not in exports.FORMATS:
+        raise Http404
+    form = BookingExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    if request.user.is_staff and request.GET.get('scope') == 'all':
+        bookings = Booking.objects.all()
+    else:
+        bookings = Booking.objects.filter(product__owner=request.user)
+    return exports.streaming_response(request, form.filter(bookings), fmt, exports.export_filename())
+
+
+@login_required
+def owner_stats(request):
+    """Кабинет владельца: доход по месяцам и загрузка товаров — только из сводки"""
+    try:
+        period_days = int(request.GET.get('days', 90))
+    except ValueError:
+        period_days = 90
+    if period_days not in STATS_PERIODS:
+        period_days = 90
+    context = rollups.owner_dashboard(request.user, period_days=period_days)
+    context['periods'] = STATS_PERIODS
+    return render(request, 'bookings/owner_stats.html', context)
+
 
 @login_required
 def leave_review(request, booking_id):
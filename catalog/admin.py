@@ -1,6 +1,10 @@
 # catalog/admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+
+from rental_service.admin import ScalableModelAdmin, prefix_filter
+from .cache import GLOBAL, invalidate
 from .models import Category, Product
+from .search import get_search_backend
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -8,7 +12,41 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'owner', 'category', 'daily_price', 'deposit', 'author', 'is_available')
+class ProductAdmin(ScalableModelAdmin):
+    list_display = ('name', 'owner', 'category', 'daily_price', 'deposit', 'author', 'is_available', 'created_at')
     list_filter = ('category', 'is_available')
-    search_fields = ('name', 'description', 'author', 'owner__username')
\ No newline at end of file
+    list_select_related = ('owner', 'category')
+    autocomplete_fields = ('owner', 'category')
+    date_hierarchy = 'created_at'
+    # Для автокомплита; сам поиск — get_search_results
+    search_fields = ('name',)
+    actions = ('hide_products', 'show_products')
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Поиск по индексам: число — id, «@логин» — товары владельца (префикс
+        логина), остальное — полнотекстовый индекс каталога (название,
+        описание, автор) вместо icontains по каждому полю.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        if term.startswith('@'):
+            return queryset.filter(prefix_filter('owner__username', term[1:])), False
+        return get_search_backend().filter(queryset, term), False
+
+    def _set_available(self, request, queryset, value):
+        # Один UPDATE; сигналов нет — кэш страниц каталога сбрасываем сами
+        updated = queryset.update(is_available=value)
+        invalidate(GLOBAL)
+        self.message_user(request, f'Изменено товаров: {updated}', messages.SUCCESS)
+
+    @admin.action(description='Скрыть из каталога')
+    def hide_products(self, request, queryset):
+        self._set_available(request, queryset, False)
+
+    @admin.action(description='Вернуть в каталог')
+    def show_products(self, request, queryset):
+        self._set_available(request, queryset, True)
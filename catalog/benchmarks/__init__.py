@@ -0,0 +1 @@
+# Бенчмарки каталога. Запуск: python -m catalog.benchmarks.listing --help
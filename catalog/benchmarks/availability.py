@@ -0,0 +1,114 @@
+# catalog/benchmarks/availability.py
+"""
+Бенчмарк фильтра «свободен в даты» (available_from/available_to).
+
+    python -m catalog.benchmarks.availability [--products 100000] [--bookings-per-product 10] [--repeat 20]
+
+Сидирует товары с бронями (rental_service/seeding.py) и для нескольких
+периодов и сочетаний фильтров меряет то же, что страница списка без кэша:
+COUNT(*), первую страницу и глубокую страницу по курсору. Для сравнения
+тот же список строится наивно — проверкой пересечения с бронями (Booking).
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+from rental_service.benchmarks import dump_json, measure, print_table, setup_django, temporary_database
+
+PAGE_SIZE = 12
+
+
+def periods(today):
+    # Брони сидера плотнее всего за один-четыре месяца до сегодня
+    return [
+        ('неделя от сегодня', today, today + timedelta(days=6)),
+        ('неделя месяц назад', today - timedelta(days=30), today - timedelta(days=24)),
+        ('день два месяца назад', today - timedelta(days=60), today - timedelta(days=60)),
+    ]
+
+
+def naive_listing(params, start, end):
+    """Список без фильтра по датам + NOT EXISTS пересекающейся брони"""
+    from django.db.models import Exists, OuterRef
+
+    from bookings.models import Booking
+    from catalog.listing import ProductListing
+
+    overlapping = Booking.objects.filter(
+        product=OuterRef('pk'), status__in=Booking.BUSY_STATUSES, start_date__lte=end, end_date__gte=start,
+    )
+    return ProductListing(params).queryset.filter(~Exists(overlapping))
+
+
+def run(products, bookings_per_product, repeat, json_path=None, stdout=sys.stdout):
+    from django.http import QueryDict
+
+    from catalog.listing import ProductListing
+    from catalog.models import Category
+    from catalog.pagination import KeysetPaginator, encode_cursor
+    from rental_service.seeding import seed_site
+
+    with temporary_database():
+        counts = seed_site(
+            users=max(products // 20, 10), products=products, bookings_per_product=bookings_per_product,
+            messages_per_booking=0, stdout=stdout,
+        )
+        category_id = Category.objects.order_by('pk').values_list('pk', flat=True).first()
+        rows = []
+        for title, start, end in periods(date.today()):
+            for extra_title, extra in (('', {}), ('+ категория', {'category': category_id}),
+                                       ('+ цена', {'price_min': 200, 'price_max': 400})):
+                base = QueryDict(mutable=True)
+                base.update(extra)
+                query = base.copy()
+                query.update({'available_from': start.isoformat(), 'available_to': end.isoformat()})
+
+                def build():
+                    return ProductListing(query).queryset
+
+                total = build().count()
+                count_stats, _ = measure(lambda: build().count(), repeat=repeat)
+                page_stats, _ = measure(lambda: list(build()[:PAGE_SIZE]), repeat=repeat)
+                naive_stats, _ = measure(lambda: list(naive_listing(base, start, end)[:PAGE_SIZE]), repeat=repeat)
+                naive_count_stats, naive_total = measure(lambda: naive_listing(base, start, end).count(), repeat=repeat)
+                assert naive_total == total, (naive_total, total)
+
+                anchor = build()[max(total // 2 - PAGE_SIZE, 0):][:1]
+                cursor = encode_cursor(anchor[0]) if anchor else None
+                deep_stats, _ = measure(
+                    lambda: KeysetPaginator(build(), PAGE_SIZE).page(cursor).object_list if cursor else [],
+                    repeat=repeat,
+                )
+                rows.append({
+                    'период': f'{title} {extra_title}'.strip(),
+                    'свободно': total,
+                    'count мед., мс': count_stats['median_ms'],
+                    'стр. 1 мед., мс': page_stats['median_ms'],
+                    'стр. 1 p95, мс': page_stats['p95_ms'],
+                    'глубокая мед., мс': deep_stats['median_ms'],
+                    'наивно: count, мс': naive_count_stats['median_ms'],
+                    'наивно: стр. 1, мс': naive_stats['median_ms'],
+                    'params': dict(query.items()),
+                })
+
+    print_table(rows, ['период', 'свободно', 'count мед., мс', 'стр. 1 мед., мс', 'стр. 1 p95, мс',
+                       'глубокая мед., мс', 'наивно: count, мс', 'наивно: стр. 1, мс'], stream=stdout)
+    if json_path:
+        dump_json({'seeded': counts, 'repeat': repeat, 'results': rows}, json_path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100_000, help='Сколько товаров сидировать')
+    parser.add_argument('--bookings-per-product', type=int, default=10, help='Сколько броней на товар')
+    parser.add_argument('--repeat', type=int, default=20, help='Сколько замеров на каждый запрос')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    run(args.products, args.bookings_per_product, args.repeat, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
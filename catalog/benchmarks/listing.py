@@ -0,0 +1,107 @@
+# catalog/benchmarks/listing.py
+"""
+Бенчмарк выборки каталога (catalog/listing.py) по каждому сочетанию фильтров.
+
+    python -m catalog.benchmarks.listing [--products 100000] [--repeat 20] [--json out.json]
+
+Для каждого сочетания меряется то же, что делает страница списка без кэша:
+COUNT(*), первая страница, глубокая страница по курсору (или OFFSET при
+поиске с ранжированием), и печатается, по какому индексу идёт запрос.
+"""
+import argparse
+import sys
+
+from rental_service.benchmarks import dump_json, measure, print_table, setup_django, temporary_database
+
+PAGE_SIZE = 12
+
+
+def combinations(category_id):
+    return [
+        ('без фильтров', {}),
+        ('категория', {'category': category_id}),
+        ('цена', {'price_min': 200, 'price_max': 400}),
+        ('категория + цена', {'category': category_id, 'price_min': 200, 'price_max': 400}),
+        ('название', {'name': 'калькулятор'}),
+        ('автор', {'author': 'ландау'}),
+        ('поиск', {'q': 'учебник физике'}),
+        ('поиск + категория', {'q': 'учебник', 'category': category_id}),
+        ('поиск + цена', {'q': 'палатка', 'price_max': 500}),
+    ]
+
+
+def plan_summary(queryset):
+    from django.db import connection
+    if connection.vendor != 'sqlite':
+        return ''
+    from rental_service.testing import queryset_plan
+    lines = queryset_plan(queryset)
+    return '; '.join(line for line in lines if 'catalog_product ' in f'{line} ' or 'TEMP' in line)
+
+
+def run(products, repeat, json_path=None, stdout=sys.stdout):
+    from django.http import QueryDict
+
+    from catalog.benchmarks.seed import seed_catalog
+    from catalog.listing import ProductListing
+    from catalog.pagination import KeysetPaginator, encode_cursor
+
+    with temporary_database():
+        categories, _owners = seed_catalog(products=products, stdout=stdout)
+        rows = []
+        for title, params in combinations(categories[0].pk):
+            query = QueryDict(mutable=True)
+            query.update(params)
+
+            def build():
+                return ProductListing(query)
+
+            listing = build()
+            count_stats, total = measure(lambda: build().queryset.count(), repeat=repeat)
+            page_stats, page = measure(lambda: list(build().queryset[:PAGE_SIZE]), repeat=repeat)
+
+            # Глубокая страница: примерно из середины результата
+            deep_offset = max(total // 2 - PAGE_SIZE, 0)
+            if listing.ranked:
+                deep_stats, _ = measure(
+                    lambda: list(build().queryset[deep_offset:deep_offset + PAGE_SIZE]), repeat=repeat,
+                )
+            else:
+                anchor = listing.queryset[deep_offset:deep_offset + 1]
+                cursor = encode_cursor(anchor[0]) if anchor else None
+                deep_stats, _ = measure(
+                    lambda: KeysetPaginator(build().queryset, PAGE_SIZE).page(cursor).object_list if cursor else [],
+                    repeat=repeat,
+                )
+
+            rows.append({
+                'фильтр': title,
+                'строк': total,
+                'count мед., мс': count_stats['median_ms'],
+                'стр. 1 мед., мс': page_stats['median_ms'],
+                'стр. 1 p95, мс': page_stats['p95_ms'],
+                'глубокая мед., мс': deep_stats['median_ms'],
+                'план': plan_summary(listing.queryset[:PAGE_SIZE]),
+                'params': params,
+            })
+
+    print_table(rows, ['фильтр', 'строк', 'count мед., мс', 'стр. 1 мед., мс', 'стр. 1 p95, мс',
+                       'глубокая мед., мс', 'план'], stream=stdout)
+    if json_path:
+        dump_json({'products': products, 'repeat': repeat, 'results': rows}, json_path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100_000, help='Сколько товаров сидировать')
+    parser.add_argument('--repeat', type=int, default=20, help='Сколько замеров на каждый запрос')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    run(args.products, args.repeat, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
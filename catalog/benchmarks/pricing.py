@@ -0,0 +1,100 @@
+# catalog/benchmarks/pricing.py
+"""
+Бенчмарк расчёта цены за период (catalog/pricing.py).
+
+    python -m catalog.benchmarks.pricing [--products 10000] [--ranges 50] [--repeat 5]
+
+Для каждого из --ranges периодов (от 1 до 60 дней) цена считается для
+всего каталога тремя способами: выражением SQL в одном запросе, циклом
+quote() по уже загруженным строкам и циклом quote_product() с загрузкой
+моделей. Отдельно — сколько добавляет цена к первой странице каталога.
+"""
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+
+from rental_service.benchmarks import dump_json, measure, print_table, setup_django, temporary_database
+
+PAGE_SIZE = 12
+
+
+def date_ranges(count, seed=42):
+    rng = random.Random(seed)
+    today = date.today()
+    ranges = []
+    for _ in range(count):
+        start = today + timedelta(days=rng.randint(0, 90))
+        ranges.append((start, start + timedelta(days=rng.randint(1, 60))))
+    return ranges
+
+
+def run(products, ranges, repeat, json_path=None, stdout=sys.stdout):
+    from django.http import QueryDict
+
+    from catalog import pricing
+    from catalog.benchmarks.seed import seed_catalog
+    from catalog.listing import ProductListing
+    from catalog.models import Product
+
+    with temporary_database():
+        seed_catalog(products=products, stdout=stdout)
+        periods = date_ranges(ranges)
+
+        def sql():
+            return [list(pricing.with_quotes(Product.objects.all(), start, end).values_list('pk', 'quote'))
+                    for start, end in periods]
+
+        def python_rows():
+            rows = list(Product.objects.values_list('pk', 'daily_price', 'weekly_price'))
+            return [[(pk, pricing.quote(daily, weekly, pricing.rental_days(start, end)))
+                     for pk, daily, weekly in rows] for start, end in periods]
+
+        def python_models():
+            products_ = list(Product.objects.all())
+            return [[(product.pk, pricing.quote_product(product, start, end)) for product in products_]
+                    for start, end in periods]
+
+        results = {}
+        rows = []
+        for title, func in (('SQL, один запрос на период', sql), ('quote() по строкам', python_rows),
+                            ('quote_product() по моделям', python_models)):
+            stats, results[title] = measure(func, repeat=repeat, warmup=1)
+            rows.append({
+                'способ': title,
+                'всего, мс': stats['median_ms'],
+                'на период, мс': round(stats['median_ms'] / ranges, 3),
+                'на 1000 цен, мс': round(stats['median_ms'] / ranges / products * 1000, 3),
+            })
+        expected = results['quote() по строкам']
+        for title, value in results.items():
+            assert value == expected, f'{title}: цены расходятся'
+
+        start, end = periods[0]
+        plain = QueryDict(mutable=True)
+        dated = QueryDict(mutable=True)
+        dated.update({'available_from': start.isoformat(), 'available_to': end.isoformat()})
+        for title, params in (('стр. 1 без дат', plain), ('стр. 1 с датами и ценой', dated)):
+            stats, _ = measure(lambda: list(ProductListing(params).queryset[:PAGE_SIZE]), repeat=repeat * 4)
+            rows.append({'способ': title, 'всего, мс': stats['median_ms'], 'на период, мс': '', 'на 1000 цен, мс': ''})
+
+    print_table(rows, ['способ', 'всего, мс', 'на период, мс', 'на 1000 цен, мс'], stream=stdout)
+    if json_path:
+        dump_json({'products': products, 'ranges': ranges, 'repeat': repeat, 'results': rows}, json_path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10_000, help='Сколько товаров сидировать')
+    parser.add_argument('--ranges', type=int, default=50, help='Сколько периодов считать')
+    parser.add_argument('--repeat', type=int, default=5, help='Сколько замеров')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    run(args.products, args.ranges, args.repeat, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
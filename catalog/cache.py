@@ -0,0 +1,146 @@
+# catalog/cache.py
+"""
+Кэш готовых страниц каталога для анонимных посетителей.
+
+Ключ страницы — имя пространства (namespace), его текущая версия и
+нормализованные GET-параметры (фильтры, page, cursor). Пространства:
+
+* ``list`` — все страницы списка товаров (и закэшированные COUNT(*));
+* ``list:dates`` — страницы списка с фильтром «свободен в даты»: они
+  зависят ещё и от броней, их сбрасывает bookings/availability.py;
+* ``product:<pk>`` — детальная страница товара.
+
+Сигналы (catalog/signals.py, reviews/signals.py, bookings) увеличивают версию
+нужного пространства, старые записи просто перестают читаться и
+вытесняются по таймауту. Работает с любым бэкендом Django —
+locmem, file, redis (settings.CACHES, переменные CACHE_BACKEND/CACHE_LOCATION).
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from rental_service import versioned_cache
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'CATALOG_PAGE_CACHE_TIMEOUT', 5 * 60)
+
+# Версия, общая для всех пространств: её увеличивают изменения, видимые
+# на любой странице каталога (например, категории в фильтре)
+GLOBAL = 'all'
+STATS_KEY = 'catalog:cache:stats:{view}:{outcome}'
+LIST = 'list'
+DATED_LIST = 'list:dates'
+# GET-параметры фильтра по занятости (catalog/filters.py)
+DATE_PARAMS = ('available_from', 'available_to')
+
+
+def product_namespace(product_id):
+    return f'product:{product_id}'
+
+
+def list_namespace(params):
+    """Пространство страницы списка: с фильтром по датам — отдельное"""
+    return DATED_LIST if any(params.get(name) for name in DATE_PARAMS) else LIST
+
+
+def _version_key(namespace):
+    return f'catalog:cache:{namespace}:version'
+
+
+def _version(namespace):
+    return versioned_cache.get_version(_version_key(namespace))
+
+
+def _bump(namespace):
+    versioned_cache.bump(_version_key(namespace))
+
+
+def invalidate(*namespaces):
+    """Сбрасывает пространства сейчас и ещё раз после коммита транзакции"""
+    for namespace in namespaces:
+        _bump(namespace)
+    transaction.on_commit(lambda: [_bump(namespace) for namespace in namespaces])
+
+
+def normalized_params(params, exclude=()):
+    """GET-параметры без пустых значений в стабильном порядке"""
+    return sorted(
+        (key, value)
+        for key, values in params.lists()
+        if key not in exclude
+        for value in values
+        if value != ''
+    )
+
+
+def namespaced_key(namespace, kind, params=(), exclude=()):
+    """Ключ в версии пространства: меняется при каждой инвалидации"""
+    digest = hashlib.md5(json.dumps(normalized_params(params, exclude) if params else []).encode()).hexdigest()
+    return f'catalog:cache:{namespace}:{_version(GLOBAL)}.{_version(namespace)}:{kind}:{digest}'
+
+
+def _count(view, outcome):
+    key = STATS_KEY.format(view=view, outcome=outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def stats(views=('list', 'detail')):
+    """Счётчики попаданий и промахов по видам страниц"""
+    result = {}
+    for view in views:
+        hits = cache.get(STATS_KEY.format(view=view, outcome='hit'), 0)
+        misses = cache.get(STATS_KEY.format(view=view, outcome='miss'), 0)
+        total = hits + misses
+        result[view] = {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 3) if total else None}
+    return result
+
+
+def _cacheable(request):
+    # Залогиненным страница показывает меню и кнопки пользователя, а
+    # flash-сообщения — одноразовые; такие ответы не кэшируем
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def cache_page(view_name, namespace):
+    """
+    Декоратор view: отдаёт анонимам готовый HTML из кэша.
+    namespace(request, **kwargs) возвращает пространство страницы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            key = namespaced_key(namespace(request, **kwargs), 'page', request.GET)
+            cached = cache.get(key)
+            if cached is not None:
+                _count(view_name, 'hit')
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            _count(view_name, 'miss')
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -1,14 +1,68 @@
 # catalog/filters.py
 import django_filters
+from django import forms
+
+from bookings.availability import free_between
 from .models import Product, Category
+from .search import get_search_backend
+
+DATE_WIDGET = forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d')
+
+
+class ProductFilterForm(forms.Form):
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get('available_from'), cleaned_data.get('available_to')
+        if start and end and end < start:
+            self.add_error('available_to', 'Дата окончания раньше даты начала')
+        return cleaned_data
+
 
 class ProductFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr='icontains', label='Название')
-    category = django_filters.ModelChoiceFilter(queryset=Category.objects.all(), label='Категория')
-    author = django_filters.CharFilter(lookup_expr='icontains', label='Автор')
+    q = django_filters.CharFilter(method='filter_fulltext', label='Поиск')
+    name = django_filters.CharFilter(method='filter_field', label='Название')
+    # Фильтр по id категории (category_id = ?) — без JOIN и сравнения строк
+    category = django_filters.ModelChoiceFilter(
+        queryset=Category.objects.order_by('name'), empty_label='Все категории', label='Категория',
+    )
+    author = django_filters.CharFilter(method='filter_field', label='Автор')
+    # daily_price в индексе product_available_price_idx
     price_min = django_filters.NumberFilter(field_name='daily_price', lookup_expr='gte', label='Цена от')
     price_max = django_filters.NumberFilter(field_name='daily_price', lookup_expr='lte', label='Цена до')
+    # Свободен все дни периода; одна дата — свободен в этот день.
+    # Обе границы применяются вместе в filter_queryset
+    available_from = django_filters.DateFilter(
+        method='filter_period_bound', label='Свободен с', widget=DATE_WIDGET,
+    )
+    available_to = django_filters.DateFilter(method='filter_period_bound', label='по', widget=DATE_WIDGET)
 
     class Meta:
         model = Product
-        fields = ['name', 'category', 'author', 'price_min', 'price_max']
\ No newline at end of file
+        form = ProductFilterForm
+        fields = ['q', 'name', 'category', 'author', 'price_min', 'price_max', 'available_from', 'available_to']
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        period = self.available_period()
+        if period is not None:
+            queryset = free_between(queryset, *period)
+        return queryset
+
+    def available_period(self):
+        """(начало, конец) периода из формы или None"""
+        start = self.form.cleaned_data.get('available_from')
+        end = self.form.cleaned_data.get('available_to')
+        if not (start or end):
+            return None
+        return start or end, end or start
+
+    def filter_period_bound(self, queryset, name, value):
+        return queryset
+
+    def filter_fulltext(self, queryset, name, value):
+        # Поиск по названию, описанию и автору с ранжированием (search_rank)
+        return get_search_backend().search(queryset, value)
+
+    def filter_field(self, queryset, name, value):
+        # Поиск по одному полю через тот же индекс вместо icontains
+        return get_search_backend().filter(queryset, value, fields=[name])
\ No newline at end of file
@@ -0,0 +1,128 @@
+# catalog/images.py
+"""
+Миниатюры фото товаров.
+
+Из загруженного фото делаются копии фиксированной ширины (PRODUCT_IMAGE_WIDTHS)
+в WebP и JPEG без EXIF. Лежат они в default_storage под thumbs/ и называются
+по хэшу содержимого оригинала, поэтому одинаковые фото обрабатываются один
+раз, а URL меняется вместе с фото (можно кэшировать навсегда).
+
+Делаются после сохранения товара (catalog/signals.py) или командой
+generate_thumbnails для уже загруженных файлов.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+WIDTHS = tuple(getattr(settings, 'PRODUCT_IMAGE_WIDTHS', (320, 640, 1024)))
+# Формат -> (расширение, MIME, параметры сохранения Pillow)
+FORMATS = {
+    'webp': ('webp', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def content_hash(file):
+    """sha256 содержимого файла (файл читается кусками и возвращается в начало)"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def derivative_name(photo_hash, width, fmt):
+    extension = FORMATS[fmt][0]
+    return f'thumbs/{photo_hash[:2]}/{photo_hash}/{width}.{extension}'
+
+
+def derivative_url(photo_hash, width, fmt):
+    return default_storage.url(derivative_name(photo_hash, width, fmt))
+
+
+def _prepare(image):
+    # Поворачиваем по EXIF-ориентации: сами EXIF в миниатюры не попадают
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # JPEG не умеет прозрачность — подкладываем белый фон
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    # Сохраняем без exif/icc — только пиксели
+    image.save(buffer, format=fmt.upper(), **FORMATS[fmt][2])
+    return buffer.getvalue()
+
+
+def generate_derivatives(file, photo_hash, overwrite=False):
+    """
+    Делает миниатюры всех ширин и форматов для файла с хэшем photo_hash.
+    Уже существующие пропускает. Возвращает число созданных файлов.
+    """
+    names = {
+        (width, fmt): derivative_name(photo_hash, width, fmt)
+        for width in WIDTHS for fmt in FORMATS
+    }
+    missing = {key: name for key, name in names.items() if overwrite or not default_storage.exists(name)}
+    if not missing:
+        return 0
+
+    file.seek(0)
+    with Image.open(file) as original:
+        source = _prepare(original)
+
+    created = 0
+    for width in sorted({width for width, _fmt in missing}, reverse=True):
+        # Не увеличиваем: узкое фото сохраняется как есть
+        resized = source
+        if source.width > width:
+            height = max(round(source.height * width / source.width), 1)
+            resized = source.resize((width, height), Image.LANCZOS)
+        for fmt in FORMATS:
+            name = missing.get((width, fmt))
+            if name is None:
+                continue
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(_encode(resized, fmt)))
+            created += 1
+        # Следующая ширина меньше — уменьшаем уже уменьшенное, это быстрее
+        source = resized
+    return created
+
+
+def generate_for_product(product, overwrite=False):
+    """
+    Делает миниатюры фото товара и только потом сохраняет его хэш: по
+    непустому photo_hash шаблон ссылается на миниатюры. Если сделать их
+    не удалось, хэш сбрасывается и шаблон показывает оригинал.
+    """
+    if not product.photo:
+        return 0
+    with product.photo.open('rb') as file:
+        photo_hash = product.photo_hash or content_hash(file)
+        try:
+            created = generate_derivatives(file, photo_hash, overwrite=overwrite)
+        except Exception:
+            if product.photo_hash:
+                product.photo_hash = ''
+                type(product).objects.filter(pk=product.pk).update(photo_hash='')
+            raise
+    if product.photo_hash != photo_hash:
+        product.photo_hash = photo_hash
+        type(product).objects.filter(pk=product.pk).update(photo_hash=photo_hash)
+    return created
+
+
+def srcset(photo_hash, fmt):
+    return ', '.join(f'{derivative_url(photo_hash, width, fmt)} {width}w' for width in WIDTHS)
@@ -0,0 +1,65 @@
+# catalog/listing.py
+"""
+Выборка товаров для каталога: фильтры (catalog/filters.py), сортировка и
+набор полей карточки. Используется страницей списка и бенчмарками
+(catalog/benchmarks), чтобы они мерили ровно тот запрос, что уходит в базу.
+"""
+from django.utils.functional import cached_property
+
+from .filters import ProductFilter
+from .models import Product
+from .pagination import KEYSET_ORDERING
+from .pricing import with_quotes
+
+# Поля, которые показывает карточка товара в списке (templates/catalog/list.html).
+# Описание, владелец и прочее не читаются — их нет смысла тянуть из базы
+CARD_FIELDS = (
+    'id', 'name', 'author', 'daily_price', 'weekly_price', 'deposit',
+    'photo', 'photo_hash', 'created_at', 'category__name',
+)
+
+
+def base_queryset():
+    """Доступные товары с категорией, только поля карточки"""
+    return (
+        Product.objects.filter(is_available=True)
+        .select_related('category')
+        .only(*CARD_FIELDS)
+    )
+
+
+class ProductListing:
+    """
+    Отфильтрованный и упорядоченный список товаров по GET-параметрам.
+    Порядок всегда однозначный: новые первыми, id — тай-брейкер; при
+    полнотекстовом поиске сначала по релевантности. Если заданы даты,
+    у каждого товара есть quote — цена аренды за этот период.
+    """
+
+    def __init__(self, params):
+        self.filterset = ProductFilter(params, queryset=base_queryset())
+
+    @cached_property
+    def _filtered(self):
+        return self.filterset.qs
+
+    @property
+    def ranked(self):
+        """Отсортирован ли список по релевантности (тогда курсоры не используются)"""
+        query = self._filtered.query
+        return 'search_rank' in query.annotations
+
+    @property
+    def period(self):
+        """(начало, конец) из фильтра по датам или None"""
+        self._filtered  # форма фильтра проверяется при построении выборки
+        return self.filterset.available_period()
+
+    @cached_property
+    def queryset(self):
+        queryset = self._filtered
+        if self.period is not None:
+            queryset = with_quotes(queryset, *self.period)
+        if self.ranked:
+            return queryset.order_by('search_rank', *KEYSET_ORDERING)
+        return queryset.order_by(*KEYSET_ORDERING)
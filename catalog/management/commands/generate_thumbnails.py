@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from catalog.images import generate_for_product
+from catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Делает миниатюры для уже загруженных фото товаров (products/)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать миниатюры, даже если они уже есть')
+        parser.add_argument('--batch-size', type=int, default=200, help='Сколько товаров читать из БД за раз')
+
+    def handle(self, *args, **options):
+        products = (
+            Product.objects.exclude(photo='').exclude(photo__isnull=True)
+            .only('pk', 'photo', 'photo_hash')
+            .order_by('pk')
+        )
+        processed = created = failed = 0
+        for product in products.iterator(chunk_size=options['batch_size']):
+            try:
+                created += generate_for_product(product, overwrite=options['force'])
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Товар {product.pk} ({product.photo.name}): {exc}')
+                continue
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано фото: {processed}, создано миниатюр: {created}, ошибок: {failed}'
+        ))
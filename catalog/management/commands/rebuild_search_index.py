@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalog.models import Product
+from catalog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс каталога по всем товарам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Сколько товаров вставлять за раз')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Бэкенд поиска: {backend.__class__.__name__}')
+
+        with transaction.atomic():
+            total = backend.rebuild(Product.objects.all(), batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано товаров: {total}'))
@@ -16,10 +16,54 @@ class Product(models.Model):
     weekly_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     deposit = models.DecimalField(max_digits=10, decimal_places=2)
     photo = models.ImageField(upload_to='products/', blank=True, null=True)
+    # sha256 содержимого фото — по нему называются миниатюры (catalog/images.py)
+    photo_hash = models.CharField(max_length=64, blank=True, editable=False)
     is_available = models.BooleanField(default=True)
     author = models.CharField(max_length=200, blank=True, null=True, verbose_name="Автор")
     
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Каталог: только доступные товары, новые первыми (и курсор по created_at, id)
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_available=True),
+                name='product_available_created_idx',
+            ),
+            # Фильтр по категории в том же порядке — без сортировки
+            models.Index(
+                fields=['category', '-created_at', '-id'],
+                condition=models.Q(is_available=True),
+                name='product_available_category_idx',
+            ),
+            # Фильтр по цене (price_min / price_max)
+            models.Index(
+                fields=['daily_price'],
+                condition=models.Q(is_available=True),
+                name='product_available_price_idx',
+            ),
+            # Админка: date_hierarchy по всем товарам, включая скрытые
+            models.Index(fields=['created_at'], name='product_created_idx'),
+        ]
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class ProductSearchIndex(models.Model):
+    """
+    Строка индекса FTS5 catalog_product_fts (только SQLite, catalog/search.py).
+    Таблицу создаёт миграция 0004 и пишет SQLiteFTSBackend; модель нужна,
+    чтобы присоединять индекс к товарам в ORM: rowid = id товара.
+    """
+    product = models.OneToOneField(
+        Product, primary_key=True, db_column='rowid', db_constraint=False,
+        on_delete=models.DO_NOTHING, related_name='search_index',
+    )
+    # Скрытый столбец FTS5 с именем таблицы: к нему применяются MATCH и bm25()
+    document = models.TextField(db_column='catalog_product_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'catalog_product_fts'
@@ -0,0 +1,169 @@
+# catalog/pagination.py
+import base64
+import json
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .cache import list_namespace, namespaced_key
+
+
+# Сортировка, на которой работает курсорная пагинация: новые товары первыми,
+# id — тай-брейкер для товаров с одинаковым created_at
+KEYSET_ORDERING = ('-created_at', '-id')
+
+# Сколько секунд держим закэшированный COUNT(*) для одного набора фильтров.
+# Изменение товаров сбрасывает его сразу (пространство list в catalog/cache.py)
+COUNT_CACHE_TIMEOUT = 5 * 60
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(obj, direction='next'):
+    """Кодирует позицию товара (created_at, id) в непрозрачный токен для URL"""
+    payload = json.dumps({
+        'd': direction,
+        'c': obj.created_at.isoformat(),
+        'i': obj.pk,
+    }, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора. Возвращает (direction, created_at, id)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        created_at = parse_datetime(payload['c'])
+        pk = int(payload['i'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+    if direction not in ('next', 'prev') or created_at is None:
+        raise InvalidCursor(token)
+    return direction, created_at, pk
+
+
+class KeysetPage:
+    """
+    Страница курсорной пагинации. Повторяет интерфейс Page, который нужен
+    шаблону (object_list, has_next, has_previous), но не знает общего
+    количества страниц — COUNT(*) для неё не выполняется.
+    """
+
+    number = None
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], 'next')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], 'prev')
+        return None
+
+
+class KeysetPaginator:
+    """
+    Курсорная (keyset) пагинация по (created_at, id) в порядке убывания.
+    Вместо OFFSET страница ищется условием WHERE по индексу, поэтому
+    глубокие страницы стоят столько же, сколько первая.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, cursor):
+        direction, created_at, pk = decode_cursor(cursor)
+        qs = self.queryset.order_by()
+
+        if direction == 'next':
+            # (created_at, id) < (c, i); первое условие даёт диапазон по индексу
+            qs = qs.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=pk)
+            rows = list(qs.order_by(*KEYSET_ORDERING)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            return KeysetPage(rows[:self.per_page], has_next=has_more, has_previous=True)
+
+        # Назад: идём по индексу в обратную сторону и разворачиваем результат
+        qs = qs.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=pk)
+        rows = list(qs.order_by('created_at', 'id')[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return KeysetPage(rows, has_next=True, has_previous=has_more)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Обычный постраничный Paginator, но COUNT(*) кэшируется по ключу
+    набора фильтров, чтобы не пересчитывать его на каждой странице.
+    """
+
+    def __init__(self, object_list, per_page, cache_key=None, keyset=True, **kwargs):
+        self.cache_key = cache_key
+        self.keyset = keyset
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.cache_key is None:
+            return super().count
+        count = cache.get(self.cache_key)
+        if count is None:
+            count = super().count
+            cache.set(self.cache_key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def page(self, number):
+        page = super().page(number)
+        objects = list(page.object_list)
+        page.object_list = objects
+        page.next_cursor = page.previous_cursor = None
+        if self.keyset and objects:
+            # Ссылки «вперёд/назад» ведут по курсору — это дешевле, чем OFFSET
+            if page.has_next():
+                page.next_cursor = encode_cursor(objects[-1], 'next')
+            if page.has_previous():
+                page.previous_cursor = encode_cursor(objects[0], 'prev')
+        return page
+
+
+def count_cache_key(params):
+    """Ключ кэша для COUNT(*) по нормализованным параметрам фильтра"""
+    return namespaced_key(list_namespace(params), 'count', params, exclude=('page', 'cursor'))
+
+
+def querystring_without_pagination(params):
+    """GET-параметры без page/cursor — для ссылок пагинации"""
+    params = params.copy()
+    params.pop('page', None)
+    params.pop('cursor', None)
+    return params.urlencode()
@@ -0,0 +1,58 @@
+# catalog/pricing.py
+"""
+Стоимость аренды за период: дни по daily_price, целые недели по
+weekly_price — берётся самое дешёвое сочетание. Неделя может покрыть и
+неполный остаток, если она дешевле оставшихся дней (5 дней по 300 ₽
+дороже недели за 1000 ₽).
+
+Одно правило в двух видах: quote() для одного товара в Python (создание
+брони) и quote_expression() — выражение SQL, которым база считает цену
+сразу для всей страницы каталога в том же запросе, что и саму страницу.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Least
+
+WEEK = 7
+PRICE_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+def rental_days(start, end):
+    """Сколько дней оплачивается: как при бронировании, конец не считается; минимум сутки"""
+    return max((end - start).days, 1)
+
+
+def quote(daily_price, weekly_price, days):
+    """Минимальная стоимость days дней аренды"""
+    daily_price = Decimal(daily_price)
+    best = daily_price * days
+    if weekly_price is not None:
+        weeks, rest = divmod(days, WEEK)
+        weekly_price = Decimal(weekly_price)
+        best = min(best, weeks * weekly_price + rest * daily_price, (weeks + 1) * weekly_price)
+    return best
+
+
+def quote_product(product, start, end):
+    return quote(product.daily_price, product.weekly_price, rental_days(start, end))
+
+
+def quote_expression(days):
+    """Выражение для annotate(): то же, что quote(), для каждой строки Product"""
+    weeks, rest = divmod(days, WEEK)
+    by_days = F('daily_price') * Value(days)
+    return Case(
+        When(weekly_price__isnull=True, then=by_days),
+        default=Least(
+            by_days,
+            F('weekly_price') * Value(weeks) + F('daily_price') * Value(rest),
+            F('weekly_price') * Value(weeks + 1),
+        ),
+        output_field=PRICE_FIELD,
+    )
+
+
+def with_quotes(queryset, start, end, name='quote'):
+    """Товары с ценой за период в поле name"""
+    return queryset.annotate(**{name: quote_expression(rental_days(start, end))})
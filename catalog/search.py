@@ -0,0 +1,216 @@
+# catalog/search.py
+"""
+Полнотекстовый поиск по каталогу (name, description, author).
+
+Бэкенд выбирается настройкой CATALOG_SEARCH_BACKEND (путь к классу).
+По умолчанию на SQLite используется индекс FTS5, на остальных базах —
+простой поиск через icontains, пока для них нет своего бэкенда
+(например, PostgreSQL с tsvector).
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField, Func, Lookup, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import ProductSearchIndex
+from .stemmer import stem
+
+# Поля товара, которые попадают в индекс, и их вес при ранжировании
+SEARCH_FIELDS = ('name', 'description', 'author')
+FIELD_WEIGHTS = {'name': 10.0, 'description': 1.0, 'author': 5.0}
+
+WORD_RE = re.compile(r'\w+')
+
+# Служебные слова запроса: в названиях и описаниях их может не быть
+# («учебник по матанализу» ищет «Учебник матанализа»). В индекс они попадают
+STOP_WORDS = frozenset('''
+    без более бы был была были было быть в во вот для до его ее ей если есть еще же за из
+    или им их к как ко ли мне мы на над не нет ни но о об обо он она они от по под после
+    при про с со так также то только у уже что чтобы эта эти это я
+    a an and for in of on or the to with
+'''.split())
+# Слова короче этого в запросе не учитываются (предлоги, обрывки), если есть другие
+MIN_QUERY_WORD = 3
+
+
+def analyze(text):
+    """Разбивает текст на слова и приводит их к основе (регистр, ё→е, стемминг)"""
+    if not text:
+        return []
+    return [stem(word) for word in WORD_RE.findall(text.lower())]
+
+
+def query_words(query):
+    """
+    Значимые слова поискового запроса: без служебных и коротких. Если
+    значимых нет (запрос «C++» или «по»), остаются все слова.
+    """
+    words = WORD_RE.findall((query or '').lower().replace('ё', 'е'))
+    significant = [w for w in words if len(w) >= MIN_QUERY_WORD and w not in STOP_WORDS]
+    return significant or words
+
+
+class Match(Lookup):
+    """document__match: выражение MATCH по индексу FTS5"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+ProductSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+class BaseSearchBackend:
+    """Интерфейс бэкенда поиска"""
+
+    def index(self, product):
+        """Добавляет или обновляет товар в индексе"""
+        raise NotImplementedError
+
+    def remove(self, pk):
+        """Удаляет товар из индекса"""
+        raise NotImplementedError
+
+    def rebuild(self, queryset, batch_size=1000):
+        """Полностью пересобирает индекс по queryset. Возвращает число товаров"""
+        raise NotImplementedError
+
+    def filter(self, queryset, query, fields=SEARCH_FIELDS):
+        """Оставляет в queryset товары, подходящие под запрос (без ранжирования)"""
+        raise NotImplementedError
+
+    def search(self, queryset, query, fields=SEARCH_FIELDS):
+        """
+        Фильтрует queryset по запросу и добавляет аннотацию search_rank
+        (меньше — релевантнее), по которой можно сортировать.
+        """
+        raise NotImplementedError
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Поиск без индекса через icontains — запасной вариант для любых баз"""
+
+    def index(self, product):
+        pass
+
+    def remove(self, pk):
+        pass
+
+    def rebuild(self, queryset, batch_size=1000):
+        return queryset.count()
+
+    def filter(self, queryset, query, fields=SEARCH_FIELDS):
+        for word in query_words(query):
+            condition = Q()
+            for field in fields:
+                condition |= Q(**{f'{field}__icontains': word})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def search(self, queryset, query, fields=SEARCH_FIELDS):
+        return self.filter(queryset, query, fields).annotate(search_rank=Value(0.0))
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    Индекс FTS5 в таблице catalog_product_fts (rowid = id товара).
+    В индекс пишется уже нормализованный текст (нижний регистр, основы
+    русских слов), английские слова дополнительно стеммит токенизатор porter.
+    """
+
+    table = 'catalog_product_fts'
+
+    def _row(self, product):
+        return [' '.join(analyze(getattr(product, field))) for field in SEARCH_FIELDS]
+
+    def index(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [product.pk])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description, author) VALUES (%s, %s, %s, %s)',
+                [product.pk, *self._row(product)],
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [pk])
+
+    def rebuild(self, queryset, batch_size=1000):
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            batch = []
+            for product in queryset.only('pk', *SEARCH_FIELDS).iterator(chunk_size=batch_size):
+                batch.append([product.pk, *self._row(product)])
+                if len(batch) >= batch_size:
+                    self._insert(cursor, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                self._insert(cursor, batch)
+                total += len(batch)
+            # Сливаем сегменты индекса, чтобы поиск не деградировал после массовой вставки
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return total
+
+    def _insert(self, cursor, rows):
+        cursor.executemany(
+            f'INSERT INTO {self.table} (rowid, name, description, author) VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+    def match_expression(self, query, fields=SEARCH_FIELDS, operator='AND'):
+        """
+        Строит выражение MATCH: значимые слова запроса (query_words), каждое
+        как префикс основы, через operator
+        """
+        terms = [f'"{stem(word)}"*' for word in query_words(query)]
+        if not terms:
+            return None
+        expression = f' {operator} '.join(terms)
+        if tuple(fields) != SEARCH_FIELDS:
+            expression = '{%s} : (%s)' % (' '.join(fields), expression)
+        return expression
+
+    def filter(self, queryset, query, fields=SEARCH_FIELDS):
+        expression = self.match_expression(query, fields)
+        if expression is None:
+            return queryset
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [expression],
+        ))
+
+    def search(self, queryset, query, fields=SEARCH_FIELDS):
+        # Любое из слов: товар, где совпало больше слов, bm25 ставит выше. Через
+        # AND «задачи для студентов» не нашло бы «сборник задач» без слова «студент»
+        expression = self.match_expression(query, fields, operator='OR')
+        if expression is None:
+            return queryset
+        # Соединяем с индексом (JOIN по rowid), а не считаем bm25 подзапросом на
+        # каждую строку: коррелированный подзапрос заново выполняет MATCH для каждого товара
+        weights = [Value(FIELD_WEIGHTS[field]) for field in SEARCH_FIELDS]
+        return queryset.filter(search_index__document__match=expression).annotate(
+            search_rank=Func(F('search_index__document'), *weights, function='bm25', output_field=FloatField()),
+        )
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Возвращает экземпляр бэкенда поиска из настроек (кэшируется)"""
+    global _backend
+    if _backend is None:
+        default = (
+            'catalog.search.SQLiteFTSBackend' if connection.vendor == 'sqlite'
+            else 'catalog.search.SimpleSearchBackend'
+        )
+        path = getattr(settings, 'CATALOG_SEARCH_BACKEND', default)
+        _backend = import_string(path)()
+    return _backend
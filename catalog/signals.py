@@ -0,0 +1,73 @@
+# catalog/signals.py
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import DATED_LIST, GLOBAL, LIST, invalidate, product_namespace
+from .images import generate_for_product
+from .models import Category, Product
+from .search import get_search_backend
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Product)
+def reset_photo_hash(sender, instance, raw=False, **kwargs):
+    """
+    Сбрасывает хэш при новом фото: хэш ставит generate_for_product только
+    после того, как записаны все миниатюры, а до этого шаблон показывает оригинал
+    """
+    if raw:
+        return
+    instance._photo_uploaded = False
+    if not instance.photo:
+        instance.photo_hash = ''
+    elif not instance.photo._committed:
+        # Новый файл ещё не записан в хранилище — миниатюры сделаем после коммита
+        instance.photo_hash = ''
+        instance._photo_uploaded = True
+
+
+@receiver(post_save, sender=Product)
+def make_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(instance, '_photo_uploaded', False):
+        return
+
+    def generate():
+        try:
+            generate_for_product(instance)
+        except Exception:
+            # Хэш не поставлен — шаблон покажет оригинал; догенерирует generate_thumbnails
+            logger.exception('Не удалось сделать миниатюры для товара %s', instance.pk)
+
+    transaction.on_commit(generate)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    """Обновляет поисковый индекс при сохранении товара"""
+    if raw:
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Убирает удалённый товар из поискового индекса"""
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_pages(sender, instance, raw=False, **kwargs):
+    """Товар меняет и списки, и свою страницу"""
+    invalidate(LIST, DATED_LIST, product_namespace(instance.pk))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_pages(sender, instance, raw=False, **kwargs):
+    # Категории видны в фильтре на каждой странице списка
+    invalidate(GLOBAL)
@@ -0,0 +1,121 @@
+# catalog/stemmer.py
+"""
+Стеммер русского языка (алгоритм Snowball / Портера для русского).
+Используется поиском по каталогу: слова приводятся к основе и при
+индексации, и при запросе, поэтому «учебники» находит «учебник».
+"""
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND_1 = ('в', 'вши', 'вшись')  # после «а» или «я»
+PERFECTIVE_GERUND_2 = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+
+PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')  # после «а» или «я»
+PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+
+REFLEXIVE = ('ся', 'сь')
+
+VERB_1 = (  # после «а» или «я»
+    'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны',
+    'ть', 'ешь', 'нно',
+)
+VERB_2 = (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им',
+    'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть',
+    'ишь', 'ую', 'ю',
+)
+
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей',
+    'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях',
+    'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _regions(word):
+    """Возвращает начала областей RV и R2"""
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _strip(word, start, endings, after_ya=()):
+    """
+    Ищет самое длинное окончание из endings/after_ya, целиком лежащее в
+    области с началом start. Окончания after_ya допустимы только после
+    «а»/«я». Возвращает слово без окончания или None.
+    """
+    best = None
+    for ending in endings + after_ya:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            if best is None or len(ending) > len(best):
+                best = ending
+    if best is None:
+        return None
+    cut = len(word) - len(best)
+    if best not in endings:
+        if cut - 1 < start or word[cut - 1] not in 'ая':
+            return None
+    return word[:cut]
+
+
+def stem(word):
+    """Основа русского слова. Слова без кириллицы возвращаются как есть."""
+    word = word.lower().replace('ё', 'е')
+    rv, r2 = _regions(word)
+    if rv >= len(word):
+        return word
+
+    # Шаг 1
+    stripped = _strip(word, rv, PERFECTIVE_GERUND_2, PERFECTIVE_GERUND_1)
+    if stripped is not None:
+        word = stripped
+    else:
+        word = _strip(word, rv, REFLEXIVE) or word
+        adjective = _strip(word, rv, ADJECTIVE)
+        if adjective is not None:
+            word = _strip(adjective, rv, PARTICIPLE_2, PARTICIPLE_1) or adjective
+        else:
+            stripped = _strip(word, rv, VERB_2, VERB_1)
+            if stripped is None:
+                stripped = _strip(word, rv, NOUN)
+            if stripped is not None:
+                word = stripped
+
+    # Шаг 2
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3
+    stripped = _strip(word, r2, DERIVATIONAL)
+    if stripped is not None:
+        word = stripped
+
+    # Шаг 4
+    stripped = _strip(word, rv, SUPERLATIVE)
+    if stripped is not None:
+        word = stripped
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif stripped is None and word.endswith('ь') and len(word) - 1 >= rv:
+        word = word[:-1]
+    return word
@@ -0,0 +1,40 @@
+# catalog/templatetags/product_images.py
+from django import template
+from django.utils.html import format_html
+
+from catalog.images import WIDTHS, derivative_url, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def product_srcset(product, fmt='webp'):
+    """srcset миниатюр фото товара: "url 320w, url 640w, ..." """
+    if not product.photo or not product.photo_hash:
+        return ''
+    return srcset(product.photo_hash, fmt)
+
+
+@register.simple_tag
+def product_image(product, sizes='100vw', css_class='', style='', lazy=True):
+    """
+    <picture> с WebP и JPEG нужных ширин. Пока миниатюр нет (старое фото
+    до generate_thumbnails) — обычный <img> с оригиналом.
+    """
+    if not product.photo:
+        return ''
+    loading = 'lazy' if lazy else 'eager'
+    if not product.photo_hash:
+        return format_html(
+            '<img src="{}" class="{}" style="{}" alt="{}" loading="{}">',
+            product.photo.url, css_class, style, product.name, loading,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" style="{}" alt="{}" loading="{}" decoding="async">'
+        '</picture>',
+        srcset(product.photo_hash, 'webp'), sizes,
+        derivative_url(product.photo_hash, WIDTHS[0], 'jpeg'), srcset(product.photo_hash, 'jpeg'), sizes,
+        css_class, style, product.name, loading,
+    )
@@ -1,3 +1,643 @@
-from django.test import TestCase
+import base64
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from bookings.models import Booking
+from rental_service.testing import QueryPlanAssertionsMixin
+from users.models import User
+from . import pricing
+from .images import FORMATS, WIDTHS, derivative_name
+from .models import Category, Product
+from .search import SEARCH_FIELDS, SQLiteFTSBackend, analyze
+from .stemmer import stem
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN проверяется только на SQLite')
+class ProductListQueryPlanTests(QueryPlanAssertionsMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        category = Category.objects.create(name='Учебники')
+        Product.objects.bulk_create([
+            Product(owner=owner, category=category, name=f'Учебник {i}', description='-',
+                    daily_price=10 + i, deposit=100, is_available=i % 5 != 0)
+            for i in range(40)
+        ])
+
+    def setUp(self):
+        # Страницы каталога кэшируются — план нужен у настоящего запроса
+        cache.clear()
+
+    def test_list_page_uses_available_index(self):
+        plans = self.captured_plans(lambda: self.client.get(reverse('catalog:product_list')), 'catalog_product')
+        self.assertTrue(plans)
+        # COUNT(*) может идти по любому частичному индексу доступных товаров
+        for plan in plans:
+            self.assertNoFullScan(plan, 'catalog_product')
+        self.assertUsesIndex(plans[-1], 'catalog_product', 'product_available_created_idx')
+
+    def test_cursor_page_uses_available_index(self):
+        response = self.client.get(reverse('catalog:product_list'))
+        cursor = response.context['page_obj'].next_cursor
+        plans = self.captured_plans(
+            lambda: self.client.get(reverse('catalog:product_list'), {'cursor': cursor}), 'catalog_product',
+        )
+        self.assertTrue(plans)
+        for plan in plans:
+            self.assertUsesIndex(plan, 'catalog_product', 'product_available_created_idx')
+            self.assertFalse(any('TEMP B-TREE' in line for line in plan), '\n'.join(plan))
+
+    def test_category_filter_uses_category_index(self):
+        category = Category.objects.get()
+        plans = self.captured_plans(
+            lambda: self.client.get(reverse('catalog:product_list'), {'category': category.pk}), 'catalog_product',
+        )
+        self.assertEqual(len(plans), 2)
+        for plan in plans:
+            self.assertUsesIndex(plan, 'catalog_product', 'product_available_category_idx')
+            self.assertFalse(any('TEMP B-TREE' in line for line in plan), '\n'.join(plan))
+
+    def test_page_loads_only_card_fields(self):
+        response = self.client.get(reverse('catalog:product_list'))
+        product = response.context['products'][0]
+        self.assertEqual(product.get_deferred_fields(), {'description', 'owner_id', 'is_available'})
+
+
+class ProductCursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        products = Product.objects.bulk_create([
+            Product(owner=owner, name=f'Учебник {i}', description='-', daily_price=10, deposit=100)
+            for i in range(31)
+        ])
+        # Группы по 4 товара с одинаковым created_at — порядок внутри решает id
+        start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        for i, product in enumerate(products):
+            Product.objects.filter(pk=product.pk).update(created_at=start + timedelta(minutes=i // 4))
+        cls.expected = list(Product.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, **params):
+        response = self.client.get(reverse('catalog:product_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_cursor_pages_have_no_gaps_or_duplicates(self):
+        page = self.get()
+        pages = [[product.pk for product in page]]
+        while page.next_cursor:
+            page = self.get(cursor=page.next_cursor)
+            pages.append([product.pk for product in page])
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(ids) for ids in pages], [12, 12, 7])
+
+        # Обратно от последней страницы — те же страницы в обратном порядке
+        backwards = [pages[-1]]
+        while page.previous_cursor:
+            page = self.get(cursor=page.previous_cursor)
+            backwards.append([product.pk for product in page])
+        self.assertEqual(backwards[::-1], pages)
+        self.assertFalse(page.has_previous())
+
+    def test_malformed_cursor_is_404(self):
+        url = reverse('catalog:product_list')
+        bad_direction = base64.urlsafe_b64encode(b'{"d":"up","c":"2025-01-01T00:00:00+00:00","i":1}').decode()
+        for cursor in ('garbage', '!!!', bad_direction, base64.urlsafe_b64encode(b'[1, 2]').decode()):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 404)
+
+
+class ProductThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+
+    def photo(self, size=(2000, 1500)):
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'  # Make
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def create_product(self, **kwargs):
+        return Product.objects.create(
+            owner=self.owner, name='Фото', description='-', daily_price=10, deposit=100, **kwargs,
+        )
+
+    def test_upload_generates_thumbnails_without_exif(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(photo=self.photo())
+        self.assertEqual(len(product.photo_hash), 64)
+        for width in WIDTHS:
+            for fmt in FORMATS:
+                with default_storage.open(derivative_name(product.photo_hash, width, fmt)) as file:
+                    image = Image.open(file)
+                    self.assertEqual(image.width, width)
+                    self.assertFalse(image.getexif())
+
+    def test_template_tag_renders_srcset(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(photo=self.photo())
+        html = Template('{% load product_images %}{% product_image product sizes="33vw" %}').render(
+            Context({'product': product})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(f'{product.photo_hash}/{WIDTHS[-1]}.webp {WIDTHS[-1]}w', html)
+        self.assertIn('loading="lazy"', html)
+        self.assertNotIn(product.photo.url, html)
+
+    def test_failed_generation_renders_original(self):
+        tag = Template('{% load product_images %}{% product_image product %}')
+        with mock.patch('catalog.images._encode', side_effect=OSError('disk full')):
+            with self.assertLogs('catalog.signals', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    product = self.create_product(photo=self.photo())
+        product.refresh_from_db()
+        self.assertEqual(product.photo_hash, '')
+        html = tag.render(Context({'product': product}))
+        self.assertIn(f'src="{product.photo.url}"', html)
+        self.assertNotIn('srcset', html)
+
+        # Пересоздание упало на середине — часть миниатюр удалена, ссылок на них нет
+        call_command('generate_thumbnails', stdout=io.StringIO())
+        product.refresh_from_db()
+        self.assertTrue(product.photo_hash)
+        with mock.patch('catalog.images._encode', side_effect=OSError('disk full')):
+            call_command('generate_thumbnails', '--force', stdout=io.StringIO(), stderr=io.StringIO())
+        product.refresh_from_db()
+        self.assertEqual(product.photo_hash, '')
+        self.assertIn(f'src="{product.photo.url}"', tag.render(Context({'product': product})))
+
+    def test_backfill_command(self):
+        product = self.create_product(photo=self.photo(size=(500, 400)))
+        Product.objects.filter(pk=product.pk).update(photo_hash='')
+
+        out = io.StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        product.refresh_from_db()
+        self.assertTrue(product.photo_hash)
+        # Узкое фото не увеличивается
+        with default_storage.open(derivative_name(product.photo_hash, WIDTHS[-1], 'jpeg')) as file:
+            self.assertEqual(Image.open(file).width, 500)
+
+        out = io.StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('создано миниатюр: 0', out.getvalue())
+
+
+class ExistingPhotoBackfillTests(TestCase):
+    """Фото, загруженные до миниатюр, лежат в MEDIA_ROOT проекта (media/products/)"""
+
+    PHOTO = 'products/1005457226.jpg'
+
+    def test_backfill_existing_upload(self):
+        self.assertTrue(default_storage.exists(self.PHOTO))
+        thumbs = os.path.join(settings.MEDIA_ROOT, 'thumbs')
+        if not os.path.exists(thumbs):
+            self.addCleanup(shutil.rmtree, thumbs, True)
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        product = Product.objects.create(owner=owner, name='Фото', description='-', daily_price=10, deposit=100)
+        # Как у товаров до миниатюр: путь к файлу есть, хэша нет
+        Product.objects.filter(pk=product.pk).update(photo=self.PHOTO, photo_hash='')
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command('generate_thumbnails', stdout=out, stderr=err)
+        product.refresh_from_db()
+        self.addCleanup(shutil.rmtree, os.path.join(thumbs, product.photo_hash[:2]), True)
+        self.assertEqual(err.getvalue(), '')
+        self.assertIn('ошибок: 0', out.getvalue())
+        self.assertEqual(len(product.photo_hash), 64)
+        for fmt in FORMATS:
+            self.assertTrue(default_storage.exists(derivative_name(product.photo_hash, WIDTHS[0], fmt)))
+
+        response = self.client.get(reverse('catalog:product_detail', args=[product.pk]))
+        self.assertContains(response, f'{product.photo_hash}/{WIDTHS[0]}.webp')
+
+
+class CatalogPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        self.category = Category.objects.create(name='Учебники')
+        self.product = Product.objects.create(
+            owner=self.owner, category=self.category, name='Матанализ', description='-',
+            daily_price=10, deposit=100,
+        )
+        self.list_url = reverse('catalog:product_list')
+        self.detail_url = reverse('catalog:product_detail', args=[self.product.pk])
+
+    def assertCache(self, url, expected, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], expected)
+        return response
+
+    def test_anonymous_pages_are_served_from_cache(self):
+        self.assertCache(self.list_url, 'MISS')
+        with self.assertNumQueries(0):
+            self.assertCache(self.list_url, 'HIT')
+        self.assertCache(self.detail_url, 'MISS')
+        self.assertCache(self.detail_url, 'HIT')
+
+    def test_key_depends_on_normalized_params(self):
+        self.assertCache(self.list_url, 'MISS', {'price_min': 5, 'name': 'мат', 'author': ''})
+        self.assertCache(self.list_url, 'HIT', {'name': 'мат', 'price_min': 5})
+        self.assertCache(self.list_url, 'MISS', {'name': 'мат', 'price_min': 5, 'page': 1})
+
+    def test_product_change_invalidates_list_and_its_page(self):
+        other = Product.objects.create(owner=self.owner, name='Другой', description='-', daily_price=5, deposit=50)
+        other_url = reverse('catalog:product_detail', args=[other.pk])
+        for url in (self.list_url, self.detail_url, other_url):
+            self.assertCache(url, 'MISS')
+
+        self.product.name = 'Линейная алгебра'
+        self.product.save()
+
+        self.assertContains(self.assertCache(self.list_url, 'MISS'), 'Линейная алгебра')
+        self.assertCache(self.detail_url, 'MISS')
+        self.assertCache(other_url, 'HIT')
+
+    def test_booking_does_not_invalidate_pages(self):
+        # Занятые даты календарь берёт из product_availability, а не из HTML
+        self.assertCache(self.list_url, 'MISS')
+        self.assertCache(self.detail_url, 'MISS')
+        renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        Booking.objects.create(
+            renter=renter, product=self.product, start_date=date.today(),
+            end_date=date.today() + timedelta(days=2), total_cost=30, status='confirmed',
+        )
+        self.assertCache(self.list_url, 'HIT')
+        self.assertCache(self.detail_url, 'HIT')
+
+    def test_category_change_invalidates_everything(self):
+        self.assertCache(self.list_url, 'MISS')
+        self.assertCache(self.detail_url, 'MISS')
+        self.category.name = 'Пособия'
+        self.category.save()
+        self.assertContains(self.assertCache(self.list_url, 'MISS'), 'Пособия')
+        self.assertCache(self.detail_url, 'MISS')
+
+    def test_authenticated_users_bypass_cache(self):
+        self.assertCache(self.list_url, 'MISS')
+        self.client.force_login(self.owner)
+        response = self.client.get(self.list_url)
+        self.assertNotIn('X-Cache', response)
+
+    def test_stats_view_for_staff(self):
+        self.assertCache(self.list_url, 'MISS')
+        self.assertCache(self.list_url, 'HIT')
+        self.assertCache(self.list_url, 'HIT')
+        stats_url = reverse('catalog:cache_stats')
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(stats_url).status_code, 302)
+
+        User.objects.filter(pk=self.owner.pk).update(is_staff=True)
+        data = self.client.get(stats_url).json()
+        self.assertEqual(data['list'], {'hits': 2, 'misses': 1, 'hit_ratio': 0.667})
+
+
+class ProductAvailabilityApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        self.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        self.product = Product.objects.create(owner=owner, name='Палатка', description='-', daily_price=10, deposit=100)
+        self.url = reverse('catalog:product_availability', args=[self.product.pk])
+        # Следующий месяц целиком
+        self.month = (date.today().replace(day=1) + timedelta(days=40)).replace(day=1)
+
+    def book(self, start, days, status='confirmed'):
+        return Booking.objects.create(
+            renter=self.renter, product=self.product, start_date=start,
+            end_date=start + timedelta(days=days - 1), total_cost=10 * days, status=status,
+        )
+
+    def period(self):
+        return {'start': f'{self.month.isoformat()}T00:00:00+03:00', 'end': (self.month + timedelta(days=35)).isoformat()}
+
+    def test_adjacent_bookings_are_merged_and_period_is_bounded(self):
+        self.book(self.month + timedelta(days=2), 3)
+        self.book(self.month + timedelta(days=5), 2)
+        self.book(self.month + timedelta(days=10), 1, status='pending')
+        self.book(self.month - timedelta(days=30), 3)
+        self.book(self.month + timedelta(days=100), 3)
+
+        events = self.client.get(self.url, self.period()).json()
+        self.assertEqual(
+            [(event['start'], event['end']) for event in events],
+            [((self.month + timedelta(days=2)).isoformat(), (self.month + timedelta(days=7)).isoformat())],
+        )
+
+    def test_unchanged_month_returns_304(self):
+        self.book(self.month + timedelta(days=2), 3)
+        response = self.client.get(self.url, self.period())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertTrue(response['Last-Modified'])
+
+        self.assertEqual(self.client.get(self.url, self.period(), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(
+            self.client.get(self.url, self.period(), HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304,
+        )
+
+        self.book(self.month + timedelta(days=20), 2)
+        response = self.client.get(self.url, self.period(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_bad_period_is_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2026-01-10', 'end': '2026-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': '2020-01-01', 'end': '2026-01-01'}).status_code, 400)
+
+    def test_detail_page_has_no_inline_events(self):
+        self.book(self.month + timedelta(days=2), 3)
+        response = self.client.get(reverse('catalog:product_detail', args=[self.product.pk]))
+        self.assertNotContains(response, 'events-data')
+        self.assertContains(response, self.url)
+
+
+class ProductDateFilterTests(QueryPlanAssertionsMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.busy, cls.requested, cls.free = Product.objects.bulk_create([
+            Product(owner=cls.owner, name=name, description='-', daily_price=price, deposit=100)
+            for name, price in (('Занятый', 10), ('Запрошенный', 20), ('Свободный', 30))
+        ])
+        cls.start = date.today() + timedelta(days=10)
+        for product, status in ((cls.busy, 'confirmed'), (cls.requested, 'pending')):
+            Booking.objects.create(
+                renter=cls.renter, product=product, start_date=cls.start,
+                end_date=cls.start + timedelta(days=2), total_cost=30, status=status,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def listed(self, **params):
+        response = self.client.get(reverse('catalog:product_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, {product.name for product in response.context['products']}
+
+    def test_busy_products_are_excluded(self):
+        _response, names = self.listed(
+            available_from=(self.start + timedelta(days=2)).isoformat(),
+            available_to=(self.start + timedelta(days=6)).isoformat(),
+        )
+        self.assertEqual(names, {'Запрошенный', 'Свободный'})
+        # Одна дата — свободен в этот день; соседний день после брони свободен
+        _response, names = self.listed(available_from=(self.start + timedelta(days=3)).isoformat())
+        self.assertEqual(names, {'Занятый', 'Запрошенный', 'Свободный'})
+
+    def test_combines_with_other_filters(self):
+        _response, names = self.listed(available_to=self.start.isoformat(), price_max=25)
+        self.assertEqual(names, {'Запрошенный'})
+
+    def test_reversed_period_is_an_error(self):
+        response, names = self.listed(
+            available_from=self.start.isoformat(), available_to=(self.start - timedelta(days=5)).isoformat(),
+        )
+        self.assertContains(response, 'Дата окончания раньше даты начала')
+        # Применяется только корректная граница
+        self.assertEqual(names, {'Запрошенный', 'Свободный'})
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN проверяется только на SQLite')
+    def test_anti_join_uses_booked_day_index(self):
+        plans = self.captured_plans(
+            lambda: self.listed(available_from=self.start.isoformat(), available_to=self.start.isoformat()),
+            'bookings_bookedday',
+        )
+        self.assertTrue(plans)
+        for plan in plans:
+            # Уникальный (product, day) — автоиндекс SQLite; подзапрос — один поиск по нему на товар
+            self.assertTrue(
+                any('INDEX sqlite_autoindex_bookings_bookedday' in line and 'product_id=? AND day>' in line
+                    for line in plan),
+                '\n'.join(plan),
+            )
+
+    def test_booking_invalidates_only_dated_pages(self):
+        url = reverse('catalog:product_list')
+        period = {'available_from': self.start.isoformat(), 'available_to': self.start.isoformat()}
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url, period)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url, period)['X-Cache'], 'HIT')
+
+        Booking.objects.create(
+            renter=self.renter, product=self.free, start_date=self.start,
+            end_date=self.start, total_cost=30, status='confirmed',
+        )
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        response = self.client.get(url, period)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual({product.name for product in response.context['products']}, {'Запрошенный'})
+
+
+class StemmerTests(TestCase):
+
+    def test_word_forms_share_stem(self):
+        for words in (('учебник', 'учебники', 'учебника', 'учебниками'), ('велосипед', 'велосипедов'),
+                      ('книга', 'Книги')):
+            self.assertEqual({stem(word) for word in words}, {stem(words[0])}, words)
+
+    def test_yo_is_folded(self):
+        self.assertEqual(stem('ёлка'), stem('елки'))
+        self.assertEqual(stem('зелёный'), stem('зеленая'))
+
+    def test_non_cyrillic_words_are_kept(self):
+        self.assertEqual(stem('books'), 'books')
+        self.assertEqual(analyze('Harry Potter, 2-е изд.'), ['harry', 'potter', '2', 'е', 'изд'])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Индекс FTS5 есть только на SQLite')
+class ProductSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.books = Category.objects.create(name='Книги')
+        cls.tools = Category.objects.create(name='Инструменты')
+
+        def create(name, description='-', author='', category=None, price=100):
+            return Product.objects.create(
+                owner=cls.owner, name=name, description=description, author=author,
+                category=category or cls.books, daily_price=price, deposit=100,
+            )
+
+        cls.textbook = create('Учебник по высшей математике', author='Пискунов', price=50)
+        cls.tree = create('Ёлка искусственная', 'Зелёная, 150 см', category=cls.tools)
+        cls.novel = create('Running with scissors', 'Memoir about books', author='Burroughs', price=300)
+        cls.drill = create('Дрель', 'Подходит для учебных мастерских', category=cls.tools)
+
+    def setUp(self):
+        cache.clear()
+        self.backend = SQLiteFTSBackend()
+
+    def searched(self, query, fields=SEARCH_FIELDS):
+        return set(self.backend.filter(Product.objects.all(), query, fields))
+
+    def listed(self, **params):
+        response = self.client.get(reverse('catalog:product_list'), params)
+        self.assertEqual(response.status_code, 200)
+        return [product.name for product in response.context['products']]
+
+    def test_match_expression(self):
+        self.assertEqual(self.backend.match_expression('Учебники Пискунова'), '"учебник"* AND "пискунов"*')
+        self.assertEqual(self.backend.match_expression('книги', fields=['name']), '{name} : ("книг"*)')
+        self.assertIsNone(self.backend.match_expression(' ,. '))
+        # Кавычки в запросе не ломают синтаксис MATCH
+        self.assertEqual(self.searched('"учебник'), {self.textbook})
+
+    def test_word_forms_and_yo(self):
+        self.assertEqual(self.searched('учебники'), {self.textbook})
+        self.assertEqual(self.searched('УЧЕБНИКАМИ математики'), {self.textbook})
+        self.assertEqual(self.searched('елка зеленая'), {self.tree})
+        self.assertEqual(self.searched('ёлку'), {self.tree})
+
+    def test_stop_words_and_any_word_queries(self):
+        demidovich = Product.objects.create(
+            owner=self.owner, name='Учебник матанализа', description='Демидович, сборник задач',
+            category=self.books, daily_price=70, deposit=100,
+        )
+        # Предлоги не требуются в тексте товара
+        self.assertEqual(self.searched('учебник по матанализу'), {demidovich})
+        self.assertEqual(self.backend.match_expression('задачи для студентов'), '"задач"* AND "студент"*')
+        # В поиске по q хватает любого слова; совпавший по всем словам — выше
+        self.assertEqual(self.listed(q='задачи для студентов'), ['Учебник матанализа'])
+        self.assertEqual(self.listed(q='учебник по матанализу')[:2], ['Учебник матанализа', 'Учебник по высшей математике'])
+        # Запрос только из служебных слов ищет как есть
+        self.assertEqual(self.backend.match_expression('по'), '"по"*')
+
+    def test_english_words_are_stemmed(self):
+        self.assertEqual(self.searched('run'), {self.novel})
+        self.assertEqual(self.searched('book memoirs'), {self.novel})
+
+    def test_field_filter(self):
+        self.assertEqual(self.searched('пискунов'), {self.textbook})
+        self.assertEqual(self.searched('пискунов', fields=['name']), set())
+        self.assertEqual(self.searched('пискунов', fields=['author']), {self.textbook})
+
+    def test_index_follows_edit_and_delete(self):
+        self.textbook.name = 'Задачник по физике'
+        self.textbook.save()
+        self.assertEqual(self.searched('учебник'), set())
+        self.assertEqual(self.searched('задачники'), {self.textbook})
+        pk = self.drill.pk
+        self.drill.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {self.backend.table} WHERE rowid = %s', [pk])
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(self.searched('дрель'), set())
+
+    def test_name_matches_rank_first(self):
+        # «учебн» в названии весит больше, чем в описании
+        self.assertEqual(self.listed(q='учебный'), ['Учебник по высшей математике', 'Дрель'])
+
+    def test_combines_with_other_filters(self):
+        self.assertEqual(self.listed(q='учебный', category=self.tools.pk), ['Дрель'])
+        self.assertEqual(self.listed(q='учебный', price_max=60), ['Учебник по высшей математике'])
+        self.assertEqual(self.listed(q='ёлка', author='пискунов'), [])
+
+    def test_rebuild_search_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.backend.table}')
+        self.assertEqual(self.searched('дрель'), set())
+        # Товар, сохранённый в обход сигналов, попадает в индекс только после пересборки
+        Product.objects.filter(pk=self.drill.pk).update(name='Перфоратор')
+        out = io.StringIO()
+        call_command('rebuild_search_index', batch_size=3, stdout=out)
+        self.assertIn('Проиндексировано товаров: 4', out.getvalue())
+        self.assertEqual(self.searched('перфоратор'), {self.drill})
+        self.assertEqual(self.searched('учебники'), {self.textbook})
+
+
+class PricingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.products = Product.objects.bulk_create([
+            Product(owner=cls.owner, name=f'Товар {i}', description='-', daily_price=daily,
+                    weekly_price=weekly, deposit=100)
+            for i, (daily, weekly) in enumerate([
+                (Decimal('300'), Decimal('1000')), (Decimal('99.90'), Decimal('650.50')),
+                (Decimal('100'), None), (Decimal('100'), Decimal('900')),
+            ])
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_quote_picks_cheapest_combination(self):
+        self.assertEqual(pricing.quote(300, 1000, 3), 900)
+        # Пять дней дороже недели
+        self.assertEqual(pricing.quote(300, 1000, 5), 1000)
+        self.assertEqual(pricing.quote(300, 1000, 8), 1300)
+        self.assertEqual(pricing.quote(300, 1000, 13), 2000)
+        self.assertEqual(pricing.quote(100, None, 10), 1000)
+        # Неделя дороже семи дней — не используется
+        self.assertEqual(pricing.quote(100, 900, 8), 800)
+
+    def test_sql_matches_python(self):
+        start = date.today()
+        for days in range(1, 30):
+            quoted = dict(pricing.with_quotes(
+                Product.objects.all(), start, start + timedelta(days=days),
+            ).values_list('pk', 'quote'))
+            for product in self.products:
+                self.assertEqual(quoted[product.pk], pricing.quote_product(product, start, start + timedelta(days=days)))
+
+    def test_list_page_shows_quotes_in_one_query(self):
+        start = date.today() + timedelta(days=3)
+        params = {'available_from': start.isoformat(), 'available_to': (start + timedelta(days=5)).isoformat()}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('catalog:product_list'), params)
+        self.assertContains(response, '1000.00 ₽')
+        page_queries = [query for query in ctx.captured_queries if 'catalog_product' in query['sql']]
+        self.assertEqual(len(page_queries), 2)  # COUNT(*) и сама страница
+        self.assertEqual(
+            {product.pk: product.quote for product in response.context['products']},
+            {product.pk: pricing.quote_product(product, start, start + timedelta(days=5)) for product in self.products},
+        )
+
+    def test_create_booking_uses_weekly_price(self):
+        self.client.force_login(self.renter)
+        start = date.today() + timedelta(days=3)
+        response = self.client.post(
+            reverse('bookings:create_booking', args=[self.products[0].pk]),
+            {'start_date': start.isoformat(), 'end_date': (start + timedelta(days=6)).isoformat()},
+        )
+        self.assertRedirects(response, reverse('bookings:my_bookings'))
+        self.assertEqual(Booking.objects.get().total_cost, 1000)
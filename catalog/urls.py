@@ -8,9 +8,12 @@ urlpatterns = [
     path('', views.ProductListView.as_view(), name='product_list'),        
     # Детальная страница товара
     path('<int:pk>/', views.product_detail, name='product_detail'),
+    # Занятые даты для календаря: ?start=YYYY-MM-DD&end=YYYY-MM-DD
+    path('<int:pk>/availability/', views.product_availability, name='product_availability'),
     # Добавление нового товара
     path('add/', views.product_create, name='product_create'),
     path('my-products/', views.my_products, name='my_products'),
     path('<int:pk>/update/', views.product_update, name='product_update'),
     path('<int:pk>/delete/', views.product_delete, name='product_delete'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
 ]
\ No newline at end of file
@@ -1,96 +1,136 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_GET
 from django.views.generic import ListView
-from django.core.paginator import Paginator
-from django.core.serializers.json import DjangoJSONEncoder
-import json
-from datetime import timedelta
-import django_filters
+
+from bookings import availability
 
 from .models import Product
 from .forms import ProductCreateForm
-from .filters import ProductFilter
-
-
-# Фильтр (уже с автором)
-class ProductFilter(django_filters.FilterSet):
-    name = django_filters.CharFilter(lookup_expr='icontains', label='Название')
-    category = django_filters.CharFilter(field_name='category__name', lookup_expr='iexact', label='Категория')
-    author = django_filters.CharFilter(lookup_expr='icontains', label='Автор')
-    price_min = django_filters.NumberFilter(field_name='daily_price', lookup_expr='gte', label='Цена от')
-    price_max = django_filters.NumberFilter(field_name='daily_price', lookup_expr='lte', label='Цена до')
-
-    class Meta:
-        model = Product
-        fields = ['name', 'category', 'author', 'price_min', 'price_max']
+from .listing import ProductListing
+from .cache import cache_page, list_namespace, product_namespace, stats as cache_stats_data
+from .pagination import (
+    CachedCountPaginator, InvalidCursor, KeysetPaginator,
+    count_cache_key, querystring_without_pagination,
+)
 
 
 # Список товаров с пагинацией (рекомендуемый классовый подход)
+@method_decorator(cache_page('list', lambda request: list_namespace(request.GET)), name='dispatch')
 class ProductListView(ListView):
     model = Product
     template_name = 'catalog/list.html'
     context_object_name = 'products'
     paginate_by = 12  # ← 12 товаров на страницу (можно изменить)
+    paginator_class = CachedCountPaginator
 
     def get_queryset(self):
-        # Только доступные товары
-        queryset = Product.objects.filter(is_available=True).select_related('category', 'owner')
-        # Применяем фильтр
-        self.filterset = ProductFilter(self.request.GET, queryset=queryset)
-        return self.filterset.qs
+        # Фильтры, сортировка и поля карточки — в catalog/listing.py
+        listing = ProductListing(self.request.GET)
+        self.filterset = listing.filterset
+        self.period = listing.period
+        # При полнотекстовом поиске сортируем по релевантности, курсоры не используются
+        self.ranked = listing.ranked
+        return listing.queryset
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        # COUNT(*) кэшируется для каждого набора фильтров отдельно
+        return self.paginator_class(
+            queryset, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page,
+            cache_key=count_cache_key(self.request.GET),
+            keyset=not self.ranked, **kwargs,
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get('cursor')
+        if not cursor or self.ranked:
+            return super().paginate_queryset(queryset, page_size)
+        # Курсорный режим: страница по индексу (created_at, id), без COUNT(*)
+        try:
+            page = KeysetPaginator(queryset, page_size).page(cursor)
+        except InvalidCursor:
+            raise Http404('Некорректный курсор страницы')
+        return (None, page, page.object_list, page.has_other_pages())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['filter'] = self.filterset
+        context['period'] = self.period
+        context['pagination_query'] = querystring_without_pagination(self.request.GET)
+        page = context['page_obj']
+        if context['paginator'] is not None and page is not None:
+            context['page_range'] = context['paginator'].get_elided_page_range(page.number, on_each_side=2, on_ends=1)
         return context
 
 
-# Функциональный вариант (если хочешь оставить функцию вместо класса)
-def product_list(request):
-    queryset = Product.objects.filter(is_available=True).select_related('category', 'owner')
-    product_filter = ProductFilter(request.GET, queryset=queryset)
-    
-    # Пагинация
-    paginator = Paginator(product_filter.qs, 12)  # 12 товаров на страницу
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    context = {
-        'filter': product_filter,
-        'page_obj': page_obj,  # ← передаём объект пагинации
-        'products': page_obj,  # можно использовать и page_obj
-    }
-    return render(request, 'catalog/list.html', context)
-
-
 # Детальная страница товара
+@cache_page('detail', lambda request, pk: product_namespace(pk))
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
-    
-    bookings = product.booking_set.filter(
-        status__in=['confirmed', 'active']
-    ).select_related('renter')
-
-    events = []
-    for booking in bookings:
-        end_date_exclusive = booking.end_date + timedelta(days=1)
-        events.append({
-            'title': 'Забронировано',
-            'start': booking.start_date.isoformat(),
-            'end': end_date_exclusive.isoformat(),
-            'color': '#dc3545',
-            'allDay': True,
-            'classNames': ['fc-booked-event'],
-        })
+    product = get_object_or_404(Product.objects.select_related('owner'), pk=pk)
 
+    # Занятые даты календарь запрашивает сам — product_availability
     context = {
         'product': product,
-        'events_json': json.dumps(events, cls=DjangoJSONEncoder),
     }
     return render(request, 'catalog/detail.html', context)
 
 
+# Самый длинный период, который можно запросить за раз (FullCalendar просит
+# видимую сетку месяца — до 6 недель)
+AVAILABILITY_MAX_DAYS = 400
+
+
+def _availability_period(request):
+    """[start, end] из ?start=&end= (FullCalendar шлёт ISO-дату или дату со временем, end — исключительно)"""
+    start = parse_date(request.GET.get('start', '')[:10])
+    end = parse_date(request.GET.get('end', '')[:10])
+    if start is None or end is None or end <= start or (end - start).days > AVAILABILITY_MAX_DAYS:
+        return None
+    return start, end - timedelta(days=1)
+
+
+def _availability_etag(request, pk):
+    period = _availability_period(request)
+    if period is None:
+        return None
+    key = f'{availability.version(pk)}:{period[0]}:{period[1]}'
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def _availability_last_modified(request, pk):
+    return datetime.fromtimestamp(availability.last_changed(pk), tz=timezone.utc)
+
+
+# Занятые даты товара для календаря: JSON-массив событий FullCalendar
+@require_GET
+@condition(etag_func=_availability_etag, last_modified_func=_availability_last_modified)
+def product_availability(request, pk):
+    period = _availability_period(request)
+    if period is None:
+        return HttpResponseBadRequest('Нужны даты start и end (YYYY-MM-DD), не больше чем на 400 дней')
+    if not Product.objects.filter(pk=pk).exists():
+        raise Http404
+    response = JsonResponse(availability.calendar_events(pk, *period), safe=False)
+    # Браузер хранит ответ, но каждый раз переспрашивает — неизменный месяц придёт как 304
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+# Счётчики кэша страниц каталога — для мониторинга
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse(cache_stats_data())
+
+
 # Создание товара
 @login_required
 def product_create(request):
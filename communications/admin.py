@@ -1,3 +1,45 @@
-from django.contrib import admin
+# communications/admin.py
+from django.contrib import admin, messages
+from django.utils import timezone
 
-# Register your models here.
+from rental_service.admin import ScalableModelAdmin
+from .models import ChatMessage, ChatUnread, OutboundEmail
+
+
+@admin.register(ChatMessage)
+class ChatMessageAdmin(ScalableModelAdmin):
+    list_display = ('booking_id', 'sender', 'timestamp', 'message')
+    list_select_related = ('sender',)
+    raw_id_fields = ('booking', 'sender')
+    search_fields = ('=booking__id',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Только по номеру брони — индекс chat_booking_timestamp_idx; текст не ищется"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if not term.isdigit():
+            return queryset.none(), False
+        return queryset.filter(booking_id=int(term)), False
+
+
+@admin.register(ChatUnread)
+class ChatUnreadAdmin(ScalableModelAdmin):
+    list_display = ('user', 'booking_id', 'count')
+    list_select_related = ('user',)
+    raw_id_fields = ('user', 'booking')
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(ScalableModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ('retry_emails',)
+
+    @admin.action(description='Отправить повторно')
+    def retry_emails(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), last_error='',
+        )
+        self.message_user(request, f'Поставлено в очередь: {updated}', messages.SUCCESS)
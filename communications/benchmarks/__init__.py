@@ -0,0 +1 @@
+# Бенчмарки чата. Запуск: python -m communications.benchmarks.history --help
@@ -0,0 +1,140 @@
+# communications/benchmarks/history.py
+"""
+Бенчмарк истории чата: страница сообщений при растущей таблице.
+
+    python -m communications.benchmarks.history [--messages 1000000] [--repeat 20] [--json out.json]
+
+Таблица сообщений наполняется ступенями (1%, 10%, 100% от --messages),
+десятая часть сообщений — в одной «горячей» брони. На каждой ступени
+меряется страница истории этой брони: первая, из середины и самая старая
+по курсору (chat.history), та же середина через OFFSET — для сравнения, и
+число непрочитанных: счётчик ChatUnread против COUNT(*) по сообщениям.
+Курсорные страницы и счётчик должны стоить одинаково на любой ступени.
+"""
+import argparse
+import random
+import sys
+from datetime import timedelta
+
+from rental_service.benchmarks import dump_json, measure, print_table, setup_django, temporary_database
+
+PAGE_SIZE = 50
+BATCH_SIZE = 20_000
+HOT_SHARE = 0.1
+
+
+def seed_bookings(count, stdout):
+    from datetime import date
+
+    from bookings.models import Booking
+    from catalog.benchmarks.seed import seed_catalog
+    from catalog.models import Product
+
+    _categories, users = seed_catalog(products=1_000, users=200, stdout=stdout)
+    products = list(Product.objects.values_list('pk', 'owner_id'))
+    rng = random.Random(7)
+    bookings = []
+    for i in range(count):
+        product_id, owner_id = rng.choice(products)
+        renter = rng.choice([user for user in users[:10] if user.pk != owner_id])
+        bookings.append(Booking(
+            product_id=product_id, renter=renter, total_cost=100, status='confirmed',
+            start_date=date.today() + timedelta(days=i % 300), end_date=date.today() + timedelta(days=i % 300 + 1),
+        ))
+    return Booking.objects.bulk_create(bookings)
+
+
+def add_messages(bookings, count, start, rng):
+    """Дописывает count сообщений, время идёт дальше от start. Возвращает новое время"""
+    from communications.models import ChatMessage
+    from rental_service.seeding import explicit_timestamps
+
+    hot = bookings[0]
+    timestamp = start
+    with explicit_timestamps(ChatMessage, 'timestamp'):
+        for offset in range(0, count, BATCH_SIZE):
+            batch = []
+            for _ in range(min(BATCH_SIZE, count - offset)):
+                booking = hot if rng.random() < HOT_SHARE else rng.choice(bookings)
+                timestamp += timedelta(seconds=rng.randint(1, 5))
+                sender_id = booking.renter_id if rng.random() < 0.5 else booking.product.owner_id
+                batch.append(ChatMessage(booking_id=booking.pk, sender_id=sender_id, message='сообщение', timestamp=timestamp))
+            ChatMessage.objects.bulk_create(batch)
+    return timestamp
+
+
+def measure_stage(hot, repeat):
+    from django.db import connection
+
+    from communications import chat
+    from communications.models import ChatMessage, ChatUnread
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    in_room = ChatMessage.objects.filter(booking=hot).count()
+    ordered = ChatMessage.objects.filter(booking=hot).order_by('-timestamp', '-id')
+    middle = ordered[in_room // 2]
+    oldest_page = ordered[max(in_room - PAGE_SIZE - 1, 0)]
+    cursor_of = lambda message: (message.timestamp, message.pk)  # noqa: E731
+    ChatUnread.objects.update_or_create(user_id=hot.product.owner_id, booking=hot, defaults={'count': in_room})
+
+    first, _ = measure(lambda: chat.history(hot.pk, None, PAGE_SIZE), repeat=repeat)
+    mid, _ = measure(lambda: chat.history(hot.pk, cursor_of(middle), PAGE_SIZE), repeat=repeat)
+    last, _ = measure(lambda: chat.history(hot.pk, cursor_of(oldest_page), PAGE_SIZE), repeat=repeat)
+    offset, _ = measure(
+        lambda: list(chat.room_messages(hot.pk).order_by('-timestamp', '-id')[in_room // 2:in_room // 2 + PAGE_SIZE]),
+        repeat=repeat,
+    )
+    counter, _ = measure(lambda: chat.unread_counts(hot.product.owner_id, [hot.pk]), repeat=repeat)
+    count_all, _ = measure(lambda: ChatMessage.objects.filter(booking=hot).exclude(sender_id=hot.product.owner_id).count(), repeat=repeat)
+    return {
+        'в брони': in_room,
+        'первая, мс': first['median_ms'],
+        'середина, мс': mid['median_ms'],
+        'самая старая, мс': last['median_ms'],
+        'OFFSET середина, мс': offset['median_ms'],
+        'счётчик, мс': counter['median_ms'],
+        'COUNT(*), мс': count_all['median_ms'],
+    }
+
+
+def run(messages, repeat, json_path=None, stdout=sys.stdout):
+    from django.utils import timezone
+
+    from communications.models import ChatMessage
+
+    rows = []
+    with temporary_database():
+        bookings = list(
+            type(booking).objects.select_related('product').get(pk=booking.pk)
+            for booking in seed_bookings(2_000, stdout)
+        )
+        rng = random.Random(42)
+        timestamp = timezone.now() - timedelta(days=365)
+        for target in sorted({max(messages // 100, 1), max(messages // 10, 1), messages}):
+            timestamp = add_messages(bookings, target - ChatMessage.objects.count(), timestamp, rng)
+            stdout.write(f'Сообщений: {target}\n')
+            rows.append({'сообщений': target, **measure_stage(bookings[0], repeat)})
+
+    columns = ['сообщений', 'в брони', 'первая, мс', 'середина, мс', 'самая старая, мс',
+               'OFFSET середина, мс', 'счётчик, мс', 'COUNT(*), мс']
+    print_table(rows, columns, stream=stdout)
+    if json_path:
+        dump_json({'messages': messages, 'repeat': repeat, 'results': rows}, json_path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=1_000_000, help='Сколько сообщений в таблице на последней ступени')
+    parser.add_argument('--repeat', type=int, default=20, help='Сколько замеров на каждый запрос')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON')
+    args = parser.parse_args(argv)
+
+    setup_django()
+    run(args.messages, args.repeat, args.json_path)
+
+
+if __name__ == '__main__':
+    main()
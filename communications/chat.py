@@ -0,0 +1,241 @@
+# communications/chat.py
+"""
+Чат по брони: комната — бронь, участники — арендатор и владелец товара.
+
+Новые сообщения доставляются по id: клиент long-poll'ом запрашивает «всё
+с id больше последнего полученного» и ждёт уведомления брокера
+(communications/pubsub.py), если новых нет. Время (auto_now_add) для
+доставки не годится: пачка, закоммиченная позже, может нести более ранний
+timestamp, и такое сообщение клиент пропустил бы.
+
+Время нужно для показа и истории: она листается от новых к старым курсором
+по (timestamp, id) (индекс
+chat_booking_timestamp_idx), поэтому страница стоит одинаково и в начале,
+и в глубине переписки. Непрочитанные хранятся счётчиками в ChatUnread.
+
+Запись идёт через MessageWriter: сообщения, пришедшие почти одновременно,
+копятся до CHAT_BATCH_SIZE штук или CHAT_FLUSH_MS миллисекунд и вставляются
+одним bulk_create — при всплеске нагрузки это одна транзакция на пачку,
+а не на каждое сообщение.
+"""
+import asyncio
+import base64
+import json
+import weakref
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+from bookings.models import Booking
+from .models import ChatMessage, ChatUnread
+from .pubsub import get_broker, room_name
+
+MAX_MESSAGE_LENGTH = 2000
+# Сколько последних сообщений показываем при открытии чата
+INITIAL_MESSAGES = 50
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+BATCH_SIZE = getattr(settings, 'CHAT_BATCH_SIZE', 200)
+FLUSH_MS = getattr(settings, 'CHAT_FLUSH_MS', 20)
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(message):
+    payload = json.dumps({'t': message.timestamp.isoformat(), 'i': message.pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает курсор истории. Возвращает (timestamp, id)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode((token + '=' * (-len(token) % 4)).encode()))
+        timestamp = parse_datetime(payload['t'])
+        message_id = int(payload['i'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+    if timestamp is None:
+        raise InvalidCursor(token)
+    return timestamp, message_id
+
+
+def chat_booking(booking_id, user):
+    """Бронь, в чате которой участвует user, или None"""
+    return (
+        Booking.objects.select_related('product')
+        .filter(Q(renter=user) | Q(product__owner=user), pk=booking_id)
+        .first()
+    )
+
+
+def room_messages(booking_id):
+    return ChatMessage.objects.filter(booking_id=booking_id).select_related('sender')
+
+
+def latest_messages(booking_id, limit=INITIAL_MESSAGES):
+    """Последние limit сообщений, от старых к новым"""
+    messages = list(room_messages(booking_id).order_by('-timestamp', '-id')[:limit])
+    messages.reverse()
+    return messages
+
+
+def last_id(messages):
+    """Курсор доставки для уже показанных сообщений: наибольший id"""
+    return max((message.pk for message in messages), default=None)
+
+
+def messages_after(booking_id, after_id=None, limit=INITIAL_MESSAGES):
+    """Сообщения с id больше after_id, по возрастанию id"""
+    queryset = room_messages(booking_id).order_by('id')
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    return list(queryset[:limit])
+
+
+def history(booking_id, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Страница истории от новых к старым: сообщения строго раньше курсора
+    before. Возвращает (сообщения, есть ли ещё более старые).
+    """
+    queryset = room_messages(booking_id).order_by('-timestamp', '-id')
+    if before is not None:
+        timestamp, message_id = before
+        # Отдельное timestamp <= ... — граница диапазона индекса: по одному OR
+        # SQLite сканировал бы индекс от начала переписки до курсора
+        queryset = queryset.filter(
+            Q(timestamp__lt=timestamp) | Q(id__lt=message_id), timestamp__lte=timestamp,
+        )
+    messages = list(queryset[:limit + 1])
+    return messages[:limit], len(messages) > limit
+
+
+def count_unread(messages):
+    """
+    Увеличивает счётчики непрочитанного для получателей сообщений — второго
+    участника брони. Вызывать в транзакции вставки сообщений.
+    """
+    bookings = {
+        pk: (renter_id, owner_id)
+        for pk, renter_id, owner_id in Booking.objects.filter(
+            pk__in={message.booking_id for message in messages}
+        ).values_list('pk', 'renter_id', 'product__owner_id')
+    }
+    added = Counter()
+    for message in messages:
+        for user_id in bookings.get(message.booking_id, ()):
+            if user_id != message.sender_id:
+                added[user_id, message.booking_id] += 1
+    if not added:
+        return
+    ChatUnread.objects.bulk_create(
+        [ChatUnread(user_id=user_id, booking_id=booking_id) for user_id, booking_id in added],
+        ignore_conflicts=True,
+    )
+    for (user_id, booking_id), count in added.items():
+        ChatUnread.objects.filter(user_id=user_id, booking_id=booking_id).update(count=F('count') + count)
+
+
+def mark_read(user_id, booking_id):
+    ChatUnread.objects.filter(user_id=user_id, booking_id=booking_id, count__gt=0).update(count=0)
+
+
+def unread_counts(user_id, booking_ids=None):
+    """{booking_id: число непрочитанных} — только чаты, где они есть"""
+    queryset = ChatUnread.objects.filter(user_id=user_id, count__gt=0)
+    if booking_ids is not None:
+        queryset = queryset.filter(booking_id__in=booking_ids)
+    return dict(queryset.values_list('booking_id', 'count'))
+
+
+def serialize(message, user_id):
+    return {
+        'id': message.pk,
+        'sender': message.sender.username,
+        'mine': message.sender_id == user_id,
+        'text': message.message,
+        'timestamp': message.timestamp.isoformat(),
+    }
+
+
+def _insert(messages):
+    with transaction.atomic():
+        created = ChatMessage.objects.bulk_create(messages)
+        count_unread(created)
+    return created
+
+
+class MessageWriter:
+    """Копит сообщения одного цикла событий и вставляет их пачками"""
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_ms=FLUSH_MS):
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.queue = asyncio.Queue()
+        self.task = None
+
+    async def submit(self, booking_id, sender, text):
+        """Ставит сообщение в пачку и ждёт, пока оно окажется в базе"""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((ChatMessage(booking_id=booking_id, sender=sender, message=text), future))
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        return await future
+
+    async def run(self):
+        # Задача живёт, пока есть очередь: простаивающий чат не держит фоновых задач
+        try:
+            while not self.queue.empty():
+                await self.flush(await self.collect())
+        finally:
+            self.task = None
+
+    async def collect(self):
+        batch = [self.queue.get_nowait()]
+        deadline = asyncio.get_running_loop().time() + self.flush_ms / 1000
+        while len(batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def flush(self, batch):
+        messages = [message for message, _future in batch]
+        try:
+            await sync_to_async(_insert)(messages)
+        except Exception as exc:
+            for _message, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for message, future in batch:
+            if not future.done():
+                future.set_result(message)
+        broker = get_broker()
+        for booking_id in {message.booking_id for message in messages}:
+            await broker.publish(room_name(booking_id))
+
+    async def drain(self):
+        """Дожидается записи всего, что уже в очереди (при остановке сервера)"""
+        if self.task is not None:
+            await self.task
+
+
+# Очередь и её задача привязаны к циклу событий, поэтому писатель — свой на каждый цикл
+_writers = weakref.WeakKeyDictionary()
+
+
+def get_writer():
+    loop = asyncio.get_running_loop()
+    if loop not in _writers:
+        _writers[loop] = MessageWriter()
+    return _writers[loop]
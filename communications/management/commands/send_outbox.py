@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from communications.outbox import drain
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди OutboundEmail пачками через одно SMTP-соединение'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Писем в одной пачке')
+        parser.add_argument('--loop', action='store_true', help='Работать постоянно, опрашивая очередь')
+        parser.add_argument('--interval', type=float, default=5.0, help='Пауза между опросами в режиме --loop, сек')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            try:
+                sent, retried, dead = drain(batch_size=options['batch_size'])
+            except Exception as exc:
+                # SMTP недоступен — письма остаются в очереди до следующей попытки
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'Ошибка отправки: {exc}')
+                sent = retried = dead = 0
+
+            if sent or retried or dead or not options['loop']:
+                elapsed = time.monotonic() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f'Отправлено: {sent}, отложено: {retried}, не доставлено: {dead} ({elapsed:.2f} с)'
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
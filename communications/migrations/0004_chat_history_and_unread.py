@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_booking_renter_start_idx_id'),
+        ('communications', '0003_outboundemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatUnread',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['booking', 'timestamp', 'id'], name='chat_booking_timestamp_idx'),
+        ),
+        migrations.AddField(
+            model_name='chatunread',
+            name='booking',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_unread', to='bookings.booking'),
+        ),
+        migrations.AddField(
+            model_name='chatunread',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_unread', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='chatunread',
+            constraint=models.UniqueConstraint(fields=('user', 'booking'), name='chat_unread_user_booking_uniq'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from users.models import User
 from bookings.models import Booking
 
@@ -7,4 +8,61 @@ class ChatMessage(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
-    
\ No newline at end of file
+
+    class Meta:
+        indexes = [
+            # История чата: сообщения брони по курсору (timestamp, id)
+            models.Index(fields=['booking', 'timestamp', 'id'], name='chat_booking_timestamp_idx'),
+        ]
+
+
+class ChatUnread(models.Model):
+    """
+    Счётчик непрочитанных сообщений пользователя в чате брони. Увеличивается
+    при вставке сообщений (communications/chat.py) и обнуляется, когда
+    пользователь открывает чат, — чтобы не считать COUNT(*) по сообщениям.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_unread')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='chat_unread')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'booking'], name='chat_unread_user_booking_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} / {self.booking_id}: {self.count}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Письмо в очереди на отправку (outbox). Создаётся в той же транзакции,
+    что и изменение брони, а отправляется воркером send_outbox.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('sent', 'Отправлено'),
+        ('dead', 'Не доставлено'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Воркер выбирает письма в очереди, у которых подошло время попытки
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.recipients)} ({self.status})"
+
@@ -0,0 +1,189 @@
+# communications/outbox.py
+"""
+Очередь исходящих писем (transactional outbox).
+
+enqueue_email() только пишет строку OutboundEmail — в той же транзакции,
+что и бронь, поэтому письмо уйдёт тогда и только тогда, когда бронь
+сохранилась, а запрос не ждёт SMTP. Отправляет письма воркер
+(manage.py send_outbox) пачками через одно SMTP-соединение.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# После стольких неудачных попыток письмо уходит в dead
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 6)
+# Задержка перед повтором: BACKOFF_SECONDS * 2 ** (attempts - 1), не больше BACKOFF_MAX_SECONDS
+BACKOFF_SECONDS = getattr(settings, 'OUTBOX_BACKOFF_SECONDS', 60)
+BACKOFF_MAX_SECONDS = getattr(settings, 'OUTBOX_BACKOFF_MAX_SECONDS', 60 * 60)
+# На сколько воркер «забирает» пачку: пока идёт отправка, другие воркеры её не видят
+LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 5 * 60)
+
+
+def enqueue_email(subject, message, recipient_list, from_email=None):
+    """Ставит письмо в очередь. Вызывать внутри транзакции изменения данных"""
+    return OutboundEmail.objects.create(
+        subject=subject[:255],
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def enqueue_many(emails, from_email=None):
+    """
+    Ставит в очередь несколько писем одним INSERT.
+    emails — пары (subject, message, recipient_list).
+    """
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(
+            subject=subject[:255],
+            body=message,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            recipients=list(recipient_list),
+        )
+        for subject, message, recipient_list in emails
+    ])
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS))
+
+
+def claim_batch(batch_size):
+    """
+    Забирает пачку писем, которым пора уходить: в короткой транзакции
+    сдвигает им next_attempt_at на время аренды, чтобы параллельный
+    воркер их не взял. На PostgreSQL строки выбираются с SKIP LOCKED.
+    Попытка засчитывается не здесь, а в send_claimed — при самой отправке.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(id__in=ids).update(next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('next_attempt_at', 'id'))
+
+
+def send_each(connection, messages):
+    """
+    Отправляет письма по одному через открытое соединение.
+    messages — пары (ключ, EmailMessage); отдаёт пары (ключ, исключение
+    или None). Ошибка одного письма не останавливает остальные.
+    """
+    for key, message in messages:
+        try:
+            connection.send_messages([message])
+        except Exception as exc:
+            # После ошибки SMTP-сессия может быть в неопределённом состоянии — переподключаемся
+            connection.close()
+            try:
+                connection.open()
+            except Exception as reconnect_exc:
+                logger.warning('Не удалось переподключиться к SMTP: %s', reconnect_exc)
+            yield key, exc
+        else:
+            yield key, None
+
+
+def release(emails):
+    """Возвращает забранные письма в очередь без попытки — отправка не начиналась"""
+    OutboundEmail.objects.filter(id__in=[email.pk for email in emails], status='pending').update(
+        next_attempt_at=timezone.now(),
+    )
+
+
+def send_batch(connection, batch_size=100):
+    """
+    Забирает и отправляет одну пачку через уже открытое соединение.
+    Возвращает (отправлено, отложено, в dead).
+    """
+    return send_claimed(connection, claim_batch(batch_size))
+
+
+def send_claimed(connection, emails):
+    """Отправляет уже забранные claim_batch() письма. Возвращает (отправлено, отложено, в dead)"""
+    if not emails:
+        return 0, 0, 0
+
+    sent, failed = [], []
+    messages = (
+        (email, EmailMessage(
+            subject=email.subject, body=email.body, from_email=email.from_email or None,
+            to=email.recipients, connection=connection,
+        ))
+        for email in emails
+    )
+    for email, error in send_each(connection, messages):
+        if error is None:
+            sent.append(email)
+            continue
+        logger.warning('Не удалось отправить письмо %s: %s', email.pk, error)
+        email.last_error = f'{error.__class__.__name__}: {error}'
+        failed.append(email)
+
+    now = timezone.now()
+    dead = 0
+    with transaction.atomic():
+        if sent:
+            OutboundEmail.objects.filter(id__in=[e.pk for e in sent]).update(
+                status='sent', sent_at=now, last_error='', attempts=F('attempts') + 1,
+            )
+        for email in failed:
+            email.attempts += 1
+            if email.attempts >= MAX_ATTEMPTS:
+                email.status = 'dead'
+                dead += 1
+            else:
+                email.next_attempt_at = now + backoff(email.attempts)
+        if failed:
+            OutboundEmail.objects.bulk_update(failed, ['status', 'attempts', 'next_attempt_at', 'last_error'])
+    return len(sent), len(failed) - dead, dead
+
+
+def drain(batch_size=100, max_batches=None, connection=None):
+    """
+    Отправляет письма пачками, пока очередь не опустеет (или max_batches).
+    Все пачки идут через одно SMTP-соединение; оно открывается только когда
+    забрана первая непустая пачка — пустой запуск по cron не ходит в SMTP.
+    Возвращает (sent, retried, dead).
+    """
+    connection = connection or get_connection(fail_silently=False)
+    totals = [0, 0, 0]
+    opened = False
+    try:
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            emails = claim_batch(batch_size)
+            if not emails:
+                break
+            if not opened:
+                try:
+                    connection.open()
+                except Exception:
+                    # SMTP недоступен: письма не пробовали отправить — попытку не тратим
+                    release(emails)
+                    raise
+                opened = True
+            result = send_claimed(connection, emails)
+            totals = [a + b for a, b in zip(totals, result)]
+            batches += 1
+    finally:
+        if opened:
+            connection.close()
+    return tuple(totals)
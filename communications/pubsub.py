@@ -0,0 +1,111 @@
+# communications/pubsub.py
+"""
+Уведомления о новых сообщениях чата для long-poll клиентов.
+
+Брокер только будит ждущих в комнате (комната = бронь), сами сообщения
+клиент дочитывает из базы по курсору — поэтому пропущенное уведомление
+ничего не теряет, в худшем случае клиент получит сообщение по таймауту.
+
+LocalBroker работает внутри одного процесса; при нескольких воркерах
+(uvicorn --workers N, несколько серверов) нужен RedisBroker:
+CHAT_BROKER=communications.pubsub.RedisBroker, CHAT_REDIS_URL=redis://...
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+def room_name(booking_id):
+    return f'chat:booking:{booking_id}'
+
+
+class LocalBroker:
+    """Комнаты в памяти процесса: на ждущего клиента — один asyncio.Event"""
+
+    def __init__(self):
+        self.rooms = {}
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def publish(self, room):
+        for loop, event in list(self.rooms.get(room, ())):
+            # publish может прийти из другого потока или цикла событий
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(event.set)
+
+    @asynccontextmanager
+    async def subscribe(self, room):
+        """
+        Подписка на комнату: отдаёт asyncio.Event, который выставится при
+        publish. Подписываться нужно до чтения из базы — тогда сообщение,
+        пришедшее между чтением и ожиданием, не потеряется.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self.rooms.setdefault(room, set()).add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            waiters = self.rooms.get(room)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self.rooms[room]
+
+    def waiting(self):
+        return sum(len(waiters) for waiters in self.rooms.values())
+
+
+class RedisBroker(LocalBroker):
+    """
+    Уведомления через Redis PUBLISH/PSUBSCRIBE: одна подписка на процесс,
+    дальше — те же локальные комнаты, что и у LocalBroker.
+    """
+
+    def __init__(self, url=None):
+        super().__init__()
+        self.url = url or getattr(settings, 'CHAT_REDIS_URL', 'redis://127.0.0.1:6379/0')
+        self.redis = None
+        self.listener = None
+
+    async def start(self):
+        import redis.asyncio as redis
+
+        if self.redis is not None:
+            return
+        self.redis = redis.from_url(self.url)
+        pubsub = self.redis.pubsub()
+        await pubsub.psubscribe(room_name('*'))
+        self.listener = asyncio.create_task(self.listen(pubsub))
+
+    async def close(self):
+        if self.listener is not None:
+            self.listener.cancel()
+        if self.redis is not None:
+            await self.redis.aclose()
+
+    async def listen(self, pubsub):
+        async for message in pubsub.listen():
+            if message['type'] == 'pmessage':
+                await super().publish(message['channel'].decode())
+
+    async def publish(self, room):
+        await self.start()
+        await self.redis.publish(room, b'1')
+
+    @asynccontextmanager
+    async def subscribe(self, room):
+        await self.start()
+        async with super().subscribe(room) as event:
+            yield event
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'CHAT_BROKER', 'communications.pubsub.LocalBroker'))()
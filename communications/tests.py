@@ -1,3 +1,381 @@
-from django.test import TestCase
+import asyncio
+import io
+import socketserver
+import threading
+from datetime import date, timedelta
+from smtplib import SMTPException
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from bookings.models import Booking
+from catalog.models import Product
+from rental_service.seeding import explicit_timestamps
+from rental_service.testing import QueryPlanAssertionsMixin, explain
+from users.models import User
+from . import chat, outbox, views
+from .models import ChatMessage, ChatUnread, OutboundEmail
+from .pubsub import get_broker
+
+
+class FailingBackend(BaseEmailBackend):
+    """Бэкенд, который всегда падает — имитация недоступного SMTP"""
+
+    def send_messages(self, email_messages):
+        raise SMTPException('connection refused')
+
+
+class OutboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.product = Product.objects.create(
+            owner=cls.owner, name='Калькулятор', description='-', daily_price=50, deposit=500,
+        )
+
+    def test_create_booking_enqueues_instead_of_sending(self):
+        self.client.force_login(self.renter)
+        start = date.today() + timedelta(days=3)
+        response = self.client.post(
+            reverse('bookings:create_booking', args=[self.product.pk]),
+            {'start_date': start, 'end_date': start + timedelta(days=2)},
+        )
+        self.assertRedirects(response, reverse('bookings:my_bookings'))
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.recipients, ['owner@example.com'])
+
+        call_command('send_outbox', stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['owner@example.com'])
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'sent')
+        self.assertIsNotNone(queued.sent_at)
+
+    def test_rolled_back_transaction_leaves_no_email(self):
+        try:
+            with transaction.atomic():
+                outbox.enqueue_email('Тема', 'Текст', ['a@example.com'])
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_drain_sends_in_batches_and_skips_sent(self):
+        for i in range(25):
+            outbox.enqueue_email(f'Письмо {i}', 'Текст', [f'user{i}@example.com'])
+        self.assertEqual(outbox.drain(batch_size=10), (25, 0, 0))
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertEqual(outbox.drain(batch_size=10), (0, 0, 0))
+        self.assertEqual(len(mail.outbox), 25)
+
+    @override_settings(EMAIL_BACKEND='communications.tests.FailingBackend')
+    def test_failed_email_is_retried_with_backoff_then_dead_lettered(self):
+        email = outbox.enqueue_email('Тема', 'Текст', ['a@example.com'])
+
+        with self.assertLogs('communications.outbox', 'WARNING'):
+            self.assertEqual(outbox.drain(), (0, 1, 0))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('connection refused', email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Пока не подошло время повтора, письмо не берётся
+        self.assertEqual(outbox.drain(), (0, 0, 0))
+
+        for attempt in range(2, outbox.MAX_ATTEMPTS + 1):
+            OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+            with self.assertLogs('communications.outbox', 'WARNING'):
+                outbox.drain()
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'dead')
+        self.assertEqual(email.attempts, outbox.MAX_ATTEMPTS)
+
+    def test_empty_queue_does_not_connect(self):
+        connection = mock.Mock()
+        self.assertEqual(outbox.drain(connection=connection), (0, 0, 0))
+        connection.open.assert_not_called()
+        connection.close.assert_not_called()
+
+        outbox.enqueue_email('Тема', 'Текст', ['a@example.com'])
+        connection.send_messages.return_value = 1
+        self.assertEqual(outbox.drain(connection=connection), (1, 0, 0))
+        connection.open.assert_called_once_with()
+        connection.close.assert_called_once_with()
+
+    def test_connection_failure_does_not_spend_attempts(self):
+        email = outbox.enqueue_email('Тема', 'Текст', ['a@example.com'])
+        connection = mock.Mock()
+        connection.open.side_effect = ConnectionRefusedError('smtp down')
+        for _ in range(outbox.MAX_ATTEMPTS + 1):
+            with self.assertRaises(ConnectionRefusedError):
+                outbox.drain(connection=connection)
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 0))
+        self.assertLessEqual(email.next_attempt_at, timezone.now())
+
+        # SMTP вернулся — письмо уходит с первой настоящей попытки
+        self.assertEqual(outbox.drain(), (1, 0, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('sent', 1))
+
+    def test_backoff_grows_and_is_capped(self):
+        self.assertLess(outbox.backoff(1), outbox.backoff(2))
+        self.assertEqual(outbox.backoff(50).total_seconds(), outbox.BACKOFF_MAX_SECONDS)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер: принимает письма и складывает их в server.messages"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost test SMTP')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self.reply('250 localhost')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline().decode()
+                    if data in ('.\r\n', '.\n', ''):
+                        break
+                    lines.append(data)
+                self.server.messages.append(''.join(lines))
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+
+
+class OutboxSMTPTests(TestCase):
+    """Отправка через настоящий SMTP-бэкенд Django на локальный сервер-заглушку"""
+
+    def setUp(self):
+        self.server = _SMTPServer()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_batch_goes_through_one_smtp_connection(self):
+        for i in range(12):
+            outbox.enqueue_email(f'Письмо {i}', 'Текст', [f'user{i}@example.com'])
+
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        ):
+            self.assertEqual(outbox.drain(batch_size=5), (12, 0, 0))
+
+        self.assertEqual(len(self.server.messages), 12)
+        self.assertEqual(self.server.connections, 1)
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+
+
+class BookingChatTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        cls.stranger = User.objects.create_user('stranger', 'stranger@example.com', 'pass')
+        product = Product.objects.create(
+            owner=cls.owner, name='Палатка', description='-', daily_price=200, deposit=1000,
+        )
+        cls.booking = Booking.objects.create(
+            renter=cls.renter, product=product, total_cost=400,
+            start_date=date.today() + timedelta(days=3), end_date=date.today() + timedelta(days=5),
+        )
+
+    def url(self, name):
+        return reverse(f'communications:{name}', args=[self.booking.pk])
+
+    def test_room_is_only_for_participants(self):
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(self.url('chat_room')).status_code, 200)
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(self.url('chat_room')).status_code, 404)
+        self.assertEqual(self.client.post(self.url('chat_send'), {'message': 'привет'}).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url('chat_poll')).status_code, 403)
+
+    async def test_send_then_poll_after_cursor(self):
+        await self.async_client.aforce_login(self.renter)
+        response = await self.async_client.post(self.url('chat_send'), {'message': 'Вещь свободна?'})
+        self.assertEqual(response.status_code, 201)
+
+        data = (await self.async_client.get(self.url('chat_poll'))).json()
+        self.assertEqual([m['text'] for m in data['messages']], ['Вещь свободна?'])
+        self.assertTrue(data['messages'][0]['mine'])
+
+        # После курсора новых нет — long-poll ждёт и отдаёт пустой ответ
+        with mock.patch.object(views, 'POLL_TIMEOUT', 0.05):
+            empty = (await self.async_client.get(self.url('chat_poll'), {'after': data['cursor']})).json()
+        self.assertEqual(empty, {'messages': [], 'cursor': data['cursor']})
+
+    def test_late_commit_with_earlier_timestamp_is_delivered(self):
+        self.client.force_login(self.owner)
+        first = ChatMessage.objects.create(booking=self.booking, sender=self.renter, message='первое')
+        data = self.client.get(self.url('chat_poll')).json()
+        self.assertEqual(data['cursor'], first.pk)
+
+        # Пачка другого воркера закоммичена позже, но время у неё раньше
+        late = ChatMessage.objects.create(booking=self.booking, sender=self.renter, message='из другой пачки')
+        ChatMessage.objects.filter(pk=late.pk).update(timestamp=first.timestamp - timedelta(seconds=1))
+        data = self.client.get(self.url('chat_poll'), {'after': data['cursor']}).json()
+        self.assertEqual([m['text'] for m in data['messages']], ['из другой пачки'])
+        self.assertEqual(data['cursor'], late.pk)
+
+        # В комнате курсор — наибольший id, хотя на экране сообщение не последнее
+        response = self.client.get(self.url('chat_room'))
+        self.assertEqual(response.context['cursor'], late.pk)
+
+    async def test_waiting_poll_wakes_up_on_new_message(self):
+        await self.async_client.aforce_login(self.owner)
+        renter_client = AsyncClient()
+        await renter_client.aforce_login(self.renter)
+
+        with mock.patch.object(views, 'POLL_TIMEOUT', 5):
+            poll = asyncio.create_task(self.async_client.get(self.url('chat_poll')))
+            while not get_broker().waiting():
+                await asyncio.sleep(0.01)
+            await renter_client.post(self.url('chat_send'), {'message': 'Заберу в 18:00'})
+            data = (await asyncio.wait_for(poll, 2)).json()
+
+        self.assertEqual([(m['sender'], m['mine']) for m in data['messages']], [('renter', False)])
+
+    async def test_burst_is_written_in_one_batch(self):
+        inserts = []
+        original = chat._insert
+
+        def counting_insert(messages):
+            inserts.append(len(messages))
+            return original(messages)
+
+        with mock.patch.object(chat, '_insert', counting_insert):
+            writer = chat.MessageWriter(batch_size=100, flush_ms=50)
+            messages = await asyncio.gather(*(
+                writer.submit(self.booking.pk, self.renter, f'сообщение {i}') for i in range(30)
+            ))
+
+        self.assertEqual(inserts, [30])
+        self.assertTrue(all(message.pk for message in messages))
+        self.assertEqual(await ChatMessage.objects.filter(booking=self.booking).acount(), 30)
+
+    def test_invalid_message_and_cursor_are_rejected(self):
+        self.client.force_login(self.renter)
+        self.assertEqual(self.client.post(self.url('chat_send'), {'message': '  '}).status_code, 400)
+        self.assertEqual(self.client.post(self.url('chat_send'), {'message': 'x' * 2001}).status_code, 400)
+        self.assertEqual(self.client.get(self.url('chat_poll'), {'after': 'мусор'}).status_code, 400)
+
+    async def test_asgi_lifespan(self):
+        from rental_service.asgi import application
+
+        events = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(events)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        await application({'type': 'lifespan'}, receive, send)
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+
+class ChatHistoryTests(QueryPlanAssertionsMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pass')
+        cls.renter = User.objects.create_user('renter', 'renter@example.com', 'pass')
+        product = Product.objects.create(
+            owner=cls.owner, name='Гитара', description='-', daily_price=150, deposit=1000,
+        )
+        cls.booking = Booking.objects.create(
+            renter=cls.renter, product=product, total_cost=300,
+            start_date=date.today() + timedelta(days=1), end_date=date.today() + timedelta(days=2),
+        )
+        # Два сообщения с одинаковым временем — порядок между ними решает id
+        start = timezone.now() - timedelta(hours=1)
+        with explicit_timestamps(ChatMessage, 'timestamp'):
+            ChatMessage.objects.bulk_create([
+                ChatMessage(booking=cls.booking, sender=cls.renter, message=f'#{i}',
+                            timestamp=start + timedelta(minutes=min(i, 3)))
+                for i in range(7)
+            ])
+
+    def test_history_pages_newest_first_without_gaps(self):
+        self.client.force_login(self.owner)
+        url = reverse('communications:chat_history', args=[self.booking.pk])
+        seen, cursor = [], None
+        while True:
+            data = self.client.get(url, {'limit': 3, **({'before': cursor} if cursor else {})}).json()
+            seen.extend(message['text'] for message in data['messages'])
+            cursor = data['next']
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['#6', '#5', '#4', '#3', '#2', '#1', '#0'])
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN проверяется только на SQLite')
+    def test_history_page_uses_index_without_sort(self):
+        last = ChatMessage.objects.order_by('timestamp', 'id').last()
+        with CaptureQueriesContext(connection) as captured:
+            chat.history(self.booking.pk, (last.timestamp, last.pk))
+        query = captured.captured_queries[-1]['sql']
+        plan = explain(query)
+        self.assertUsesIndex(plan, 'communications_chatmessage', 'chat_booking_timestamp_idx')
+        # Диапазон по индексу (timestamp<?), а не скан всей переписки брони
+        self.assertTrue(any('timestamp<?' in line for line in plan), plan)
+        self.assertFalse(any('TEMP B-TREE' in line for line in plan), plan)
+
+    def test_unread_counters_follow_sends_and_reads(self):
+        self.client.force_login(self.renter)
+        for text in ('Привет', 'Когда можно забрать?'):
+            self.client.post(reverse('communications:chat_send', args=[self.booking.pk]), {'message': text})
+
+        unread = ChatUnread.objects.get()
+        self.assertEqual((unread.user, unread.count), (self.owner, 2))
+
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('bookings:owner_requests'))
+        self.assertContains(response, '<span class="badge bg-danger">2</span>', html=True)
+        self.assertEqual(
+            self.client.get(reverse('communications:chat_unread')).json(),
+            {'total': 2, 'bookings': {str(self.booking.pk): 2}},
+        )
+
+        self.client.get(reverse('communications:chat_room', args=[self.booking.pk]))
+        self.assertEqual(ChatUnread.objects.get().count, 0)
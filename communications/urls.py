@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+app_name = 'communications'
+
+urlpatterns = [
+    path('unread/', views.chat_unread, name='chat_unread'),
+    path('<int:booking_id>/', views.chat_room, name='chat_room'),
+    path('<int:booking_id>/poll/', views.chat_poll, name='chat_poll'),
+    path('<int:booking_id>/send/', views.chat_send, name='chat_send'),
+    path('<int:booking_id>/history/', views.chat_history, name='chat_history'),
+]
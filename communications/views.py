@@ -1,3 +1,140 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_GET, require_POST
+
+from rental_service.middleware import long_poll
+from . import chat
+from .pubsub import get_broker, room_name
+
+# Сколько секунд long-poll ждёт новых сообщений, прежде чем вернуть пустой ответ
+POLL_TIMEOUT = getattr(settings, 'CHAT_POLL_TIMEOUT', 25)
+
+
+@login_required
+def chat_room(request, booking_id):
+    booking = chat.chat_booking(booking_id, request.user)
+    if booking is None:
+        raise Http404
+    messages = chat.latest_messages(booking.pk)
+    chat.mark_read(request.user.pk, booking.pk)
+    context = {
+        'booking': booking,
+        'chat_messages': [chat.serialize(message, request.user.pk) for message in messages],
+        'cursor': chat.last_id(messages) or '',
+        # Курсор для «Показать раньше»: есть, только если показаны не все сообщения
+        'history_cursor': chat.encode_cursor(messages[0]) if len(messages) == chat.INITIAL_MESSAGES else '',
+    }
+    return render(request, 'communications/chat.html', context)
+
+
+async def _room_for(request, booking_id):
+    """(user, booking) или JsonResponse с ошибкой доступа"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None, JsonResponse({'error': 'Требуется вход'}, status=403)
+    booking = await sync_to_async(chat.chat_booking)(booking_id, user)
+    if booking is None:
+        return None, JsonResponse({'error': 'Чат не найден'}, status=404)
+    return (user, booking), None
+
+
+@require_GET
+@long_poll
+async def chat_poll(request, booking_id):
+    """
+    Long-poll: отдаёт сообщения с id больше ?after=<id>, а если их нет —
+    ждёт до POLL_TIMEOUT секунд. Ожидание — корутина, а не поток, поэтому
+    под ASGI-сервером тысячи открытых чатов почти ничего не стоят.
+    """
+    room, error = await _room_for(request, booking_id)
+    if error is not None:
+        return error
+    user, booking = room
+
+    after_id = None
+    if request.GET.get('after'):
+        try:
+            after_id = int(request.GET['after'])
+        except ValueError:
+            return JsonResponse({'error': 'Некорректный курсор'}, status=400)
+
+    fetch = sync_to_async(chat.messages_after)
+    async with get_broker().subscribe(room_name(booking.pk)) as notified:
+        messages = await fetch(booking.pk, after_id)
+        if not messages:
+            try:
+                await asyncio.wait_for(notified.wait(), POLL_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                messages = await fetch(booking.pk, after_id)
+
+    # Открытый чат получил сообщения собеседника — они прочитаны
+    if any(message.sender_id != user.pk for message in messages):
+        await sync_to_async(chat.mark_read)(user.pk, booking.pk)
+
+    return JsonResponse({
+        'messages': [chat.serialize(message, user.pk) for message in messages],
+        'cursor': messages[-1].pk if messages else after_id,
+    })
+
+
+@require_GET
+async def chat_history(request, booking_id):
+    """
+    История от новых к старым: ?before=<курсор>&limit=N. В ответе next —
+    курсор следующей (более старой) страницы или null, если это конец.
+    """
+    room, error = await _room_for(request, booking_id)
+    if error is not None:
+        return error
+    user, booking = room
+
+    before = None
+    if request.GET.get('before'):
+        try:
+            before = chat.decode_cursor(request.GET['before'])
+        except chat.InvalidCursor:
+            return JsonResponse({'error': 'Некорректный курсор'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', chat.HISTORY_PAGE_SIZE)), 1), chat.HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть числом'}, status=400)
+
+    messages, has_more = await sync_to_async(chat.history)(booking.pk, before, limit)
+    return JsonResponse({
+        'messages': [chat.serialize(message, user.pk) for message in messages],
+        'next': chat.encode_cursor(messages[-1]) if has_more else None,
+    })
+
+
+@require_GET
+async def chat_unread(request):
+    """Непрочитанные сообщения пользователя: всего и по броням"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Требуется вход'}, status=403)
+    counts = await sync_to_async(chat.unread_counts)(user.pk)
+    return JsonResponse({'total': sum(counts.values()), 'bookings': {str(pk): n for pk, n in counts.items()}})
+
+
+@require_POST
+async def chat_send(request, booking_id):
+    room, error = await _room_for(request, booking_id)
+    if error is not None:
+        return error
+    user, booking = room
+
+    text = request.POST.get('message', '').strip()
+    if not text:
+        return JsonResponse({'error': 'Пустое сообщение'}, status=400)
+    if len(text) > chat.MAX_MESSAGE_LENGTH:
+        return JsonResponse({'error': f'Не длиннее {chat.MAX_MESSAGE_LENGTH} символов'}, status=400)
 
-# Create your views here.
+    message = await chat.get_writer().submit(booking.pk, user, text)
+    return JsonResponse(chat.serialize(message, user.pk), status=201)
@@ -0,0 +1,197 @@
+# rental_service/admin.py
+"""
+Общая основа админки для больших таблиц (миллионы строк).
+
+Стандартный changelist на каждой странице считает COUNT(*) дважды (с
+фильтрами и без), а date_hierarchy строит список лет через SELECT DISTINCT
+по всей таблице — на SQLite с функцией Python на каждую строку, это секунды.
+ScalableModelAdmin:
+
+* считает строки через EstimatedCountPaginator: без фильтров — оценка из
+  статистики базы, с фильтрами — точно, но не дальше ADMIN_COUNT_LIMIT;
+* строит date_hierarchy пробами EXISTS по диапазонам дат (год, месяц,
+  день) — каждая проба идёт по индексу поля, а не по всей таблице.
+
+Поле date_hierarchy должно быть первым в каком-нибудь индексе модели.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, models, transaction
+from django.utils import formats, timezone
+from django.utils.functional import cached_property
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+COUNT_LIMIT = getattr(settings, 'ADMIN_COUNT_LIMIT', 10_000)
+
+
+def estimated_rows(model, using='default'):
+    """
+    Оценка числа строк таблицы из статистики планировщика или None, если
+    её нет: на SQLite — sqlite_stat1 (обновляется ANALYZE), на PostgreSQL —
+    pg_class.reltuples (обновляется autovacuum).
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        # Первое число stat — строк в индексе; у частичных индексов меньше, берём максимум
+        sql = 'SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    else:
+        return None
+    try:
+        # Савпоинт: на PostgreSQL ошибка иначе прервала бы всю транзакцию запроса
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(sql, [model._meta.db_table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для админки без полного COUNT(*). Пока оценка меньше
+    ADMIN_COUNT_LIMIT, счёт точный; страницы дальше лимита открываются
+    только фильтрами или поиском.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate > COUNT_LIMIT:
+                return estimate
+        # COUNT(*) по подзапросу с LIMIT: база останавливается на лимите
+        return queryset.order_by().values('pk')[:COUNT_LIMIT].count()
+
+
+def _bound(field, day):
+    """Начало дня day в типе поля (для DateTimeField — в текущем часовом поясе)"""
+    if not isinstance(field, models.DateTimeField):
+        return day
+    moment = datetime.combine(day, time.min)
+    return timezone.make_aware(moment) if settings.USE_TZ else moment
+
+
+def _has_rows(queryset, field, start, end):
+    """Есть ли строки с полем в [start, end) — проба по индексу поля"""
+    name = field.name
+    return queryset.filter(**{
+        f'{name}__gte': _bound(field, start), f'{name}__lt': _bound(field, end),
+    }).exists()
+
+
+def _edge(queryset, field, ordering):
+    value = queryset.order_by(ordering).values_list(field.name, flat=True).first()
+    if isinstance(value, datetime):
+        value = (timezone.localtime(value) if timezone.is_aware(value) else value).date()
+    return value
+
+
+def date_hierarchy(cl):
+    """
+    То же, что шаблонный тег date_hierarchy админки (тот же контекст для
+    admin/date_hierarchy.html), но без SELECT DISTINCT по датам.
+    """
+    field_name = cl.date_hierarchy
+    field = cl.model._meta.get_field(field_name)
+    queryset = cl.queryset
+    year_field, month_field, day_field = (f'{field_name}__{part}' for part in ('year', 'month', 'day'))
+    year, month, day = (cl.params.get(name) for name in (year_field, month_field, day_field))
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    first = last = None
+    if not (year or month or day):
+        # Два отдельных запроса: ORDER BY ... LIMIT 1 — поиск по индексу,
+        # а MIN и MAX в одном запросе SQLite считает просмотром всего индекса
+        first, last = _edge(queryset, field, field_name), _edge(queryset, field, f'-{field_name}')
+        if first and last and first.year == last.year:
+            year = first.year
+            if first.month == last.month:
+                month = first.month
+
+    if year and month and day:
+        current = date(int(year), int(month), int(day))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year, month_field: month}),
+                'title': capfirst(formats.date_format(current, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': capfirst(formats.date_format(current, 'MONTH_DAY_FORMAT'))}],
+        }
+    if year and month:
+        year, month = int(year), int(month)
+        days = [
+            date(year, month, number) for number in range(1, calendar.monthrange(year, month)[1] + 1)
+        ]
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year}), 'title': str(year)},
+            'choices': [
+                {
+                    'link': link({year_field: year, month_field: month, day_field: current.day}),
+                    'title': capfirst(formats.date_format(current, 'MONTH_DAY_FORMAT')),
+                }
+                for current in days
+                if _has_rows(queryset, field, current, current + timedelta(days=1))
+            ],
+        }
+    if year:
+        year = int(year)
+        months = [date(year, number, 1) for number in range(1, 13)]
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({year_field: year, month_field: current.month}),
+                    'title': capfirst(formats.date_format(current, 'YEAR_MONTH_FORMAT')),
+                }
+                for current in months
+                if _has_rows(queryset, field, current, (current + timedelta(days=31)).replace(day=1))
+            ],
+        }
+    if first is None:
+        return {'show': True, 'choices': []}
+    return {
+        'show': True,
+        'choices': [
+            {'link': link({year_field: str(number)}), 'title': str(number)}
+            for number in range(first.year, last.year + 1)
+            if _has_rows(queryset, field, date(number, 1, 1), date(number + 1, 1, 1))
+        ],
+    }
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """ModelAdmin для больших таблиц: оценка числа строк и дешёвая date_hierarchy"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/scalable_change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        context = getattr(response, 'context_data', None)
+        # TemplateResponse ещё не отрисован — подменяем данные для блока date_hierarchy
+        if context and 'cl' in context and self.date_hierarchy:
+            context['fast_date_hierarchy'] = date_hierarchy(context['cl'])
+        return response
+
+
+def prefix_filter(field, term):
+    """
+    «field начинается с term» диапазоном по индексу поля — в отличие от
+    istartswith/LIKE, который индекс не использует. С учётом регистра.
+    """
+    return models.Q(**{f'{field}__gte': term, f'{field}__lt': term + chr(0x10FFFF)})
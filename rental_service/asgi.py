@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Чат (communications) рассчитан на ASGI-сервер: long-poll ждёт в корутине,
+поэтому тысячи открытых чатов не держат по потоку. Запуск, например:
+
+    uvicorn rental_service.asgi:application --workers 4
+
+(при нескольких воркерах — CHAT_BROKER=communications.pubsub.RedisBroker).
 """
 
 import os
@@ -13,4 +20,31 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rental_service.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+
+async def application(scope, receive, send):
+    """
+    Django не обрабатывает lifespan, поэтому здесь: при старте подключаем
+    брокер чата, при остановке дописываем в базу накопленные сообщения.
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+
+    from communications.chat import get_writer
+    from communications.pubsub import get_broker
+
+    while True:
+        event = await receive()
+        if event['type'] == 'lifespan.startup':
+            try:
+                await get_broker().start()
+            except Exception as exc:
+                await send({'type': 'lifespan.startup.failed', 'message': str(exc)})
+                return
+            await send({'type': 'lifespan.startup.complete'})
+        elif event['type'] == 'lifespan.shutdown':
+            await get_writer().drain()
+            await get_broker().close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,75 @@
+"""
+Общие помощники для бенчмарков (python -m <app>.benchmarks.<name>).
+
+Бенчмарк работает во временной базе, как manage.py test: рабочая база не
+трогается, данные сидируются заново при каждом запуске.
+"""
+import json
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rental_service.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def temporary_database(verbosity=0):
+    """Создаёт тестовую базу с миграциями и удаляет её на выходе"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def measure(func, repeat=20, warmup=2):
+    """Время func() в мс: медиана, p95, минимум; плюс результат последнего вызова"""
+    result = None
+    for _ in range(warmup):
+        result = func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'min_ms': round(min(timings), 3),
+    }, result
+
+
+def print_table(rows, columns, stream=None):
+    """Печатает список словарей таблицей с выровненными колонками"""
+    import sys
+    stream = stream or sys.stdout
+    widths = {
+        column: max(len(column), *(len(str(row.get(column, ''))) for row in rows))
+        for column in columns
+    }
+    stream.write('  '.join(column.ljust(widths[column]) for column in columns) + '\n')
+    stream.write('  '.join('-' * widths[column] for column in columns) + '\n')
+    for row in rows:
+        stream.write('  '.join(str(row.get(column, '')).ljust(widths[column]) for column in columns) + '\n')
+
+
+def dump_json(data, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False, indent=2, default=str)
@@ -0,0 +1,212 @@
+"""
+Офлайн-нагрузочный прогон основных страниц сайта через тестовый клиент Django.
+
+Каждый сценарий — одна страница (каталог, товар, бронирование, заявки
+владельцу, профиль). На каждый запрос меряется время ответа и число SQL-
+запросов; итог — p50/p95/p99, среднее, запросы к БД и пропускная
+способность по сценарию. Отчёт сохраняется в JSON и сравнивается с прошлым
+прогоном (manage.py load_test --json new.json --compare old.json).
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rental_service.benchmarks import percentile
+
+# Сколько разных пользователей ходят по сайту (по клиенту с сессией на каждого)
+CLIENT_POOL = 20
+
+
+class SiteData:
+    """Id из базы, из которых сценарии собирают запросы"""
+
+    def __init__(self, rng):
+        from bookings.models import Booking
+        from catalog.models import Category, Product
+
+        self.rng = rng
+        products = list(Product.objects.filter(is_available=True).values_list('pk', 'owner_id'))
+        if not products:
+            raise ValueError('В базе нет доступных товаров — сначала запустите seed_load_data')
+        self.products = [pk for pk, _owner in products]
+        self.product_owner = dict(products)
+        self.owners = sorted(set(self.product_owner.values()))
+        self.renters = list(
+            Booking.objects.order_by().values_list('renter_id', flat=True).distinct()[:CLIENT_POOL]
+        ) or self.owners[:CLIENT_POOL]
+        self.categories = list(Category.objects.values_list('pk', flat=True))
+        self.owners = self.rng.sample(self.owners, min(len(self.owners), CLIENT_POOL))
+
+    def product(self):
+        return self.rng.choice(self.products)
+
+    def renter_for(self, product_id):
+        candidates = [pk for pk in self.renters if pk != self.product_owner[product_id]]
+        return self.rng.choice(candidates or self.renters)
+
+
+def _catalog_params(data):
+    rng = data.rng
+    params = {}
+    if data.categories and rng.random() < 0.5:
+        params['category'] = rng.choice(data.categories)
+    if rng.random() < 0.3:
+        params['price_min'] = rng.choice((100, 300, 500))
+    if rng.random() < 0.3:
+        params['price_max'] = rng.choice((1000, 2000, 5000))
+    if rng.random() < 0.2:
+        params['q'] = rng.choice(('учебник', 'ноутбук', 'палатка', 'гитара'))
+    if rng.random() < 0.2:
+        start = date.today() + timedelta(days=rng.randint(0, 30))
+        params['available_from'] = start.isoformat()
+        params['available_to'] = (start + timedelta(days=rng.randint(0, 7))).isoformat()
+    # Следующие страницы листают только без фильтров — иначе их может не быть (404)
+    if not params and rng.random() < 0.3:
+        params['page'] = rng.randint(2, 5)
+    return params
+
+
+def catalog_list(data):
+    return None, 'get', reverse('catalog:product_list'), _catalog_params(data)
+
+
+def catalog_list_user(data):
+    return data.rng.choice(data.renters), 'get', reverse('catalog:product_list'), _catalog_params(data)
+
+
+def product_detail(data):
+    return None, 'get', reverse('catalog:product_detail', args=[data.product()]), {}
+
+
+def product_availability(data):
+    start = date.today() + timedelta(days=data.rng.randint(-30, 30))
+    params = {'start': start.isoformat(), 'end': (start + timedelta(days=42)).isoformat()}
+    return None, 'get', reverse('catalog:product_availability', args=[data.product()]), params
+
+
+def create_booking_form(data):
+    product_id = data.product()
+    return data.renter_for(product_id), 'get', reverse('bookings:create_booking', args=[product_id]), {}
+
+
+def create_booking_submit(data):
+    product_id = data.product()
+    # Далёкие даты: заявка pending и не пересекается с занятыми днями
+    start = date.today() + timedelta(days=data.rng.randint(400, 700))
+    params = {'start_date': start.isoformat(), 'end_date': (start + timedelta(days=data.rng.randint(1, 5))).isoformat()}
+    return data.renter_for(product_id), 'post', reverse('bookings:create_booking', args=[product_id]), params
+
+
+def owner_requests(data):
+    return data.rng.choice(data.owners), 'get', reverse('bookings:owner_requests'), {}
+
+
+def my_bookings(data):
+    return data.rng.choice(data.renters), 'get', reverse('bookings:my_bookings'), {}
+
+
+def profile(data):
+    return data.rng.choice(data.owners), 'get', reverse('profile'), {}
+
+
+# Имя сценария -> функция (data) -> (user_id или None, метод, url, параметры)
+SCENARIOS = {
+    'catalog_list': catalog_list,
+    'catalog_list_user': catalog_list_user,
+    'product_detail': product_detail,
+    'product_availability': product_availability,
+    'create_booking_form': create_booking_form,
+    'create_booking_submit': create_booking_submit,
+    'owner_requests': owner_requests,
+    'my_bookings': my_bookings,
+    'profile': profile,
+}
+
+
+def summarize(timings, queries, errors, elapsed):
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries_mean': round(statistics.mean(queries), 2),
+        'queries_max': max(queries),
+        'rps': round(len(timings) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def run(requests=200, scenarios=None, seed=42, warmup=5):
+    """
+    Прогоняет сценарии по очереди, по requests запросов на каждый.
+    Ответ со статусом >= 400 считается ошибкой. Возвращает словарь для JSON.
+    """
+    from users.models import User
+
+    rng = random.Random(seed)
+    data = SiteData(rng)
+    clients = {}
+
+    def client_for(user_id):
+        # Вход — вне замеров: по клиенту с сессией на пользователя
+        if user_id not in clients:
+            client = Client()
+            if user_id is not None:
+                client.force_login(User.objects.get(pk=user_id))
+            clients[user_id] = client
+        return clients[user_id]
+
+    cache.clear()
+    results = {}
+    for name in scenarios or SCENARIOS:
+        scenario = SCENARIOS[name]
+        for _ in range(warmup):
+            user_id, method, url, params = scenario(data)
+            getattr(client_for(user_id), method)(url, params)
+
+        timings, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            user_id, method, url, params = scenario(data)
+            client = client_for(user_id)
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = getattr(client, method)(url, params)
+                timings.append((time.perf_counter() - request_started) * 1000)
+            queries.append(len(captured))
+            if response.status_code >= 400:
+                errors += 1
+        results[name] = summarize(timings, queries, errors, time.perf_counter() - started)
+
+    return {
+        'seed': seed,
+        'requests_per_scenario': requests,
+        'scenarios': results,
+        'errors': sum(stats['errors'] for stats in results.values()),
+    }
+
+
+def compare(current, previous, metrics=('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'rps')):
+    """Строки таблицы «было → стало» по общим сценариям двух отчётов"""
+    rows = []
+    for name, stats in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        row = {'scenario': name}
+        for metric in metrics:
+            old, new = before.get(metric), stats.get(metric)
+            if old in (None, 0) or new is None:
+                row[metric] = f'{old} → {new}'
+            else:
+                row[metric] = f'{old} → {new} ({(new - old) / old * 100:+.0f}%)'
+        rows.append(row)
+    return rows
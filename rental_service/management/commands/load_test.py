@@ -0,0 +1,67 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rental_service import loadtest
+from rental_service.benchmarks import dump_json, print_table, temporary_database
+from rental_service.seeding import SCALES, seed_site
+
+COLUMNS = ('scenario', 'requests', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'queries_mean', 'queries_max', 'rps')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон основных страниц через тестовый клиент: '
+        'p50/p95/p99, запросы к БД и пропускная способность по сценариям'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='tiny', help='Масштаб данных во временной базе')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Гонять по текущей базе (заполненной seed_load_data), а не по временной')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на сценарий')
+        parser.add_argument('--scenario', action='append', choices=loadtest.SCENARIOS,
+                            help='Только эти сценарии (можно несколько раз)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', help='Сохранить отчёт в JSON-файл')
+        parser.add_argument('--compare', help='JSON прошлого прогона: показать изменения')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as file:
+                    previous = json.load(file)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Не удалось прочитать {options["compare"]}: {exc}')
+
+        if options['current_db']:
+            report = self.run(options)
+        else:
+            with temporary_database():
+                seed_site(**SCALES[options['scale']], seed=options['seed'])
+                report = self.run(options)
+            report['scale'] = options['scale']
+
+        rows = [{'scenario': name, **stats} for name, stats in report['scenarios'].items()]
+        print_table(rows, COLUMNS, self.stdout)
+        if previous is not None:
+            self.stdout.write('\nИзменения относительно ' + options['compare'] + ':')
+            print_table(loadtest.compare(report, previous), ('scenario', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'rps'), self.stdout)
+        if options['json']:
+            if options['json'] == '-':
+                json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+            else:
+                dump_json(report, options['json'])
+
+        if report['errors']:
+            self.stderr.write(f'Ответов с ошибкой: {report["errors"]}')
+
+    def run(self, options):
+        try:
+            return loadtest.run(
+                requests=max(options['requests'], 1), scenarios=options['scenario'], seed=options['seed'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
@@ -0,0 +1,55 @@
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Папки, куда попадали загрузки, пока MEDIA_ROOT был корнем проекта
+LEGACY_FOLDERS = ('products', 'student_ids', 'thumbs')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит загрузки из корня проекта (products/, student_ids/, thumbs/) '
+        'в MEDIA_ROOT. Пути в базе относительные, поэтому не меняются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.BASE_DIR), help='Где лежат старые загрузки')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет перенесено')
+
+    def handle(self, *args, **options):
+        source = Path(options['source']).resolve()
+        target = Path(settings.MEDIA_ROOT).resolve()
+        if source == target:
+            raise CommandError('Загрузки уже лежат в MEDIA_ROOT')
+
+        moved = skipped = 0
+        for folder in LEGACY_FOLDERS:
+            root = source / folder
+            if not root.is_dir():
+                continue
+            for path in sorted(p for p in root.rglob('*') if p.is_file()):
+                relative = path.relative_to(source)
+                destination = target / relative
+                if destination.exists():
+                    # Не затираем файл, загруженный уже в новое место
+                    self.stderr.write(f'Уже есть в MEDIA_ROOT, пропускаю: {relative}')
+                    skipped += 1
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(f'[dry-run] {relative}')
+                else:
+                    destination.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.move(path, destination)
+                moved += 1
+            if not options['dry_run']:
+                # Пустые папки больше не нужны; с пропущенными файлами папка остаётся
+                for directory in sorted((p for p in root.rglob('*') if p.is_dir()), reverse=True):
+                    if not any(directory.iterdir()):
+                        directory.rmdir()
+                if not any(root.iterdir()):
+                    root.rmdir()
+
+        verb = 'Будет перенесено' if options['dry_run'] else 'Перенесено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} файлов: {moved}, пропущено: {skipped}'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rental_service.seeding import SCALES, SEED_PASSWORD, seed_site
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для нагрузочных тестов (bulk_create пачками)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small', help='Готовый масштаб данных')
+        parser.add_argument('--users', type=int, help='Переопределить число пользователей')
+        parser.add_argument('--products', type=int, help='Переопределить число товаров')
+        parser.add_argument('--bookings-per-product', type=int, help='Переопределить число броней на товар')
+        parser.add_argument('--messages-per-booking', type=int, help='Переопределить число сообщений на бронь')
+        parser.add_argument('--batch-size', type=int, default=5_000, help='Строк в одном bulk_create')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора: одинаковое зерно — одинаковые данные')
+
+    def handle(self, *args, **options):
+        params = dict(SCALES[options['scale']])
+        for name in params:
+            if options[name] is not None:
+                params[name] = options[name]
+
+        started = time.monotonic()
+        counts = seed_site(**params, batch_size=options['batch_size'], seed=options['seed'], stdout=self.stdout)
+        elapsed = time.monotonic() - started
+
+        summary = ', '.join(f'{table}: {count}' for table, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Готово за {elapsed:.1f} с — {summary}'))
+        self.stdout.write(f'Пароль всех пользователей seed_user_*: {SEED_PASSWORD}')
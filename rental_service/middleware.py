@@ -0,0 +1,214 @@
+# rental_service/middleware.py
+"""
+Метрики каждого запроса: общее время, число и время SQL-запросов
+(через execute_wrapper соединений), время рендера шаблонов (бэкенд
+rental_service.templating.TimedDjangoTemplates) и повторы одинаковых
+запросов (признак N+1). Работает и для async view: метрики
+запроса лежат в ContextVar, который sync_to_async переносит в поток с БД.
+
+Результат уходит в лог ``rental_service.requests`` строкой JSON (медленные
+запросы — WARNING, остальные — INFO) и, если включено, в заголовок
+Server-Timing — его показывает вкладка Network в браузере. View, которые
+ждут намеренно (long-poll), помечаются @long_poll и медленными не считаются.
+У потоковых ответов total_ms — время до начала отдачи, без передачи тела.
+
+Выборочное профилирование: с вероятностью REQUEST_PROFILE_SAMPLE_RATE запрос
+выполняется под cProfile, и если он оказался медленнее REQUEST_SLOW_MS,
+статистика сохраняется в REQUEST_PROFILE_DIR (смотреть: python -m pstats файл).
+Только для синхронных запросов: в цикле событий профиль смешал бы чужие корутины.
+"""
+import cProfile
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('rental_service.requests')
+
+SLOW_MS = getattr(settings, 'REQUEST_SLOW_MS', 500)
+SERVER_TIMING = getattr(settings, 'REQUEST_SERVER_TIMING', settings.DEBUG)
+PROFILE_SAMPLE_RATE = getattr(settings, 'REQUEST_PROFILE_SAMPLE_RATE', 0.0)
+PROFILE_DIR = Path(getattr(settings, 'REQUEST_PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+# Сколько самых частых повторяющихся запросов попадает в лог
+DUPLICATES_IN_LOG = 3
+
+# Метрики текущего запроса; None — запрос не измеряется (manage.py shell, команды)
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = Counter()
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: считает запрос и его время"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self.query_count += 1
+            self.queries[sql, repr(params)] += 1
+
+    def duplicates(self):
+        """Запросы, выполненные больше одного раза с теми же параметрами"""
+        return [(sql, count) for (sql, _params), count in self.queries.most_common() if count > 1]
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install_query_recorder(connection, **kwargs):
+    # Соединения свои у каждого потока, поэтому обёртка ставится на каждое
+    # новое соединение, а не на время запроса. В начало списка — чтобы не
+    # сбить pop() у открытых сейчас connection.execute_wrapper()
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def _install_on_open_connections(**kwargs):
+    # request_started приходит в потоке, где у запроса работает БД (и для
+    # async view), — так обёртку получают и соединения, открытые до создания
+    # middleware (например, в другом потоке до первого запроса)
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(connection)
+
+
+def current_metrics():
+    """Метрики текущего запроса или None, если он не измеряется"""
+    return _current.get()
+
+
+def long_poll(view):
+    """
+    Помечает view, которое по задумке долго ждёт событий (long-poll): его
+    запросы пишутся в лог как INFO и не профилируются. Ставить под
+    остальными декораторами — они копируют атрибуты функции.
+    """
+    view.long_poll = True
+    return view
+
+
+def _is_long_poll(request):
+    match = request.resolver_match
+    return match is not None and getattr(match.func, 'long_poll', False)
+
+
+class RequestMetricsMiddleware:
+    """Ставится первым в MIDDLEWARE, чтобы мерить и остальные middleware"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(_install_query_recorder, dispatch_uid='request_metrics')
+        request_started.connect(_install_on_open_connections, dispatch_uid='request_metrics')
+        _install_on_open_connections()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        profiler = cProfile.Profile() if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE else None
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started, profiler)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started, profiler=None):
+        total_ms = (time.perf_counter() - started) * 1000
+        slow = total_ms >= SLOW_MS and not _is_long_poll(request)
+
+        profile_path = None
+        if profiler is not None and slow:
+            profile_path = self.dump_profile(profiler, request, total_ms)
+
+        self.log(request, response, metrics, total_ms, profile_path, slow)
+        if SERVER_TIMING:
+            response['Server-Timing'] = server_timing(metrics, total_ms)
+        return response
+
+    def dump_profile(self, profiler, request, total_ms):
+        match = request.resolver_match
+        view = match.view_name.replace(':', '-') if match else 'unresolved'
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f'{datetime.now():%Y%m%d-%H%M%S-%f}-{view}-{total_ms:.0f}ms.prof'
+        try:
+            profiler.dump_stats(path)
+        except OSError as exc:
+            logger.warning('Не удалось сохранить профиль %s: %s', path, exc)
+            return None
+        return path
+
+    def log(self, request, response, metrics, total_ms, profile_path, slow):
+        match = request.resolver_match
+        duplicates = metrics.duplicates()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(metrics.db_ms, 2),
+            'queries': metrics.query_count,
+            'template_ms': round(metrics.template_ms, 2),
+            'duplicate_queries': sum(count - 1 for _sql, count in duplicates),
+        }
+        if duplicates:
+            record['top_duplicates'] = [
+                {'sql': sql[:200], 'count': count} for sql, count in duplicates[:DUPLICATES_IN_LOG]
+            ]
+        if response.streaming:
+            record['streaming'] = True
+        if profile_path is not None:
+            record['profile'] = str(profile_path)
+        level = logging.WARNING if slow else logging.INFO
+        logger.log(level, json.dumps(record, ensure_ascii=False), extra={'metrics': record})
+
+
+def server_timing(metrics, total_ms):
+    return ', '.join((
+        f'total;dur={total_ms:.1f}',
+        f'db;dur={metrics.db_ms:.1f};desc="{metrics.query_count} queries"',
+        f'tpl;dur={metrics.template_ms:.1f}',
+    ))
@@ -0,0 +1,19 @@
+"""
+Постраничный вывод для страниц, где на одной странице несколько списков:
+у каждого списка свой GET-параметр номера страницы.
+"""
+from django.core.paginator import Paginator
+
+
+def paginate(request, object_list, per_page, param='page'):
+    """
+    Возвращает страницу object_list по номеру из request.GET[param].
+    К странице добавляются param и query — остальные GET-параметры, чтобы
+    ссылки одного списка не сбрасывали страницы других.
+    """
+    page = Paginator(object_list, per_page).get_page(request.GET.get(param))
+    params = request.GET.copy()
+    params.pop(param, None)
+    page.param = param
+    page.query = params.urlencode()
+    return page
@@ -0,0 +1,172 @@
+"""
+Синтетические данные для нагрузочных тестов и бенчмарков: пользователи,
+категории, товары, брони (с занятыми днями), отзывы и сообщения чата.
+
+Всё вставляется пачками через bulk_create, сигналы при этом не срабатывают,
+поэтому производные данные (BookedDay, рейтинги, поисковый индекс)
+заполняются здесь же явно.
+"""
+import random
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+
+# Готовые масштабы: пользователи, товары, броней на товар, сообщений на бронь
+SCALES = {
+    'tiny': {'users': 50, 'products': 200, 'bookings_per_product': 3, 'messages_per_booking': 2},
+    'small': {'users': 500, 'products': 5_000, 'bookings_per_product': 4, 'messages_per_booking': 3},
+    'medium': {'users': 5_000, 'products': 50_000, 'bookings_per_product': 5, 'messages_per_booking': 4},
+    'large': {'users': 20_000, 'products': 100_000, 'bookings_per_product': 8, 'messages_per_booking': 5},
+}
+
+# Пароль всех сгенерированных пользователей
+SEED_PASSWORD = 'load-test-password'
+
+MESSAGES = (
+    'Здравствуйте! Вещь ещё свободна на эти даты?',
+    'Да, можно забрать после 18:00 у общежития.',
+    'Отлично, спасибо! Залог переведу при встрече.',
+    'Подскажите, комплект полный?',
+    'Верну в воскресенье вечером, удобно?',
+    'Договорились.',
+)
+REVIEW_COMMENTS = ('', 'Всё отлично', 'Вещь как в описании', 'Владелец пунктуальный', 'Немного потёрто, но работает')
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """
+    Временно отключает auto_now_add/auto_now у полей модели, чтобы bulk_create
+    записал заданные даты, а не «сейчас» для всех строк.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed_site(users, products, bookings_per_product, messages_per_booking,
+              batch_size=5_000, seed=42, stdout=None):
+    """
+    Заполняет базу целиком. Возвращает словарь «таблица -> сколько строк создано».
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection
+    from django.utils import timezone
+
+    from bookings.models import BookedDay, Booking
+    from bookings.rollups import rebuild as rebuild_rollups
+    from catalog.benchmarks.seed import seed_catalog
+    from catalog.models import Product
+    from catalog.pricing import quote, rental_days
+    from communications.models import ChatMessage, ChatUnread
+    from reviews.models import Review
+    from users.models import User
+    from users.ratings import recompute_ratings
+
+    rng = random.Random(seed)
+
+    def log(message):
+        if stdout is not None:
+            stdout.write(message + '\n')
+
+    _categories, owners = seed_catalog(
+        products=products, users=users, batch_size=batch_size, seed=seed,
+        password=make_password(SEED_PASSWORD), stdout=stdout,
+    )
+    user_ids = [owner.pk for owner in owners]
+    today = date.today()
+    now = timezone.now()
+    counts = {'bookings': 0, 'booked_days': 0, 'reviews': 0, 'chat_messages': 0, 'chat_unread': 0}
+
+    def flush(bookings):
+        if not bookings:
+            return
+        with explicit_timestamps(Booking, 'created_at'):
+            Booking.objects.bulk_create(bookings, batch_size=batch_size)
+        days, reviews, messages, unread = [], [], [], []
+        for booking in bookings:
+            if booking.status in Booking.BUSY_STATUSES:
+                days.extend(
+                    BookedDay(product_id=booking.product_id, booking_id=booking.pk, day=booking.start_date + timedelta(i))
+                    for i in range((booking.end_date - booking.start_date).days + 1)
+                )
+            if booking.status == 'completed' and rng.random() < 0.6:
+                reviews.append(Review(
+                    booking_id=booking.pk, reviewer_id=booking.renter_id, landlord_id=booking.owner_id,
+                    rating=rng.choices((5, 4, 3, 2, 1), weights=(50, 30, 10, 6, 4))[0],
+                    comment=rng.choice(REVIEW_COMMENTS),
+                    created_at=min(now, booking.created_at + timedelta(days=(booking.end_date - booking.start_date).days + 1)),
+                ))
+            if booking.status != 'cancelled' and messages_per_booking:
+                for i in range(messages_per_booking):
+                    messages.append(ChatMessage(
+                        booking_id=booking.pk,
+                        sender_id=booking.renter_id if i % 2 == 0 else booking.owner_id,
+                        message=rng.choice(MESSAGES),
+                        timestamp=min(now, booking.created_at + timedelta(minutes=7 * i + rng.randint(0, 5))),
+                    ))
+                # Как после count_unread: получатель последнего сообщения ещё не открыл
+                # чат, если бронь не закончилась; второй участник прочитал всё, ответив
+                if booking.status != 'completed':
+                    last_from_renter = (messages_per_booking - 1) % 2 == 0
+                    recipient = booking.owner_id if last_from_renter else booking.renter_id
+                    unread.append(ChatUnread(user_id=recipient, booking_id=booking.pk, count=1))
+        BookedDay.objects.bulk_create(days, batch_size=batch_size)
+        with explicit_timestamps(Review, 'created_at'):
+            Review.objects.bulk_create(reviews, batch_size=batch_size)
+        with explicit_timestamps(ChatMessage, 'timestamp'):
+            ChatMessage.objects.bulk_create(messages, batch_size=batch_size)
+        ChatUnread.objects.bulk_create(unread, batch_size=batch_size)
+        counts['bookings'] += len(bookings)
+        counts['booked_days'] += len(days)
+        counts['reviews'] += len(reviews)
+        counts['chat_messages'] += len(messages)
+        counts['chat_unread'] += len(unread)
+        log(f'Броней: {counts["bookings"]}, отзывов: {counts["reviews"]}, сообщений: {counts["chat_messages"]}')
+
+    pending = []
+    rows = Product.objects.order_by('pk').values_list('pk', 'owner_id', 'daily_price', 'weekly_price')
+    for product_id, owner_id, daily_price, weekly_price in rows.iterator(chunk_size=batch_size):
+        # Брони товара идут друг за другом без пересечений: от четырёх месяцев назад и дальше
+        start = today - timedelta(days=120 + rng.randint(0, 30))
+        for _ in range(bookings_per_product):
+            start += timedelta(days=rng.randint(0, 12))
+            end = start + timedelta(days=rng.randint(0, 6))
+            if end < today:
+                status = 'completed' if rng.random() < 0.8 else 'cancelled'
+            elif start <= today:
+                status = 'active'
+            else:
+                status = rng.choices(('confirmed', 'pending', 'cancelled'), weights=(50, 35, 15))[0]
+            renter_id = rng.choice(user_ids)
+            if renter_id == owner_id:
+                renter_id = user_ids[(user_ids.index(renter_id) + 1) % len(user_ids)]
+            booking = Booking(
+                product_id=product_id, renter_id=renter_id, start_date=start, end_date=end,
+                # Как при бронировании на сайте (catalog/pricing.py)
+                total_cost=quote(daily_price, weekly_price, rental_days(start, end)), status=status,
+                created_at=min(now, timezone.make_aware(
+                    datetime.combine(start - timedelta(days=rng.randint(1, 14)), time(rng.randint(8, 23), rng.randint(0, 59)))
+                )),
+            )
+            booking.owner_id = owner_id  # для отзывов и чата, в базу не пишется
+            pending.append(booking)
+            start = end + timedelta(days=1)
+        if len(pending) >= batch_size:
+            flush(pending)
+            pending = []
+    flush(pending)
+
+    recompute_ratings(User.objects.all())
+    # bulk_create обходит сигналы — сводку владельцев считаем целиком
+    rebuild_rollups()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    counts.update(users=len(user_ids), products=products)
+    return counts
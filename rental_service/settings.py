@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,9 +44,12 @@ INSTALLED_APPS = [
     'reviews',
     'communications',
     'widget_tweaks',
+    # Общие для проекта команды (manage.py analyze_db)
+    'rental_service',
     ]
 
 MIDDLEWARE = [
+    'rental_service.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +63,9 @@ ROOT_URLCONF = 'rental_service.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, который считает время рендера для RequestMetricsMiddleware
+        'BACKEND': 'rental_service.templating.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,14 +84,111 @@ WSGI_APPLICATION = 'rental_service.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE=sqlite (по умолчанию) — один файл, настроенный под конкурентную запись:
+# WAL (чтение не ждёт запись), BEGIN IMMEDIATE (блокировка на запись берётся
+# сразу, без «database is locked» при повышении блокировки), busy_timeout,
+# synchronous=NORMAL (в WAL безопасно), mmap и кэш страниц, постоянное соединение.
+# DB_ENGINE=postgres — для продакшена с несколькими процессами: постоянные
+# соединения (CONN_MAX_AGE) с проверкой перед использованием.
+# Сравнить режимы: python -m bookings.benchmarks.writes
+
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+    'synchronous': 'NORMAL',
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    # Отрицательное значение — размер в КиБ
+    'cache_size': -config('SQLITE_CACHE_SIZE_KB', default=64 * 1024, cast=int),
+    'temp_store': 'MEMORY',
+}
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='rental_service'),
+            'USER': config('DB_USER', default='rental_service'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='127.0.0.1'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            },
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+            # Без переоткрытия файла и повторных PRAGMA на каждый запрос
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'DB_ENGINE должен быть sqlite или postgres, а не {DB_ENGINE!r}')
+
+AUTH_USER_MODEL = 'users.User'
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Для нескольких процессов нужен общий бэкенд, например
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379/1
+# или файловый: CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/var/tmp/rental-cache
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='rental-service'),
     }
 }
 
-AUTH_USER_MODEL = 'users.User'
+# Сколько секунд анонимы получают страницы каталога из кэша (catalog/cache.py).
+# Изменения товаров, категорий, броней и отзывов сбрасывают кэш сразу
+CATALOG_PAGE_CACHE_TIMEOUT = config('CATALOG_PAGE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Метрики запросов (rental_service/middleware.py): время, SQL, шаблоны, повторы запросов.
+# Запросы дольше REQUEST_SLOW_MS пишутся в лог как WARNING.
+# Server-Timing раскрывает время работы сервера — по умолчанию только при DEBUG.
+# REQUEST_PROFILE_SAMPLE_RATE > 0 включает cProfile для такой доли запросов;
+# профили медленных запросов сохраняются в REQUEST_PROFILE_DIR
+REQUEST_SLOW_MS = config('REQUEST_SLOW_MS', default=500, cast=int)
+REQUEST_SERVER_TIMING = config('REQUEST_SERVER_TIMING', default=DEBUG, cast=bool)
+REQUEST_PROFILE_SAMPLE_RATE = config('REQUEST_PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+REQUEST_PROFILE_DIR = config('REQUEST_PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+
+# Чат по брони (communications/chat.py). LocalBroker — в пределах одного процесса,
+# для нескольких воркеров: CHAT_BROKER=communications.pubsub.RedisBroker
+CHAT_BROKER = config('CHAT_BROKER', default='communications.pubsub.LocalBroker')
+CHAT_REDIS_URL = config('CHAT_REDIS_URL', default='redis://127.0.0.1:6379/0')
+CHAT_POLL_TIMEOUT = config('CHAT_POLL_TIMEOUT', default=25, cast=int)
+# Сообщения, пришедшие в пределах CHAT_FLUSH_MS, пишутся одним bulk_create
+CHAT_BATCH_SIZE = config('CHAT_BATCH_SIZE', default=200, cast=int)
+CHAT_FLUSH_MS = config('CHAT_FLUSH_MS', default=20, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INFO — строка на каждый запрос, WARNING — только медленные
+        'rental_service.requests': {
+            'handlers': ['console'],
+            'level': config('REQUEST_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -123,6 +226,14 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Загруженные файлы (фото товаров, студенческие) и их миниатюры. Старые
+# загрузки из корня проекта переносит manage.py move_uploads
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Ширины миниатюр фото товаров (px), см. catalog/images.py
+PRODUCT_IMAGE_WIDTHS = (320, 640, 1024)
+
 LOGIN_REDIRECT_URL = '/accounts/profile/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
 
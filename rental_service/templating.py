@@ -0,0 +1,41 @@
+# rental_service/templating.py
+"""
+Бэкенд шаблонов Django, который учитывает время рендера в метриках
+запроса (rental_service/middleware.py). Подключается в TEMPLATES вместо
+django.template.backends.django.DjangoTemplates.
+
+Меряется render() шаблона бэкенда — это render(), render_to_string() и
+TemplateResponse целиком, без вложенных {% include %}, поэтому время не
+считается дважды.
+"""
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .middleware import current_metrics
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_ms += (time.perf_counter() - started) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
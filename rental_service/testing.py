@@ -0,0 +1,70 @@
+"""
+Вспомогательные функции для тестов: план запроса (EXPLAIN QUERY PLAN)
+для проверки, что горячие запросы идут по индексам, и бюджет числа
+запросов на страницу — против N+1.
+"""
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def explain(sql, params=()):
+    """Возвращает строки EXPLAIN QUERY PLAN (только SQLite)"""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def queryset_plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    return explain(sql, params)
+
+
+class QueryPlanAssertionsMixin:
+    """Ассерты для TestCase поверх EXPLAIN QUERY PLAN"""
+
+    def assertUsesIndex(self, plan, table, index):
+        lines = [line for line in plan if f' {table} ' in f'{line} ']
+        self.assertTrue(
+            any(f'INDEX {index} ' in f'{line} ' for line in lines),
+            f'{table} не использует индекс {index}:\n' + '\n'.join(plan),
+        )
+
+    def assertNoFullScan(self, plan, table):
+        for line in plan:
+            self.assertFalse(
+                line.startswith(f'SCAN {table}') and 'INDEX' not in line,
+                f'Полный просмотр {table}:\n' + '\n'.join(plan),
+            )
+
+    def captured_plans(self, func, table):
+        """Выполняет func и возвращает планы всех запросов, затрагивающих table"""
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return [
+            explain(query['sql'])
+            for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and f'"{table}"' in query['sql']
+        ]
+
+
+class QueryBudgetMixin:
+    """Ассерт «не больше N запросов» — в отличие от assertNumQueries, не требует точного числа"""
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        with CaptureQueriesContext(connection) as ctx:
+            yield ctx
+        queries = '\n'.join(f'{i}. {query["sql"]}' for i, query in enumerate(ctx.captured_queries, 1))
+        self.assertLessEqual(
+            len(ctx), budget,
+            f'{len(ctx)} запросов при бюджете {budget}:\n{queries}',
+        )
+
+    def assertResponseWithinBudget(self, client, url, budget):
+        """GET url укладывается в бюджет; возвращает ответ и число запросов"""
+        with self.assertMaxQueries(budget) as ctx:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx)
@@ -19,7 +19,7 @@ from django.contrib import admin
 from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
-from users.views import profile, profile_edit
+from users.views import profile, profile_edit, register
 
 
 urlpatterns = [
@@ -27,8 +27,10 @@ urlpatterns = [
     path('accounts/', include('django.contrib.auth.urls')),  # Для login/logout
     path('catalog/', include('catalog.urls')),
     path('bookings/', include('bookings.urls')),
+    path('chat/', include('communications.urls')),
     path('accounts/profile/', profile, name='profile'),
     path('accounts/profile/edit/', profile_edit, name='profile_edit'),
+    path('accounts/register/', register, name='register'),
 
     path('', TemplateView.as_view(template_name='home.html'), name='home'),
 ]
@@ -0,0 +1,35 @@
+# rental_service/versioned_cache.py
+"""
+Версии для инвалидации кэша. Записи кэшируются под ключом с текущей
+версией; чтобы сбросить их все, версию увеличивают, а старые записи
+просто перестают читаться и вытесняются по таймауту.
+
+Используется кэшем страниц каталога (catalog/cache.py) и картами
+занятости (bookings/availability.py).
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _initial():
+    # Стартуем со времени, а не с 1: если ключ версии вытеснен из кэша,
+    # старые записи под маленькими номерами не должны снова стать видны
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """Текущая версия под ключом key (создаётся при первом чтении)"""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump(key):
+    """Увеличивает версию: всё, что закэшировано под старой, перестаёт читаться"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial(), None)
@@ -1,3 +1,16 @@
+# reviews/admin.py
 from django.contrib import admin
 
-# Register your models here.
+from rental_service.admin import ScalableModelAdmin
+from .models import Review
+
+
+@admin.register(Review)
+class ReviewAdmin(ScalableModelAdmin):
+    # booking_id, а не booking: __str__ брони читает арендатора и товар
+    list_display = ('booking_id', 'reviewer', 'landlord', 'rating', 'created_at')
+    list_filter = ('rating',)
+    list_select_related = ('reviewer', 'landlord')
+    raw_id_fields = ('booking',)
+    autocomplete_fields = ('reviewer', 'landlord')
+    date_hierarchy = 'created_at'
@@ -1,5 +1,7 @@
 from django.db import models
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from bookings.models import Booking
 
 class Review(models.Model):
@@ -12,16 +14,21 @@ class Review(models.Model):
 
     class Meta:
         unique_together = ('booking', 'reviewer')
+        indexes = [
+            # date_hierarchy в админке
+            models.Index(fields=['created_at'], name='review_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Обновляем средний рейтинг арендодателя
-        landlord = self.landlord
-        reviews = landlord.received_reviews.all()
-        if reviews.exists():
-            landlord.rating = sum(r.rating for r in reviews) / reviews.count()
-            landlord.rating_count = reviews.count()
-        else:
-            landlord.rating = 0.0
-            landlord.rating_count = 0
-        landlord.save()
\ No newline at end of file
+        previous = None
+        if self.pk and not self._state.adding:
+            previous = Review.objects.filter(pk=self.pk).values_list('landlord_id', 'rating').first()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Рейтинг арендодателя обновляем инкрементально — без перебора всех отзывов
+            User = get_user_model()
+            if previous is None:
+                User.apply_rating_delta(self.landlord_id, self.rating, 1)
+            elif previous != (self.landlord_id, self.rating):
+                User.apply_rating_delta(previous[0], -previous[1], -1)
+                User.apply_rating_delta(self.landlord_id, self.rating, 1)
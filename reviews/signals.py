@@ -0,0 +1,24 @@
+# reviews/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from catalog import cache as catalog_cache
+from catalog.models import Product
+from .models import Review
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    """Убираем оценку удалённого отзыва из рейтинга арендодателя"""
+    get_user_model().apply_rating_delta(instance.landlord_id, -instance.rating, -1)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_landlord_pages(sender, instance, raw=False, **kwargs):
+    """Рейтинг владельца виден на страницах его товаров"""
+    if raw:
+        return
+    product_ids = Product.objects.filter(owner_id=instance.landlord_id).values_list('pk', flat=True)
+    catalog_cache.invalidate(*[catalog_cache.product_namespace(pk) for pk in product_ids])
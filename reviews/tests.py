@@ -1,3 +1,87 @@
+import io
+from datetime import date, timedelta
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from bookings.models import Booking
+from catalog.models import Product
+from users.models import User
+from users.ratings import recompute_ratings
+from .models import Review
+
+
+class IncrementalRatingTests(TestCase):
+    def setUp(self):
+        self.landlord = User.objects.create_user('landlord', 'landlord@example.com', 'pass')
+        self.product = Product.objects.create(
+            owner=self.landlord, name='Палатка', description='Описание',
+            daily_price=100, deposit=500,
+        )
+        self.renters = [User.objects.create_user(f'renter{i}', f'renter{i}@example.com', 'pass') for i in range(5)]
+
+    def leave_review(self, renter, rating):
+        booking = Booking.objects.create(
+            renter=renter, product=self.product,
+            start_date=date.today() - timedelta(days=3), end_date=date.today() - timedelta(days=1),
+            total_cost=300, status='completed',
+        )
+        return Review.objects.create(booking=booking, reviewer=renter, landlord=self.landlord, rating=rating)
+
+    def assertMatchesRecompute(self):
+        self.landlord.refresh_from_db()
+        incremental = (self.landlord.rating_sum, self.landlord.rating_count, self.landlord.rating)
+        recompute_ratings(User.objects.filter(pk=self.landlord.pk))
+        self.landlord.refresh_from_db()
+        self.assertEqual(incremental, (self.landlord.rating_sum, self.landlord.rating_count, self.landlord.rating))
+        return incremental
+
+    def test_review_create_does_not_scan_reviews(self):
+        for renter, rating in zip(self.renters[:4], (5, 4, 3, 4)):
+            self.leave_review(renter, rating)
+        booking = Booking.objects.create(
+            renter=self.renters[4], product=self.product,
+            start_date=date.today(), end_date=date.today(), total_cost=100, status='completed',
+        )
+        # INSERT отзыва, UPDATE пользователя и id его товаров для сброса кэша страниц
+        # (плюс savepoint) — независимо от числа отзывов
+        with self.assertNumQueries(5):
+            Review.objects.create(booking=booking, reviewer=self.renters[4], landlord=self.landlord, rating=2)
+        self.assertEqual(self.assertMatchesRecompute(), (18, 5, 3.6))
+
+    def test_update_and_delete_keep_rating_in_sync(self):
+        reviews = [self.leave_review(renter, rating) for renter, rating in zip(self.renters, (5, 1, 4))]
+        reviews[1].rating = 3
+        reviews[1].save()
+        self.assertEqual(self.assertMatchesRecompute(), (12, 3, 4.0))
+
+        reviews[0].delete()
+        self.assertEqual(self.assertMatchesRecompute(), (7, 2, 3.5))
+
+        reviews[2].booking.delete()
+        reviews[1].delete()
+        self.assertEqual(self.assertMatchesRecompute(), (0, 0, 0.0))
+
+    def test_update_rating_matches_incremental(self):
+        for renter, rating in zip(self.renters, (5, 4, 4)):
+            self.leave_review(renter, rating)
+        self.landlord.refresh_from_db()
+        incremental = (self.landlord.rating_sum, self.landlord.rating_count, self.landlord.rating)
+        with self.assertNumQueries(2):
+            self.landlord.update_rating()
+        self.assertEqual(incremental, (self.landlord.rating_sum, self.landlord.rating_count, self.landlord.rating))
+
+    def test_recompute_command_repairs_drift(self):
+        self.leave_review(self.renters[0], 5)
+        self.leave_review(self.renters[1], 2)
+        User.objects.filter(pk=self.landlord.pk).update(rating_sum=100, rating_count=1, rating=100.0)
+
+        out = io.StringIO()
+        call_command('recompute_ratings', '--check', stdout=out)
+        self.assertIn('Расхождений в рейтингах: 1', out.getvalue())
+        self.landlord.refresh_from_db()
+        self.assertEqual(self.landlord.rating_sum, 100)
+
+        call_command('recompute_ratings', stdout=io.StringIO())
+        self.landlord.refresh_from_db()
+        self.assertEqual((self.landlord.rating_sum, self.landlord.rating_count, self.landlord.rating), (7, 2, 3.5))
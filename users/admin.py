@@ -1,3 +1,42 @@
-from django.contrib import admin
+# users/admin.py
+from django.contrib import admin, messages
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Q
 
-# Register your models here.
+from rental_service.admin import ScalableModelAdmin, prefix_filter
+from .models import User
+
+
+@admin.register(User)
+class UserAdmin(ScalableModelAdmin, BaseUserAdmin):
+    list_display = ('username', 'email', 'university', 'is_verified', 'rating', 'rating_count', 'is_staff', 'date_joined')
+    list_filter = ('is_verified', 'is_staff', 'is_active')
+    date_hierarchy = 'date_joined'
+    search_fields = ('username',)
+    readonly_fields = ('rating', 'rating_count', 'rating_sum')
+    fieldsets = BaseUserAdmin.fieldsets + (
+        ('Профиль', {'fields': ('university', 'student_id_photo', 'phone_number', 'bio', 'is_verified')}),
+        ('Рейтинг', {'fields': ('rating', 'rating_count', 'rating_sum')}),
+    )
+    actions = ('verify_users', 'deactivate_users')
+
+    def get_search_results(self, request, queryset, search_term):
+        """Логин по префиксу или точный email — по индексу, без icontains"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        if '@' in term:
+            return queryset.filter(email=term), False
+        return queryset.filter(prefix_filter('username', term)), False
+
+    @admin.action(description='Верифицировать')
+    def verify_users(self, request, queryset):
+        updated = queryset.update(is_verified=True)
+        self.message_user(request, f'Верифицировано: {updated}', messages.SUCCESS)
+
+    @admin.action(description='Заблокировать (is_active = нет)')
+    def deactivate_users(self, request, queryset):
+        updated = queryset.exclude(pk=request.user.pk).update(is_active=False)
+        self.message_user(request, f'Заблокировано: {updated}', messages.SUCCESS)
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from reviews.models import Review
+from users.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Сверяет и пересчитывает рейтинги арендодателей по отзывам (одним UPDATE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Только показать расхождения, ничего не менять')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        per_landlord = Review.objects.filter(landlord=OuterRef('pk')).order_by().values('landlord')
+        drifted = User.objects.annotate(
+            actual_sum=Coalesce(Subquery(per_landlord.annotate(s=Sum('rating')).values('s')), Value(0)),
+            actual_count=Coalesce(Subquery(per_landlord.annotate(c=Count('id')).values('c')), Value(0)),
+        ).filter(~Q(rating_sum=F('actual_sum')) | ~Q(rating_count=F('actual_count')))
+
+        drifted_count = drifted.count()
+        self.stdout.write(f'Расхождений в рейтингах: {drifted_count}')
+        if options['check']:
+            return
+
+        updated = recompute_ratings(User.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Рейтинги пересчитаны у {updated} пользователей'))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_sum(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Review = apps.get_model('reviews', 'Review')
+    totals = Review.objects.order_by().values('landlord').annotate(total=Sum('rating'), count=Count('id'))
+    for row in totals.iterator():
+        User.objects.filter(pk=row['landlord']).update(
+            rating_sum=row['total'], rating_count=row['count'], rating=row['total'] / row['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_alter_user_options_user_bio_user_phone_number_and_more'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating_sum, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
 from django.utils.translation import gettext_lazy as _
 
 
@@ -28,6 +30,10 @@ class User(AbstractUser):
         default=0,
         verbose_name=_("Количество оценок")
     )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Сумма оценок")
+    )
     is_verified = models.BooleanField(
         default=False,
         verbose_name=_("Верифицирован")
@@ -61,6 +67,10 @@ class User(AbstractUser):
     class Meta:
         verbose_name = _("пользователь")
         verbose_name_plural = _("пользователи")
+        indexes = [
+            # date_hierarchy в админке
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
 
     def __str__(self):
         return self.get_full_name() or self.username
@@ -70,19 +80,29 @@ class User(AbstractUser):
         """Удобное свойство для вывода рейтинга (округляем до 1 знака)"""
         return round(self.rating, 1) if self.rating_count > 0 else 0.0
 
+    @classmethod
+    def apply_rating_delta(cls, user_id, delta_sum, delta_count):
+        """
+        Меняет сумму и число оценок одним UPDATE на стороне БД (через F),
+        без чтения отзывов — параллельные отзывы не затирают друг друга.
+        """
+        new_sum = F('rating_sum') + delta_sum
+        new_count = F('rating_count') + delta_count
+        cls.objects.filter(pk=user_id).update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating=Case(
+                When(rating_count__gt=-delta_count, then=Cast(new_sum, FloatField()) / new_count),
+                default=Value(0.0),
+            ),
+        )
+
     def update_rating(self):
-        """Обновляет средний рейтинг на основе всех полученных отзывов"""
+        """Пересчитывает рейтинг по всем полученным отзывам одним агрегатным запросом"""
         from reviews.models import Review  # Импорт внутри метода, чтобы избежать циклического импорта
 
-        reviews = Review.objects.filter(landlord=self)
-        count = reviews.count()
-
-        if count > 0:
-            total = sum(review.rating for review in reviews)
-            self.rating = total / count
-            self.rating_count = count
-        else:
-            self.rating = 0.0
-            self.rating_count = 0
-
-        self.save(update_fields=['rating', 'rating_count'])
\ No newline at end of file
+        totals = Review.objects.filter(landlord=self).aggregate(total=Sum('rating'), count=Count('id'))
+        self.rating_sum = totals['total'] or 0
+        self.rating_count = totals['count']
+        self.rating = self.rating_sum / self.rating_count if self.rating_count else 0.0
+        self.save(update_fields=['rating', 'rating_sum', 'rating_count'])
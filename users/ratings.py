@@ -0,0 +1,26 @@
+# users/ratings.py
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+def recompute_ratings(users):
+    """
+    Пересчитывает rating_sum, rating_count и rating у пользователей одним
+    UPDATE с агрегатными подзапросами по отзывам. Возвращает число строк.
+    """
+    from reviews.models import Review
+
+    per_landlord = Review.objects.filter(landlord=OuterRef('pk')).order_by().values('landlord')
+    total = Coalesce(
+        Subquery(per_landlord.annotate(total=Sum('rating')).values('total')),
+        Value(0), output_field=IntegerField(),
+    )
+    count = Coalesce(
+        Subquery(per_landlord.annotate(count=Count('id')).values('count')),
+        Value(0), output_field=IntegerField(),
+    )
+    average = Coalesce(
+        Subquery(per_landlord.annotate(average=Cast(Sum('rating'), FloatField()) / Count('id')).values('average')),
+        Value(0.0), output_field=FloatField(),
+    )
+    return users.update(rating_sum=total, rating_count=count, rating=average)
@@ -1,3 +1,54 @@
+from datetime import date, timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+
+from bookings.models import Booking
+from catalog.models import Product
+from rental_service.testing import QueryBudgetMixin
+from .models import User
+
+
+class ProfileQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Профиль: по два запроса (COUNT и страница) на раздел, сколько бы ни было строк"""
+
+    # сессия + пользователь + 3 раздела по 2 запроса
+    BUDGET = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user('me', 'me@example.com', 'pass')
+        self.other = User.objects.create_user('other', 'other@example.com', 'pass')
+        self.client.force_login(self.user)
+
+    def add_rows(self, count):
+        today = date.today()
+        mine = Product.objects.bulk_create([
+            Product(owner=self.user, name=f'Мой {i}', description='-', daily_price=10, deposit=100)
+            for i in range(count)
+        ])
+        theirs = Product.objects.bulk_create([
+            Product(owner=self.other, name=f'Чужой {i}', description='-', daily_price=10, deposit=100)
+            for i in range(count)
+        ])
+        Booking.objects.bulk_create(
+            [Booking(renter=self.user, product=product, start_date=today + timedelta(days=i),
+                     end_date=today + timedelta(days=i + 1), total_cost=10) for i, product in enumerate(theirs)]
+            + [Booking(renter=self.other, product=product, start_date=today + timedelta(days=i),
+                       end_date=today + timedelta(days=i + 1), total_cost=10) for i, product in enumerate(mine)]
+        )
+
+    def test_profile_query_count_is_flat(self):
+        self.add_rows(2)
+        _, few = self.assertResponseWithinBudget(self.client, reverse('profile'), self.BUDGET)
+        self.add_rows(40)
+        _, many = self.assertResponseWithinBudget(self.client, reverse('profile'), self.BUDGET)
+        self.assertEqual(few, many)
 
-# Create your tests here.
+    def test_sections_paginate_independently(self):
+        self.add_rows(30)
+        response = self.client.get(reverse('profile'), {'bookings_page': 3, 'requests_page': 2})
+        self.assertEqual(response.context['my_products'].number, 1)
+        self.assertEqual(response.context['my_bookings'].number, 3)
+        self.assertEqual(len(response.context['my_bookings']), 6)
+        self.assertEqual(response.context['owner_requests'].number, 2)
+        self.assertContains(response, '?requests_page=2&bookings_page=2"')
@@ -1,10 +1,15 @@
 from django.shortcuts import render, redirect
+from django.contrib import messages
 from django.contrib.auth import login
 from .forms import RegistrationForm
 from django.contrib.auth.decorators import login_required
 from catalog.models import Product
 from bookings.models import Booking
 from .forms import ProfileForm
+from rental_service.pagination import paginate
+
+# Сколько строк показывать в каждом разделе профиля
+PROFILE_PAGE_SIZE = 12
 
 def register(request):
     if request.method == 'POST':
@@ -19,16 +24,25 @@ def register(request):
 
 @login_required
 def profile(request):
-    my_products = Product.objects.filter(owner=request.user).order_by('-created_at')
-    my_bookings = Booking.objects.filter(renter=request.user).order_by('-start_date')
-    
-    owner_requests = Booking.objects.filter(product__owner=request.user).order_by('-created_at')
-    
+    # Всё, что шаблон читает у строк, подтягиваем тем же запросом (JOIN), иначе
+    # каждая строка даёт отдельный запрос за товаром или арендатором
+    my_products = Product.objects.filter(owner=request.user).order_by('-created_at', '-id')
+    my_bookings = (
+        Booking.objects.filter(renter=request.user)
+        .select_related('product')
+        .order_by('-start_date', '-id')
+    )
+    owner_requests = (
+        Booking.objects.filter(product__owner=request.user)
+        .select_related('product', 'renter')
+        .order_by('-created_at', '-id')
+    )
+
     context = {
         'user': request.user,
-        'my_products': my_products,
-        'my_bookings': my_bookings,
-        'owner_requests': owner_requests,  
+        'my_products': paginate(request, my_products, PROFILE_PAGE_SIZE, 'products_page'),
+        'my_bookings': paginate(request, my_bookings, PROFILE_PAGE_SIZE, 'bookings_page'),
+        'owner_requests': paginate(request, owner_requests, PROFILE_PAGE_SIZE, 'requests_page'),
         'rating': round(request.user.rating, 1) if request.user.rating_count > 0 else 0.0,
         'rating_count': request.user.rating_count,
     }